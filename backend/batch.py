@@ -0,0 +1,269 @@
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+CHECKPOINT_DIR = os.getenv("BATCH_CHECKPOINT_DIR", "batch_checkpoints")
+
+
+def load_companies_jsonl(lines: Iterable[str]) -> List[Dict[str, Any]]:
+    """Parse JSONL lines into company requests.
+
+    Each line is either an object with at least ``company_name`` or a bare
+    JSON string with the company name. Blank lines are ignored.
+    """
+    companies = []
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError:
+            raise ValueError(f"Line {line_no} is not valid JSON")
+        if isinstance(item, str):
+            item = {"company_name": item}
+        if not isinstance(item, dict) or not str(item.get("company_name", "")).strip():
+            raise ValueError(f"Line {line_no} has no company_name")
+        companies.append(item)
+    return companies
+
+
+def checkpoint_path_for(checkpoint_id: str) -> str:
+    """Map a client supplied checkpoint id to a file inside CHECKPOINT_DIR"""
+    safe_id = re.sub(r"[^A-Za-z0-9_.-]", "_", checkpoint_id)[:100]
+    return os.path.join(CHECKPOINT_DIR, f"{safe_id}.jsonl")
+
+
+class BatchCheckpoint:
+    """Append-only JSONL file of finished companies so an interrupted batch can resume"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.completed: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A partially written last line from a crash - redo that company
+                        continue
+                    self.completed[entry["key"]] = entry["result"]
+        else:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+    def record(self, key: str, result: Dict[str, Any]):
+        """Persist a finished result before it is reported as done"""
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "result": result}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.completed[key] = result
+
+
+class BatchAnalyzer:
+    """Run many company analyses through a bounded worker pool.
+
+    All workers share one catalogue snapshot and one SERP cache, so the
+    catalogue is read once per batch instead of once per company.
+    """
+
+    def __init__(self, qa_system, max_workers: int = 4, checkpoint_path: Optional[str] = None,
+                 pack_size: int = 5):
+        self.qa_system = qa_system
+        self.max_workers = max(1, max_workers)
+        self.pack_size = pack_size
+        self.checkpoint = BatchCheckpoint(checkpoint_path) if checkpoint_path else None
+        self._search_cache: Dict[str, Dict[str, Any]] = {}
+        self._cache_lock = threading.Lock()
+
+    @staticmethod
+    def company_key(item: Dict[str, Any]) -> str:
+        """Stable identity of a batch item, used for checkpointing"""
+        pain_points = sorted(p.strip().lower() for p in item.get("pain_points") or [])
+        return json.dumps([item["company_name"].strip().lower(), pain_points])
+
+    def _search(self, company_name: str) -> Dict[str, Any]:
+        cache_key = company_name.strip().lower()
+        with self._cache_lock:
+            cached = self._search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        company_info = self.qa_system.search_company_info(company_name)
+        if "error" not in company_info:
+            with self._cache_lock:
+                self._search_cache[cache_key] = company_info
+        return company_info
+
+    def analyze_one(self, item: Dict[str, Any], catalogue: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Analyze a single company the same way /analyze-company does"""
+        company_name = item["company_name"].strip()
+        company_info = self._search(company_name)
+        pain_points = item.get("pain_points")
+
+        if not pain_points:
+            return {
+                "company_name": company_name,
+                "status": "ok",
+                "company_info": company_info,
+                "identified_pain_points": [],
+                "suggested_pain_points": self.qa_system.suggest_pain_points(company_info),
+                "recommended_projects": [],
+                "conversation_state": "pain_points_needed"
+            }
+
+        return {
+            "company_name": company_name,
+            "status": "ok",
+            "company_info": company_info,
+            "identified_pain_points": pain_points,
+            "recommended_projects": self.qa_system.find_matching_projects(
+                pain_points, company_name, all_projects=catalogue
+            ),
+            "conversation_state": "projects_recommended"
+        }
+
+    def analyze_pack(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Suggest pain points for several companies with packed completions"""
+        company_names = [item["company_name"].strip() for item in items]
+        company_infos = [self._search(name) for name in company_names]
+        suggestions = self.qa_system.suggest_pain_points_batch(company_infos, pack_size=len(company_infos))
+
+        return [
+            {
+                "company_name": company_name,
+                "status": "ok",
+                "company_info": company_info,
+                "identified_pain_points": [],
+                "suggested_pain_points": suggested,
+                "recommended_projects": [],
+                "conversation_state": "pain_points_needed"
+            }
+            for company_name, company_info, suggested in zip(company_names, company_infos, suggestions)
+        ]
+
+    def run(self, items: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Yield one result per company as soon as it completes, then a summary line.
+
+        A company repeated in ``items`` is analysed once; each repeat gets a
+        ``{"status": "duplicate"}`` line instead of a result.
+        """
+        summary = {"total": len(items), "completed": 0, "failed": 0, "resumed": 0, "duplicates": 0}
+        pending = []
+        seen = set()
+
+        for item in items:
+            key = self.company_key(item)
+            if key in seen:
+                summary["duplicates"] += 1
+                yield {"company_name": item["company_name"], "status": "duplicate"}
+                continue
+            seen.add(key)
+            if self.checkpoint and key in self.checkpoint.completed:
+                summary["resumed"] += 1
+                yield {**self.checkpoint.completed[key], "resumed": True}
+            else:
+                pending.append((key, item))
+
+        if pending:
+            # Companies without pain points only need suggestions, which are packed
+            # several to a completion; the rest need the catalogue for matching
+            to_suggest = [(key, item) for key, item in pending if not item.get("pain_points")]
+            to_match = [(key, item) for key, item in pending if item.get("pain_points")]
+            pack_size = max(1, self.pack_size)
+
+            # One snapshot of the catalogue for the whole batch
+            catalogue = []
+            if to_match:
+                try:
+                    catalogue = self.qa_system.get_project_catalogue()
+                except Exception as e:
+                    # Matching is impossible without it; fail those companies and still
+                    # run the suggestions and send the summary
+                    print(f"Error loading the catalogue for batch: {e}")
+                    summary["error"] = f"Catalogue unavailable: {e}"
+                    for key, item in to_match:
+                        summary["failed"] += 1
+                        yield {"company_name": item["company_name"], "status": "error", "error": summary["error"]}
+                    to_match = []
+
+            executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            try:
+                futures = {}
+                for start in range(0, len(to_suggest), pack_size):
+                    pack = to_suggest[start:start + pack_size]
+                    future = executor.submit(self.analyze_pack, [item for _, item in pack])
+                    futures[future] = pack
+                for key, item in to_match:
+                    future = executor.submit(lambda item=item: [self.analyze_one(item, catalogue)])
+                    futures[future] = [(key, item)]
+
+                for future in as_completed(futures):
+                    group = futures[future]
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        for key, item in group:
+                            print(f"Error analyzing {item['company_name']} in batch: {e}")
+                            summary["failed"] += 1
+                            yield {"company_name": item["company_name"], "status": "error", "error": str(e)}
+                        continue
+
+                    for (key, item), result in zip(group, results):
+                        if self.checkpoint:
+                            self.checkpoint.record(key, result)
+                        summary["completed"] += 1
+                        yield result
+            finally:
+                # If the consumer goes away (client disconnect, Ctrl+C) drop queued work;
+                # anything unfinished is picked up again on resume
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        yield {"summary": summary}
+
+    def run_ndjson(self, items: List[Dict[str, Any]]) -> Iterator[str]:
+        """Same as run() but serialised as NDJSON lines"""
+        for result in self.run(items):
+            yield json.dumps(result, default=str) + "\n"
+
+
+# Command line usage:
+#   python batch.py companies.jsonl --out results.ndjson --workers 8 --checkpoint nightly.jsonl
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze many companies at once")
+    parser.add_argument("input", help="JSONL file of companies ('-' for stdin)")
+    parser.add_argument("--out", help="Write NDJSON results here instead of stdout")
+    parser.add_argument("--workers", type=int, default=4, help="Maximum concurrent analyses")
+    parser.add_argument("--checkpoint", help="Checkpoint file; rerun with the same file to resume")
+    parser.add_argument("--pack-size", type=int, default=5,
+                        help="Companies per packed pain point suggestion call (1 disables packing)")
+    args = parser.parse_args()
+
+    if args.input == "-":
+        companies = load_companies_jsonl(sys.stdin)
+    else:
+        with open(args.input, "r", encoding="utf-8") as f:
+            companies = load_companies_jsonl(f)
+
+    from main import qa_system
+
+    analyzer = BatchAnalyzer(qa_system, max_workers=args.workers, checkpoint_path=args.checkpoint,
+                             pack_size=args.pack_size)
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        for line in analyzer.run_ndjson(companies):
+            out.write(line)
+            out.flush()
+    finally:
+        if args.out:
+            out.close()
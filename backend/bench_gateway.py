@@ -0,0 +1,91 @@
+"""Exercise the LLM gateway against the fake OpenAI client.
+
+Runs the same burst of completions directly and through LLMGateway, for a
+flaky provider (errors plus a heavy latency tail) and for an outage, and
+reports success rate, latency percentiles and the gateway's counters
+(retries, hedges, breaker rejections). No network is used.
+
+    python bench_gateway.py --calls 400 --concurrency 32 --output bench_gateway.json
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_graph_db import emit
+from bench_scale import percentiles
+from fakes import FakeBehaviour, FakeOpenAI
+from llm_gateway import CircuitBreaker, LLMGateway, LLMUnavailable
+
+PROMPT = [{"role": "user", "content": 'Return {"pain_points": [...]} for Example Corp'}]
+
+
+def burst(client, calls: int, concurrency: int):
+    latencies, outcomes = [], {}
+
+    def one(_):
+        started = time.perf_counter()
+        try:
+            client.chat.completions.create(model="gpt-4o-mini", messages=PROMPT, max_tokens=200)
+            outcome = "ok"
+        except LLMUnavailable:
+            outcome = "unavailable"
+        except Exception as e:
+            outcome = f"error {getattr(e, 'status_code', type(e).__name__)}"
+        return time.perf_counter() - started, outcome
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for seconds, outcome in pool.map(one, range(calls)):
+            latencies.append(seconds)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    return {
+        "elapsed_seconds": round(time.perf_counter() - started, 2),
+        "success_rate": round(outcomes.get("ok", 0) / calls, 3),
+        "outcomes": outcomes,
+        "latency": percentiles(latencies)
+    }
+
+
+def scenario(name: str, behaviour: dict, args) -> dict:
+    print(f"=== {name} ===")
+    result = {"provider": behaviour}
+    result["direct"] = burst(FakeOpenAI(FakeBehaviour(seed=args.seed, **behaviour)), args.calls, args.concurrency)
+    gateway = LLMGateway(FakeOpenAI(FakeBehaviour(seed=args.seed, **behaviour)), rpm=args.rpm, tpm=args.tpm,
+                         max_concurrency=args.concurrency, deadline=args.deadline,
+                         breaker=CircuitBreaker(failures=5, cooldown=args.deadline), hedge_after=args.hedge_after)
+    # Let the hedge percentile see some latencies before the measured burst
+    burst(gateway, 40, args.concurrency)
+    gateway.counts.clear()
+    result["gateway"] = burst(gateway, args.calls, args.concurrency)
+    result["gateway"]["counters"] = gateway.stats()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare direct and gateway LLM calls on the fake provider")
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--median-ms", type=float, default=40)
+    parser.add_argument("--sigma", type=float, default=1.0, help="Log-normal spread; 1.0 gives a long tail")
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--rpm", type=float, default=60000)
+    parser.add_argument("--tpm", type=float, default=20_000_000)
+    parser.add_argument("--deadline", type=float, default=5.0)
+    parser.add_argument("--hedge-after", default="p90")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = {
+        "calls": args.calls,
+        "concurrency": args.concurrency,
+        "hedge_after": args.hedge_after,
+        "flaky": scenario("flaky provider", {"median_ms": args.median_ms, "sigma": args.sigma,
+                                             "error_rate": args.error_rate}, args),
+        "outage": scenario("outage", {"median_ms": args.median_ms, "error_rate": 1.0}, args),
+    }
+    emit(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Compare the native GraphDB layer with langchain's Neo4jGraph.
+
+Measures import time of each in a fresh interpreter and, if Neo4j is
+reachable, per-query latency for a trivial query (round trip and session
+overhead) and for a 1000 row result (record conversion).
+
+    python bench_graph_db.py --url bolt://localhost:7687 --iterations 200
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+SMALL = "RETURN 1 AS one"
+ROWS = "UNWIND range(1, $n) AS i RETURN i AS id, 'project ' + toString(i) AS name"
+
+
+def import_seconds(statement: str, runs: int = 3):
+    probe = f"import time; t = time.perf_counter(); {statement}; print(time.perf_counter() - t)"
+    times = []
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True)
+        if completed.returncode != 0:
+            return None
+        times.append(float(completed.stdout.strip().splitlines()[-1]))
+    return round(statistics.median(times), 4)
+
+
+def timed(fn, iterations: int):
+    fn()  # warm the pool and the server's plan cache
+    times = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    times.sort()
+    return {
+        "p50_ms": round(times[len(times) // 2], 3),
+        "p95_ms": round(times[int(len(times) * 0.95) - 1], 3),
+        "mean_ms": round(statistics.mean(times), 3)
+    }
+
+
+def emit(report, output):
+    print(json.dumps(report, indent=2))
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the native driver layer against Neo4jGraph")
+    parser.add_argument("--url", default="bolt://localhost:7687")
+    parser.add_argument("--username", default="neo4j")
+    parser.add_argument("--password", default="test1234")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = {
+        "import_seconds": {
+            "graph_db": import_seconds("import graph_db"),
+            "langchain_neo4j": import_seconds("from langchain_neo4j import Neo4jGraph")
+        }
+    }
+
+    from graph_db import GraphDB
+    db = GraphDB(args.url, args.username, args.password)
+    try:
+        db.verify()
+    except Exception as e:
+        report["queries"] = f"skipped, Neo4j not reachable: {e}"
+        emit(report, args.output)
+        return
+
+    db.prepare("bench_rows", ROWS)
+    params = {"n": args.rows}
+    queries = {
+        "graph_db.query": {
+            "small": timed(lambda: db.query(SMALL), args.iterations),
+            "rows": timed(lambda: db.query(ROWS, params), args.iterations)
+        },
+        "graph_db.query_raw": {
+            "small": timed(lambda: db.query(SMALL, raw=True), args.iterations),
+            "rows": timed(lambda: db.query(ROWS, params, raw=True), args.iterations)
+        },
+        "graph_db.run_prepared_raw": {
+            "rows": timed(lambda: db.run("bench_rows", params, raw=True), args.iterations)
+        }
+    }
+
+    try:
+        from langchain_neo4j import Neo4jGraph
+    except ImportError:
+        Neo4jGraph = None
+    if Neo4jGraph is not None:
+        graph = Neo4jGraph(url=args.url, username=args.username, password=args.password, refresh_schema=False)
+        queries["langchain.Neo4jGraph.query"] = {
+            "small": timed(lambda: graph.query(SMALL), args.iterations),
+            "rows": timed(lambda: graph.query(ROWS, params), args.iterations)
+        }
+
+    report["queries"] = queries
+    report["rows"] = args.rows
+    report["iterations"] = args.iterations
+    db.close()
+    emit(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Index benchmark over a synthetic catalogue.
+
+Loads a seeded synthetic graph (100k projects by default), times the
+service queries without the indexes, creates them with
+ProjectGraphBuilder.create_indexes, checks the plans of the indexed service
+reads (graph.INDEXED_READS) use them and times everything again. Exits
+non-zero when one of them does not.
+
+SHARES_PAIN_POINTS edges are generated directly (a few random neighbours
+per project) rather than with create_similarity_relationships, whose
+pairwise join does not finish on a Zipfian 100k graph.
+
+Needs a running Neo4j that may be wiped:
+
+    python bench_indexes.py --projects 100000 --output bench_indexes.json
+"""
+import argparse
+import random
+import time
+
+from bench_graph_db import emit, timed
+from graph import INDEXES, ProjectGraphBuilder
+from queries import QUERIES, WARM_PARAMS
+from synthetic import generate_projects
+
+SHARES_QUERY = """
+UNWIND $pairs AS pair
+MATCH (a:Project {id: pair[0]}), (b:Project {id: pair[1]})
+CREATE (a)-[:SHARES_PAIN_POINTS {count: pair[2]}]->(b)
+"""
+
+
+def run_auto_commit(builder, query):
+    """Statements with CALL ... IN TRANSACTIONS cannot run inside a managed transaction"""
+    with builder.graph.driver.session(database=builder.graph.database) as session:
+        session.run(query).consume()
+
+
+def time_queries(builder, iterations):
+    results = {}
+    for name, query in QUERIES.items():
+        if name == "project_catalogue":
+            continue  # full catalogue read, no index can help
+        params = WARM_PARAMS.get(name, {})
+        results[f"service:{name}"] = timed(lambda: builder.graph.query(query, params, raw=True), iterations)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the read-path indexes on a synthetic graph")
+    parser.add_argument("--url", default="bolt://localhost:7687")
+    parser.add_argument("--username", default="neo4j")
+    parser.add_argument("--password", default="test1234")
+    parser.add_argument("--projects", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--shares-per-project", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    builder = ProjectGraphBuilder(args.url, args.username, args.password)
+    report = {"projects": args.projects, "seed": args.seed}
+
+    started = time.perf_counter()
+    run_auto_commit(builder, "MATCH (n) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS")
+    for index in INDEXES:
+        name = index.split(" IF NOT EXISTS")[0].split("INDEX ")[1]
+        builder.graph.query(f"DROP INDEX {name} IF EXISTS", write=True)
+    builder.create_constraints()
+    builder.bulk_load(generate_projects(args.projects, seed=args.seed), batch_size=args.batch_size)
+    builder.create_aggregate_relationships()
+
+    rng = random.Random(args.seed)
+    ids = [f"synthetic-{i:07d}" for i in range(args.projects)]
+    pairs = []
+    for project_id in ids:
+        for neighbour in rng.sample(ids, min(args.shares_per_project, len(ids) - 1)):
+            if neighbour != project_id:
+                pairs.append([project_id, neighbour, rng.randint(1, 5)])
+        if len(pairs) >= 10000:
+            builder.graph.query(SHARES_QUERY, {"pairs": pairs}, write=True)
+            pairs = []
+    if pairs:
+        builder.graph.query(SHARES_QUERY, {"pairs": pairs}, write=True)
+    report["load_seconds"] = round(time.perf_counter() - started, 1)
+    report["counts"] = builder.graph.query(
+        "CALL { MATCH (n) RETURN count(n) AS nodes } CALL { MATCH ()-[r]->() RETURN count(r) AS relationships } "
+        "RETURN nodes, relationships"
+    )[0]
+
+    report["without_indexes"] = time_queries(builder, args.iterations)
+
+    started = time.perf_counter()
+    builder.create_indexes()
+    report["index_build_seconds"] = round(time.perf_counter() - started, 1)
+    report["plans"] = builder.verify_index_usage()
+    report["with_indexes"] = time_queries(builder, args.iterations)
+
+    report["speedup_p50"] = {
+        name: round(before["p50_ms"] / max(report["with_indexes"][name]["p50_ms"], 1e-6), 1)
+        for name, before in report["without_indexes"].items()
+    }
+    builder.graph.close()
+    emit(report, args.output)
+    if report["plans"]["missing"]:
+        raise SystemExit(f"Service queries not using their index: {', '.join(report['plans']['missing'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Scale benchmark: build a synthetic graph of each size and load-test the API on it.
+
+For every size it records load, similarity, aggregate and index build
+times, node, relationship and SHARES_* edge counts, memory, and
+p50/p95/p99 latency of the main endpoints. OpenAI and SerpAPI are replaced
+by the fake providers (LLM_PROVIDER=fake, SERP_PROVIDER=fake; set FAKE_LLM_*
+to add simulated latency), so only Neo4j is needed (and it is wiped).
+Results go to a JSON file for comparison between commits.
+
+    python bench_scale.py --sizes 1000,10000,100000 --requests 50 --output bench_scale.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Dict, List
+
+from bench_indexes import run_auto_commit
+from fakes import isolate_state
+from graph import ProjectGraphBuilder
+from synthetic import generate_projects
+
+SHARES_TYPES = ["SHARES_PAIN_POINTS", "SHARES_CAPABILITIES", "SHARES_INDUSTRIES", "SHARES_TECHNOLOGIES",
+                "SHARES_DOMAINS"]
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def at(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {"n": len(ordered), "p50_ms": at(0.50), "p95_ms": at(0.95), "p99_ms": at(0.99),
+            "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2)}
+
+
+def pair_upper_bounds(counters: Dict[str, Counter]) -> Dict[str, int]:
+    """Project pairs a SHARES_* join has to consider: sum of k*(k-1)/2 over shared items"""
+    return {name: sum(k * (k - 1) // 2 for k in counter.values()) for name, counter in counters.items()}
+
+
+def build(builder: ProjectGraphBuilder, size: int, seed: int, batch_size: int, similarity_max: int) -> Dict:
+    result = {"projects": size}
+    counters = {t: Counter() for t in SHARES_TYPES}
+
+    def tallied():
+        for project in generate_projects(size, seed=seed):
+            counters["SHARES_PAIN_POINTS"].update(project["pain_points"])
+            counters["SHARES_CAPABILITIES"].update(project["capabilities"])
+            counters["SHARES_INDUSTRIES"].update(project["industries"])
+            counters["SHARES_TECHNOLOGIES"].update(builder.extract_technologies_from_summary(project["summary"]))
+            counters["SHARES_DOMAINS"].update(builder.categorize_into_domains(
+                project["industries"], project["capabilities"], project["pain_points"]))
+            yield project
+
+    run_auto_commit(builder, "MATCH (n) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS")
+    builder.create_constraints()
+
+    started = time.perf_counter()
+    builder.bulk_load(tallied(), batch_size=batch_size)
+    result["load_seconds"] = round(time.perf_counter() - started, 2)
+    result["pair_upper_bound"] = pair_upper_bounds(counters)
+
+    if size <= similarity_max:
+        started = time.perf_counter()
+        builder.create_similarity_relationships()
+        result["similarity_seconds"] = round(time.perf_counter() - started, 2)
+    else:
+        result["similarity_seconds"] = f"skipped above {similarity_max} projects"
+
+    started = time.perf_counter()
+    builder.create_aggregate_relationships()
+    result["aggregate_seconds"] = round(time.perf_counter() - started, 2)
+
+    started = time.perf_counter()
+    builder.create_indexes()
+    result["index_seconds"] = round(time.perf_counter() - started, 2)
+
+    result["counts"] = builder.graph.query(
+        "CALL { MATCH (n) RETURN count(n) AS nodes } CALL { MATCH ()-[r]->() RETURN count(r) AS relationships } "
+        "RETURN nodes, relationships"
+    )[0]
+    result["shares_edges"] = {
+        t: builder.graph.query(f"MATCH ()-[r:{t}]->() RETURN count(r) AS c")[0]["c"] for t in SHARES_TYPES
+    }
+    try:
+        heap = builder.graph.query(
+            "CALL dbms.queryJmx('java.lang:type=Memory') YIELD attributes "
+            "RETURN attributes.HeapMemoryUsage.value.properties.used AS used"
+        )
+        result["neo4j_heap_used_mb"] = round(heap[0]["used"] / 2 ** 20, 1)
+    except Exception as e:
+        result["neo4j_heap_used_mb"] = f"unavailable: {e}"
+    return result
+
+
+def load_test(main, requests_per_endpoint: int) -> Dict:
+    """Replay the chatbot flow through the API and time each endpoint"""
+    from fastapi.testclient import TestClient
+
+    latencies = {name: [] for name in ("analyze_company", "analyze_company_with_pain_points",
+                                      "project_interest", "ask")}
+    errors = Counter()
+    sample_questions = [
+        "What projects use AI technology?",
+        "Which projects share the most pain points?",
+        "What are the most common capabilities across all projects?",
+        "Which projects are deployed vs not deployed?",
+    ]
+
+    def timed(name, method, path, payload=None):
+        started = time.perf_counter()
+        response = method(path, json=payload) if payload is not None else method(path)
+        latencies[name].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            errors[name] += 1
+            return None
+        return response.json()
+
+    with TestClient(main.app) as client:
+        for i in range(requests_per_endpoint):
+            company = f"Benchmark Company {i}"
+            first = timed("analyze_company", client.post, "/analyze-company", {"company_name": company})
+            pain_points = (first or {}).get("suggested_pain_points") or ["manual invoice processing"]
+            second = timed("analyze_company_with_pain_points", client.post, "/analyze-company",
+                           {"company_name": company, "pain_points": pain_points[:3]})
+            projects = (second or {}).get("recommended_projects") or []
+            if projects:
+                timed("project_interest", client.post, "/project-interest", {
+                    "company_name": company, "project_id": projects[0]["project_id"],
+                    "user_interest": "Reduce manual work", "current_systems": "Salesforce, SAP"
+                })
+            timed("ask", client.post, "/ask", {"question": sample_questions[i % len(sample_questions)]})
+
+    return {
+        "endpoints": {name: {**percentiles(samples), "errors": errors[name]} for name, samples in latencies.items()},
+        "llm_calls": dict(main.qa_system.client.calls)
+    }
+
+
+def import_main(url: str, username: str, password: str):
+    """Import the API with temporary state files, fake LLM/SERP providers and the benchmark database"""
+    isolate_state("bench_scale_")
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["SERP_PROVIDER"] = "fake"
+
+    import main
+    main.qa_system.neo4j_url, main.qa_system.username, main.qa_system.password = url, username, password
+    return main
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build synthetic graphs of several sizes and benchmark the API")
+    parser.add_argument("--url", default="bolt://localhost:7687")
+    parser.add_argument("--username", default="neo4j")
+    parser.add_argument("--password", default="test1234")
+    parser.add_argument("--sizes", default="1000,10000", help="Comma separated project counts (1k to 1M)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--similarity-max", type=int, default=20000,
+                        help="Skip create_similarity_relationships above this many projects")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per endpoint per size")
+    parser.add_argument("--output", default="bench_scale.json")
+    args = parser.parse_args()
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    report = {
+        "meta": {"commit": commit, "seed": args.seed, "python": sys.version.split()[0],
+                 "platform": platform.platform(), "started_at": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "runs": []
+    }
+
+    builder = ProjectGraphBuilder(args.url, args.username, args.password)
+    api = import_main(args.url, args.username, args.password)
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        print(f"=== {size} projects ===")
+        run = build(builder, size, args.seed, args.batch_size, args.similarity_max)
+        # The API caches the schema and industries; drop them so they reflect this graph
+        api.qa_system._industries = None
+        api.qa_system.schema_service.snapshot(force=True)
+        run.update(load_test(api, args.requests))
+        run["python_peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        report["runs"].append(run)
+
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+
+    builder.graph.close()
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
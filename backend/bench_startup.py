@@ -0,0 +1,81 @@
+"""Cold-start benchmark for the API.
+
+Each run starts a fresh interpreter, imports main and runs the FastAPI
+lifespan startup, which is everything that happens before uvicorn accepts
+connections. Neo4j and OpenAI need not be reachable: both connect lazily.
+
+    python bench_startup.py --runs 5 --budget 1.5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r"""
+import asyncio, json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def startup():
+    async with main.app.router.lifespan_context(main.app):
+        ready = time.perf_counter()
+    return ready
+
+ready = asyncio.run(startup())
+print(json.dumps({
+    "import_seconds": imported - started,
+    "startup_seconds": ready - started,
+    "langchain_loaded": any(m.startswith("langchain") for m in sys.modules),
+    "openai_loaded": "openai" in sys.modules
+}))
+"""
+
+
+def run_once(env):
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True, timeout=120
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip()[-2000:])
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API cold-start time against a budget")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=float(os.getenv("STARTUP_BUDGET_SECONDS", "1.5")),
+                        help="Maximum acceptable median startup time in seconds")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("JOBS_DB_PATH", os.path.join(os.getenv("TMPDIR", "/tmp"), "bench_startup_jobs.db"))
+    # Measure binding, not connecting
+    env["CONNECT_ON_STARTUP"] = "false"
+
+    runs = [run_once(env) for _ in range(args.runs)]
+    startup = [r["startup_seconds"] for r in runs]
+    report = {
+        "runs": args.runs,
+        "budget_seconds": args.budget,
+        "import_seconds_median": round(statistics.median(r["import_seconds"] for r in runs), 3),
+        "startup_seconds_median": round(statistics.median(startup), 3),
+        "startup_seconds_max": round(max(startup), 3),
+        "langchain_loaded_at_startup": any(r["langchain_loaded"] for r in runs),
+        "openai_loaded_at_startup": any(r["openai_loaded"] for r in runs),
+    }
+    report["within_budget"] = report["startup_seconds_median"] <= args.budget
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(0 if report["within_budget"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Structured catalogue browsing from an in-memory snapshot, without the LLM.
+
+The snapshot holds every project with its pain points, capabilities,
+industries, technologies, domains and regulations, sorted by (name, id),
+with an inverted index per facet. It is reloaded from the graph at most
+every CATALOGUE_SNAPSHOT_TTL seconds, and its version is a hash of its
+content.
+
+Filters combine across facets with AND, and repeated values of one facet
+with OR. Matching ignores case:
+
+    GET /catalogue/projects?industry=Retail&industry=Healthcare&technology=LLM&limit=20
+
+Pages are keyset paginated. ``next_cursor`` encodes the (name, id) of the
+last project returned, and the next page starts after it. A cursor stays
+valid when the snapshot changes underneath it: it never skips or repeats
+projects that were already there.
+
+Every response carries an ETag derived from the snapshot version and the
+normalised request, so a client's If-None-Match gets a 304 until the
+catalogue changes.
+"""
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+CATALOGUE_SNAPSHOT_TTL = float(os.getenv("CATALOGUE_SNAPSHOT_TTL", "60"))
+CATALOGUE_PAGE_SIZE = 20
+CATALOGUE_MAX_PAGE_SIZE = 100
+
+# Query parameter -> project field
+FACETS = {
+    "industry": "industries",
+    "capability": "capabilities",
+    "technology": "technologies",
+    "domain": "domains",
+    "regulation": "regulations",
+    "deployment_status": "deployment_status",
+}
+
+LIST_FIELDS = ("pain_points", "capabilities", "industries", "technologies", "domains", "regulations")
+PROJECT_FIELDS = ("id", "name", "summary", "url", "deployment_status") + LIST_FIELDS
+
+
+def _sort_key(project: Dict[str, Any]) -> Tuple[str, str]:
+    return ((project["name"] or "").lower(), project["id"])
+
+
+def encode_cursor(key: Tuple[str, str]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """The (name, id) key a cursor points after; ValueError if it is not one of ours"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not (isinstance(key, list) and len(key) == 2 and all(isinstance(k, str) for k in key)):
+        raise ValueError("Invalid cursor")
+    return key[0], key[1]
+
+
+def etag(version: str, *parts: Any) -> str:
+    digest = hashlib.sha1(json.dumps([version, *parts], sort_keys=True, default=str).encode("utf-8"))
+    return f'"{digest.hexdigest()[:24]}"'
+
+
+def not_modified(if_none_match: Optional[str], tag: str) -> bool:
+    """Whether an If-None-Match header matches ``tag`` (weak comparison, as for GET)"""
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidates or tag in (c[2:] if c.startswith("W/") else c for c in candidates)
+
+
+class CatalogueSnapshot:
+    """Projects sorted by (name, id) with an inverted index per facet"""
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        projects = []
+        for row in rows:
+            project = {field: row[f"p.{field}"] if f"p.{field}" in row else row.get(field) for field in PROJECT_FIELDS}
+            for field in LIST_FIELDS:
+                project[field] = sorted(set(project[field] or []))
+            projects.append(project)
+        projects.sort(key=_sort_key)
+        self.projects = projects
+        self.keys = [_sort_key(p) for p in projects]
+        self.version = hashlib.sha1(json.dumps(projects, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        self.built_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+        self.index: Dict[str, Dict[str, List[int]]] = {facet: {} for facet in FACETS}
+        self.labels: Dict[str, Dict[str, str]] = {facet: {} for facet in FACETS}
+        for position, project in enumerate(projects):
+            for facet, field in FACETS.items():
+                values = project[field] if isinstance(project[field], list) else [project[field]]
+                for value in values:
+                    if value:
+                        self.index[facet].setdefault(value.lower(), []).append(position)
+                        self.labels[facet].setdefault(value.lower(), value)
+
+    def matching(self, filters: Dict[str, Sequence[str]]) -> Optional[List[int]]:
+        """Sorted positions of the projects passing every facet filter; None when nothing is filtered"""
+        selected = None
+        for facet, values in filters.items():
+            if not values:
+                continue
+            positions = set()
+            for value in values:
+                positions.update(self.index[facet].get(value.strip().lower(), ()))
+            selected = positions if selected is None else selected & positions
+            if not selected:
+                return []
+        return None if selected is None else sorted(selected)
+
+    def page(self, filters: Dict[str, Sequence[str]], limit: int = CATALOGUE_PAGE_SIZE,
+             cursor: Optional[str] = None) -> Dict[str, Any]:
+        positions = self.matching(filters)
+        total = len(self.projects) if positions is None else len(positions)
+        start = bisect_right(self.keys, decode_cursor(cursor)) if cursor else 0
+        if positions is None:
+            selected = range(start, min(start + limit + 1, len(self.projects)))
+        else:
+            offset = bisect_left(positions, start)
+            selected = positions[offset:offset + limit + 1]
+
+        projects = [self.projects[i] for i in selected[:limit]]
+        has_more = len(selected) > limit
+        return {
+            "projects": projects,
+            "count": len(projects),
+            "total": total,
+            "next_cursor": encode_cursor(_sort_key(projects[-1])) if has_more else None,
+            "snapshot": {"version": self.version, "built_at": self.built_at}
+        }
+
+    def facets(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Each facet's values with their project counts, most common first"""
+        return {
+            facet: [{"value": self.labels[facet][key], "projects": len(positions)}
+                    for key, positions in sorted(index.items(), key=lambda item: (-len(item[1]), item[0]))]
+            for facet, index in self.index.items()
+        }
+
+
+class CatalogueBrowser:
+    """Keeps the snapshot fresh; the loader returns catalogue_snapshot rows"""
+
+    def __init__(self, loader: Callable[[], List[Dict[str, Any]]], ttl: float = CATALOGUE_SNAPSHOT_TTL):
+        self.loader = loader
+        self.ttl = ttl
+        self.counts = Counter()
+        self._snapshot: Optional[CatalogueSnapshot] = None
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def snapshot(self) -> CatalogueSnapshot:
+        """The current snapshot, reloaded when older than the TTL; the old one is kept if reloading fails"""
+        with self._lock:
+            now = time.monotonic()
+            if self._snapshot is None or now - self._loaded_at >= self.ttl:
+                try:
+                    snapshot = CatalogueSnapshot(self.loader())
+                    self.counts["loads"] += 1
+                    if self._snapshot is None or snapshot.version != self._snapshot.version:
+                        self._snapshot = snapshot
+                        self.counts["versions"] += 1
+                except Exception as e:
+                    if self._snapshot is None:
+                        raise
+                    print(f"Error reloading the catalogue snapshot, serving the previous one: {e}")
+                self._loaded_at = now
+            return self._snapshot
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "projects": len(snapshot.projects) if snapshot else 0,
+            "version": snapshot.version if snapshot else None,
+            "built_at": snapshot.built_at if snapshot else None,
+            **self.counts
+        }
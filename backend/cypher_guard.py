@@ -0,0 +1,215 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Clauses that modify data or schema, or administer the DBMS
+WRITE_CLAUSE_RE = re.compile(
+    r"\b(CREATE|MERGE|DELETE|DETACH|SET|REMOVE|DROP|FOREACH|LOAD\s+CSV|GRANT|DENY|REVOKE|ALTER|RENAME|"
+    r"TERMINATE|ENABLE|DISABLE)\b",
+    re.IGNORECASE
+)
+# Procedures LLM generated queries may call; everything else (apoc.*, dbms.*, gds.*) is rejected
+READ_ONLY_PROCEDURES = {
+    "db.labels", "db.relationshiptypes", "db.propertykeys", "db.schema.visualization",
+    "db.schema.nodetypeproperties", "db.schema.reltypeproperties"
+}
+PROCEDURE_CALL_RE = re.compile(r"\bCALL\s+([A-Za-z_][\w.]*)\s*\(", re.IGNORECASE)
+STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+BACKTICK_RE = re.compile(r"`[^`]*`")
+COMMENT_RE = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+NUMBER_RE = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+CLAUSE_START_RE = re.compile(r"(OPTIONAL\s+MATCH|MATCH|CALL|WITH|UNWIND|RETURN)\b", re.IGNORECASE)
+LIMIT_RE = re.compile(r"\bLIMIT\s+(\d+)\s*$", re.IGNORECASE)
+
+
+class QueryRejected(ValueError):
+    """The generated query is not safe or too expensive to run"""
+
+
+class QueryFailed(QueryRejected):
+    """The query could not be planned (syntax error, unknown function, ...); ``code`` is the Neo4j status code"""
+
+    def __init__(self, message: str, code: Optional[str] = None):
+        super().__init__(message)
+        self.code = code
+
+
+def _mask(query: str) -> str:
+    """Replace comments, string literals and quoted identifiers with same-length placeholders.
+
+    Keeps offsets intact so positions found in the masked text apply to the
+    original query, while keywords inside literals ('Set up', `Create`) no
+    longer match.
+    """
+    def blank(match):
+        return match.group(0)[0] + "_" * (len(match.group(0)) - 2) + match.group(0)[-1]
+
+    masked = COMMENT_RE.sub(lambda m: " " * len(m.group(0)), query)
+    masked = STRING_RE.sub(blank, masked)
+    return BACKTICK_RE.sub(blank, masked)
+
+
+def fingerprint(query: str) -> str:
+    """Shape of a query with literals removed, so 'AI' and 'HR' variants share a cache entry"""
+    text = COMMENT_RE.sub(" ", query)
+    text = STRING_RE.sub("?", text)
+    text = NUMBER_RE.sub("?", text)
+    return re.sub(r"\s+", " ", text).strip().rstrip(";").strip()
+
+
+def validate_read_only(query: str):
+    """Raise QueryRejected unless the query is a single read-only statement"""
+    masked = _mask(query).strip().rstrip(";")
+    if not masked.strip():
+        raise QueryRejected("Empty query")
+    if ";" in masked:
+        raise QueryRejected("Multiple statements are not allowed")
+
+    write_clause = WRITE_CLAUSE_RE.search(masked)
+    if write_clause:
+        raise QueryRejected(f"Write clause {write_clause.group(1).upper()} is not allowed")
+
+    for match in PROCEDURE_CALL_RE.finditer(masked):
+        if match.group(1).lower() not in READ_ONLY_PROCEDURES:
+            raise QueryRejected(f"Procedure {match.group(1)} is not allowed")
+
+
+def is_well_formed(query: str) -> bool:
+    """Cheap local parse check of a generated query, without a database round trip.
+
+    Read-only, starts with a clause, has a RETURN (or is a procedure call)
+    and balanced brackets outside literals. Catches prose answers and
+    truncated output; schema mistakes still surface at EXPLAIN.
+    """
+    try:
+        validate_read_only(query)
+    except QueryRejected:
+        return False
+    masked = _mask(query).strip().rstrip(";")
+    if not CLAUSE_START_RE.match(masked):
+        return False
+    if not re.search(r"\bRETURN\b", masked, re.IGNORECASE) and not PROCEDURE_CALL_RE.search(masked):
+        return False
+    depth = []
+    for ch in masked:
+        if ch in "([{":
+            depth.append(ch)
+        elif ch in ")]}":
+            if not depth or "([{"[")]}".index(ch)] != depth.pop():
+                return False
+    return not depth
+
+
+def ensure_limit(query: str, limit: int) -> str:
+    """Make sure the query returns at most ``limit`` rows.
+
+    A trailing LIMIT larger than ``limit`` is lowered; a missing one is
+    appended. Each branch of a UNION is limited separately.
+    """
+    query = query.strip().rstrip(";").strip()
+    masked = _mask(query)
+
+    if not re.search(r"\bRETURN\b", masked, re.IGNORECASE):
+        # Bare procedure calls (CALL db.labels()) have tiny results
+        return query
+
+    union = re.search(r"\bUNION(\s+ALL)?\b", masked, re.IGNORECASE)
+    if union:
+        head = ensure_limit(query[:union.start()], limit)
+        tail = ensure_limit(query[union.end():], limit)
+        return f"{head}\n{query[union.start():union.end()]}\n{tail}"
+
+    if re.search(r"\bLIMIT\s+\$\w+\s*$", masked, re.IGNORECASE):
+        # Parameterised limit; LLM queries never use parameters, so leave it be
+        return query
+
+    existing = LIMIT_RE.search(masked)
+    if existing:
+        if int(existing.group(1)) > limit:
+            return query[:existing.start(1)] + str(limit) + query[existing.end(1):]
+        return query
+
+    return f"{query}\nLIMIT {limit}"
+
+
+def _plan_estimates(plan: Dict[str, Any]) -> Tuple[float, str]:
+    """Largest EstimatedRows of any operator in an EXPLAIN plan, and that operator"""
+    args = plan.get("args") or {}
+    worst = (float(args.get("EstimatedRows") or 0), plan.get("operatorType", "?"))
+    for child in plan.get("children") or []:
+        worst = max(worst, _plan_estimates(child))
+    return worst
+
+
+class CypherGuard:
+    """Safety and cost gate for LLM generated Cypher.
+
+    ``check`` rejects writes, caps the row count with a LIMIT and runs
+    EXPLAIN to compare the planner's row estimates against a budget. EXPLAIN
+    only plans the query, so it costs one round trip and no data access;
+    verdicts are cached by query fingerprint so repeat shapes skip it.
+    (EXPLAIN has no db hit counts - those need PROFILE, which executes the
+    query - so the budget is on estimated rows of the widest operator.)
+    """
+
+    def __init__(self, driver, database: Optional[str] = None, max_rows: int = 1000,
+                 max_estimated_rows: float = 1_000_000, cache_size: int = 1024):
+        self.driver = driver
+        self.database = database
+        self.max_rows = max_rows
+        self.max_estimated_rows = max_estimated_rows
+        self.cache_size = cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._verdicts: "OrderedDict[str, Tuple[bool, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def explain(self, query: str) -> Dict[str, Any]:
+        """Planner estimate for ``query`` without executing it"""
+        with self.driver.session(database=self.database) as session:
+            summary = session.run(f"EXPLAIN {query}").consume()
+        plan = summary.plan or {}
+        if not isinstance(plan, dict):
+            plan = dict(plan)
+        estimated_rows, operator = _plan_estimates(plan)
+        return {"estimated_rows": estimated_rows, "widest_operator": operator}
+
+    def check(self, query: str) -> str:
+        """Return the query to execute (with LIMIT), or raise QueryRejected"""
+        validate_read_only(query)
+        safe_query = ensure_limit(query, self.max_rows)
+        key = fingerprint(safe_query)
+
+        with self._lock:
+            verdict = self._verdicts.get(key)
+            if verdict is not None:
+                self._verdicts.move_to_end(key)
+                self.cache_hits += 1
+        if verdict is None:
+            self.cache_misses += 1
+            try:
+                estimate = self.explain(safe_query)
+            except Exception as e:
+                # Syntax and semantic errors surface here, before execution
+                raise QueryFailed(f"Query failed to plan: {e}", code=getattr(e, "code", None))
+
+            if estimate["estimated_rows"] > self.max_estimated_rows:
+                verdict = (False, (
+                    f"Query too expensive: {estimate['widest_operator']} is estimated at "
+                    f"{int(estimate['estimated_rows'])} rows (budget {int(self.max_estimated_rows)})"
+                ))
+            else:
+                verdict = (True, "")
+            with self._lock:
+                self._verdicts[key] = verdict
+                while len(self._verdicts) > self.cache_size:
+                    self._verdicts.popitem(last=False)
+
+        allowed, reason = verdict
+        if not allowed:
+            raise QueryRejected(reason)
+        return safe_query
+
+    def stats(self) -> Dict[str, Any]:
+        return {"cached_plans": len(self._verdicts), "hits": self.cache_hits, "misses": self.cache_misses}
@@ -0,0 +1,261 @@
+import difflib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from cypher_guard import STRING_RE, NUMBER_RE, COMMENT_RE, _mask, fingerprint
+from llm_json import strip_code_fences
+from model_router import router
+
+REPAIR_CACHE_PATH = os.getenv("CYPHER_REPAIR_CACHE_PATH", "cypher_repairs.json")
+
+SCHEMA_NODE_RE = re.compile(r"-\s*(\w+)\s*:\s*\{([^}]*)\}")
+SCHEMA_REL_RE = re.compile(r"\[:(\w+)\]")
+PROPERTY_RE = re.compile(r"\b([A-Za-z_]\w*)\.([A-Za-z_]\w*)\b")
+NODE_VAR_RE = re.compile(r"\(\s*([A-Za-z_]\w*)\s*:\s*`?([A-Za-z_]\w*)`?")
+REL_VAR_RE = re.compile(r"\[\s*([A-Za-z_]\w*)\s*:\s*`?([A-Za-z_]\w*)`?")
+NODE_MAP_RE = re.compile(r"\(\s*\w*\s*:\s*`?([A-Za-z_]\w*)`?\s*\{([^}]*)\}")
+MAP_KEY_RE = re.compile(r"(?:^|,)\s*([A-Za-z_]\w*)\s*:")
+# "AS Project Name" or "AS similarity-type" -> the alias needs backticks
+BAD_ALIAS_RE = re.compile(
+    r"\bAS\s+((?:[A-Za-z_][\w-]*)(?:[ \t]+(?!(?:ORDER|LIMIT|SKIP|UNION|WHERE|WITH|RETURN|MATCH)\b)[A-Za-z_][\w-]*)+|[A-Za-z_]\w*-[\w-]+)",
+    re.IGNORECASE
+)
+
+
+def schema_from_context(schema_context: str) -> Dict[str, Any]:
+    """Parse the textual schema used in prompts into labels, properties and relationship types"""
+    labels = {
+        label: [p.strip() for p in props.split(",") if p.strip()]
+        for label, props in SCHEMA_NODE_RE.findall(schema_context)
+    }
+    relationships = sorted(set(SCHEMA_REL_RE.findall(schema_context)))
+    return {"labels": labels, "relationships": relationships, "relationship_properties": {}}
+
+
+def _norm(name: str) -> str:
+    return name.lower().replace("_", "")
+
+
+def _closest(name: str, options: List[str], cutoff: float) -> Optional[str]:
+    for option in options:
+        if _norm(option) == _norm(name):
+            return option
+    matches = difflib.get_close_matches(name, options, n=1, cutoff=cutoff)
+    return matches[0] if matches else None
+
+
+def _literals(query: str) -> List[str]:
+    text = COMMENT_RE.sub(" ", query)
+    return [m.group(0) for m in re.finditer(f"{STRING_RE.pattern}|{NUMBER_RE.pattern}", text)]
+
+
+class CypherRepairer:
+    """Fixes generated Cypher that failed to plan or run.
+
+    Tries, in order: a cached fix for the same query shape, local rewrite
+    rules against the schema (misspelt or mis-cased labels, relationship
+    types and properties, aliases that need backticks) and finally an LLM
+    call that gets the error and the schema. Successful fixes are cached by
+    the fingerprint of the failing query, with its literals turned into
+    placeholders, so the next query of that shape is fixed without a call.
+    """
+
+    def __init__(self, client, schema_service, cache_path: Optional[str] = REPAIR_CACHE_PATH,
+                 cache_size: int = 2048):
+        self.client = client
+        self.schema_service = schema_service
+        self.cache_path = cache_path
+        self.cache_size = cache_size
+        self.counts = {"cache": 0, "rules": 0, "llm": 0, "failed": 0}
+        self._fixes: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Serialises cache file writes
+        self._save_lock = threading.Lock()
+
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    self._fixes.update(json.load(f))
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Error loading Cypher repair cache: {e}")
+
+    @property
+    def schema(self) -> Dict[str, Any]:
+        return self.schema_service.structure()
+
+    @property
+    def schema_context(self) -> str:
+        return self.schema_service.prompt()
+
+    # Cached fixes
+
+    def cached_fix(self, query: str) -> Optional[str]:
+        with self._lock:
+            template = self._fixes.get(fingerprint(query))
+        if template is None:
+            return None
+        literals = _literals(query)
+        try:
+            return re.sub(r"\x00(\d+)\x00", lambda m: literals[int(m.group(1))], template)
+        except IndexError:
+            return None
+
+    def remember(self, failing_query: str, fixed_query: str):
+        """Cache the fix for the failing query's shape"""
+        literals = _literals(failing_query)
+
+        def placeholder(match):
+            value = match.group(0)
+            return f"\x00{literals.index(value)}\x00" if value in literals else value
+
+        template = re.sub(f"{STRING_RE.pattern}|{NUMBER_RE.pattern}", placeholder, fixed_query)
+        with self._lock:
+            self._fixes[fingerprint(failing_query)] = template
+            self._fixes.move_to_end(fingerprint(failing_query))
+            while len(self._fixes) > self.cache_size:
+                self._fixes.popitem(last=False)
+        self._save()
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        with self._save_lock:
+            # Taken under the save lock, so the last write carries every fix remembered before it
+            with self._lock:
+                snapshot = dict(self._fixes)
+            # The pid keeps other processes off our temp file
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(snapshot, f)
+                os.replace(tmp_path, self.cache_path)
+            except OSError as e:
+                print(f"Error saving Cypher repair cache: {e}")
+
+    # Local rewrite rules
+
+    def apply_rules(self, query: str) -> str:
+        """Deterministic fixes for common mistakes; returns the query unchanged if none apply"""
+        schema = self.schema
+        labels = list(schema.get("labels", {}).keys())
+        relationships = list(schema.get("relationships", []))
+        masked = _mask(query)
+        edits: List[Tuple[int, int, str]] = []
+
+        # Labels inside (...) and relationship types inside [...]
+        depth = []
+        for i, ch in enumerate(masked):
+            if ch in "([{":
+                depth.append(ch)
+            elif ch in ")]}" and depth:
+                depth.pop()
+            elif ch in ":|" and depth and depth[-1] in "([":
+                match = re.match(r"\s*([A-Za-z_]\w*)", masked[i + 1:])
+                if not match or (ch == "|" and depth[-1] != "["):
+                    continue
+                name = match.group(1)
+                start = i + 1 + match.start(1)
+                options = labels if depth[-1] == "(" else relationships
+                if options and name not in options:
+                    fixed = _closest(name, options, cutoff=0.75)
+                    if fixed:
+                        edits.append((start, start + len(name), fixed))
+
+        # Properties of variables whose label is known
+        var_labels = {}
+        for var, label in NODE_VAR_RE.findall(masked):
+            var_labels[var] = _closest(label, labels, cutoff=0.75) or label
+        rel_props = schema.get("relationship_properties", {})
+        for var, rel_type in REL_VAR_RE.findall(masked):
+            rel_type = _closest(rel_type, relationships, cutoff=0.75) or rel_type
+            var_labels[var] = ("rel", rel_type)
+
+        for match in PROPERTY_RE.finditer(masked):
+            var, prop = match.group(1), match.group(2)
+            owner = var_labels.get(var)
+            if owner is None:
+                continue
+            if isinstance(owner, tuple):
+                props = rel_props.get(owner[1], [])
+            else:
+                props = schema.get("labels", {}).get(owner, [])
+            if props and prop not in props:
+                fixed = _closest(prop, props, cutoff=0.75)
+                if fixed:
+                    edits.append((match.start(2), match.end(2), fixed))
+
+        # Keys of inline property maps, (p:Project {nme: 'X'})
+        for match in NODE_MAP_RE.finditer(masked):
+            label = _closest(match.group(1), labels, cutoff=0.75) or match.group(1)
+            props = schema.get("labels", {}).get(label, [])
+            for key in MAP_KEY_RE.finditer(match.group(2)):
+                if props and key.group(1) not in props:
+                    fixed = _closest(key.group(1), props, cutoff=0.75)
+                    if fixed:
+                        start = match.start(2) + key.start(1)
+                        edits.append((start, start + len(key.group(1)), fixed))
+
+        # Aliases with spaces or hyphens
+        for match in BAD_ALIAS_RE.finditer(masked):
+            alias = match.group(1).strip()
+            start = match.start(1)
+            edits.append((start, start + len(alias), f"`{alias}`"))
+
+        for start, end, replacement in sorted(edits, reverse=True):
+            query = query[:start] + replacement + query[end:]
+        return query
+
+    # LLM repair
+
+    def llm_repair(self, question: str, query: str, error: str) -> str:
+        prompt = f"""
+        A Cypher query generated for a Neo4j database failed. Fix it.
+
+        {self.schema_context}
+
+        Question: "{question}"
+        Failed query: {query}
+        Neo4j error: {error[:500]}
+
+        Use only labels, relationship types and properties from the schema. The query must stay read-only.
+        Return only the corrected Cypher query, no explanation.
+        """
+        response = router.run(
+            "cypher_repair",
+            lambda params: self.client.chat.completions.create(
+                messages=[{"role": "user", "content": prompt}], **params
+            ),
+            max_tokens=200, temperature=0
+        )
+        return strip_code_fences(response.choices[0].message.content)
+
+    def repair(self, question: str, query: str, error: str, use_llm: bool = True) -> Optional[Tuple[str, str]]:
+        """Return (fixed_query, source) or None if no fix could be produced"""
+        cached = self.cached_fix(query)
+        if cached and cached != query:
+            self.counts["cache"] += 1
+            return cached, "cache"
+
+        fixed = self.apply_rules(query)
+        if fixed != query:
+            self.counts["rules"] += 1
+            return fixed, "rules"
+
+        if use_llm:
+            try:
+                fixed = self.llm_repair(question, query, error)
+                if fixed and fixed != query:
+                    self.counts["llm"] += 1
+                    return fixed, "llm"
+            except Exception as e:
+                print(f"Error repairing Cypher query: {e}")
+
+        self.counts["failed"] += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counts, "cached_fixes": len(self._fixes)}
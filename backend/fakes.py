@@ -0,0 +1,545 @@
+"""Offline stand-ins for OpenAI and SerpAPI, for benchmarks and load tests.
+
+``FakeOpenAI`` answers ``chat.completions.create`` (streaming too) with
+responses that parse as each of the service's prompts expects: pain point
+lists, packed pain points, project matches picked from the candidate table,
+integration plans, Cypher queries and answers. Responses are deterministic
+for a given prompt. ``FakeGraph`` stands in for graph_db.GraphDB, serving
+the named service queries from a synthetic catalogue held in memory.
+
+Latency and failures are simulated from ``FakeBehaviour``: a log-normal
+latency around a median, an optional per output token cost, an error rate
+and a rate of truncated output from the small ("mini") models, drawn from a
+seeded generator so runs are repeatable.
+
+The same fakes can be served over HTTP, for load tests that should include
+the real OpenAI client and connection handling:
+
+    python fakes.py --port 8099
+    OPENAI_BASE_URL=http://localhost:8099/v1 SERP_API_URL=http://localhost:8099/search uvicorn main:app
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import types
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from synthetic import AREAS, PROBLEMS, QUALIFIERS, generate_projects
+from telemetry import record
+
+# Queries valid against the project graph schema
+FAKE_CYPHER = [
+    "MATCH (p:Project)-[:USES_TECHNOLOGY]->(t:Technology) WHERE t.name CONTAINS 'AI' RETURN p.name, t.name LIMIT 10",
+    "MATCH (c:Capability)<-[:HAS_CAPABILITY]-(p:Project) RETURN c.name, COUNT(p) AS frequency ORDER BY frequency DESC LIMIT 10",
+    "MATCH (p:Project)-[:TARGETS]->(i:Industry) RETURN i.name, count(p) AS projects ORDER BY projects DESC LIMIT 10",
+    "MATCH (p:Project) RETURN p.deployment_status, count(p) AS projects",
+    "MATCH (p1:Project)-[r:SHARES_PAIN_POINTS]-(p2:Project) RETURN p1.name, p2.name, r.count ORDER BY r.count DESC LIMIT 5",
+    "MATCH (pp:PainPoint)<-[:ADDRESSES]-(p:Project) RETURN pp.name, count(p) AS projects ORDER BY projects DESC LIMIT 10",
+]
+
+PLAN = {
+    "implementation_approach": "Start with a read-only integration against the existing systems, then automate the highest volume workflow.",
+    "technical_requirements": ["REST API access", "SSO integration", "Data export from current systems"],
+    "timeline": {"phase_1": "1-2 weeks: discovery and setup", "phase_2": "2-4 weeks: pilot",
+                 "phase_3": "4-6 weeks: rollout"},
+    "expected_benefits": ["Less manual work", "Faster turnaround"],
+    "potential_challenges": ["Data quality", "Change management"],
+    "next_steps": ["Schedule a demo", "Agree pilot scope"],
+    "pilot_suggestions": "Pilot with one team for four weeks and compare cycle times."
+}
+
+
+class FakeProviderError(Exception):
+    """Simulated provider failure; ``status_code`` is 429 (rate limited) or 500"""
+
+    def __init__(self, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class FakeBehaviour:
+    """Latency and error simulation shared by the fake providers"""
+
+    def __init__(self, median_ms: float = 0.0, sigma: float = 0.5, ms_per_token: float = 0.0,
+                 error_rate: float = 0.0, rate_limit_share: float = 0.5, invalid_rate: float = 0.0,
+                 seed: int = 0):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.ms_per_token = ms_per_token
+        self.error_rate = error_rate
+        self.rate_limit_share = rate_limit_share
+        self.invalid_rate = invalid_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "FakeBehaviour":
+        """Read ``<prefix>_LATENCY_MS``, ``_LATENCY_SIGMA``, ``_MS_PER_TOKEN``, ``_ERROR_RATE``,
+        ``_INVALID_RATE`` and ``FAKE_SEED``"""
+        return cls(
+            median_ms=float(os.getenv(f"{prefix}_LATENCY_MS", "0")),
+            sigma=float(os.getenv(f"{prefix}_LATENCY_SIGMA", "0.5")),
+            ms_per_token=float(os.getenv(f"{prefix}_MS_PER_TOKEN", "0")),
+            error_rate=float(os.getenv(f"{prefix}_ERROR_RATE", "0")),
+            invalid_rate=float(os.getenv(f"{prefix}_INVALID_RATE", "0")),
+            seed=int(os.getenv("FAKE_SEED", "0"))
+        )
+
+    def draw(self, output_tokens: int = 0):
+        """Return (delay_seconds, error_status or None)"""
+        with self._lock:
+            delay = 0.0
+            if self.median_ms > 0:
+                delay = self.median_ms * math.exp(self._rng.gauss(0, self.sigma)) / 1000
+            delay += self.ms_per_token * output_tokens / 1000
+            error = None
+            if self.error_rate and self._rng.random() < self.error_rate:
+                error = 429 if self._rng.random() < self.rate_limit_share else 500
+        return delay, error
+
+    def spoils(self, model: str) -> bool:
+        """Whether a response from ``model`` should come back truncated; only small models are affected"""
+        if not self.invalid_rate or "mini" not in model:
+            return False
+        with self._lock:
+            return self._rng.random() < self.invalid_rate
+
+    def apply(self, output_tokens: int = 0):
+        """Sleep for the simulated latency and raise FakeProviderError on a simulated failure"""
+        delay, error = self.draw(output_tokens)
+        if delay:
+            time.sleep(delay)
+        if error:
+            raise FakeProviderError("Rate limit exceeded" if error == 429 else "Internal server error", error)
+
+
+def _digest(text: str) -> int:
+    return int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _pain_points(seed: int, n: int = 8) -> List[str]:
+    return [
+        f"{QUALIFIERS[(seed + i) % len(QUALIFIERS)]} {AREAS[(seed // 7 + 3 * i) % len(AREAS)]} "
+        f"{PROBLEMS[(seed // 13 + i) % len(PROBLEMS)]}"
+        for i in range(n)
+    ]
+
+
+def classify_prompt(prompt: str) -> str:
+    """Which of the service's prompts this is"""
+    if "was meant to be valid JSON" in prompt:
+        return "json_repair"
+    if "Cypher query generator" in prompt:
+        return "cypher"
+    if "query generated for a Neo4j database failed" in prompt:
+        return "cypher_repair"
+    if "keyed by company tag" in prompt:
+        return "pain_points_batch"
+    if '"pain_points"' in prompt:
+        return "pain_points"
+    if '"matches"' in prompt:
+        return "project_matching"
+    if "Rewrite both for this company" in prompt:
+        return "plan_personalisation"
+    if '"implementation_approach"' in prompt:
+        return "integration_plan"
+    if "analyzing project data" in prompt:
+        return "answer"
+    return "other"
+
+
+def fake_response(prompt: str) -> str:
+    """Response text for ``prompt`` in the format its caller parses"""
+    kind = classify_prompt(prompt)
+    seed = _digest(prompt)
+
+    if kind == "pain_points":
+        return json.dumps({"pain_points": _pain_points(seed)})
+    if kind == "pain_points_batch":
+        tags = sorted(set(re.findall(r"\[(C\d+)\]", prompt)), key=lambda t: int(t[1:]))
+        return json.dumps({tag: _pain_points(seed + i) for i, tag in enumerate(tags)})
+    if kind == "project_matching":
+        refs = re.findall(r"^\s*(P\d+)\|", prompt, re.MULTILINE)[:3]
+        return json.dumps({"matches": [
+            {"ref": ref, "score": 90 - 10 * i, "why": "Addresses the main pain points.", "addresses": []}
+            for i, ref in enumerate(refs)
+        ]})
+    if kind == "integration_plan":
+        return json.dumps(PLAN)
+    if kind == "plan_personalisation":
+        return json.dumps({"implementation_approach": PLAN["implementation_approach"],
+                           "pilot_suggestions": PLAN["pilot_suggestions"]})
+    if kind in ("cypher", "cypher_repair"):
+        return FAKE_CYPHER[seed % len(FAKE_CYPHER)]
+    if kind == "answer":
+        return "Based on the results, several projects match; the most relevant are listed above."
+    if kind == "json_repair":
+        return "{}"
+    return "OK"
+
+
+class _Completions:
+    def __init__(self, owner: "FakeOpenAI"):
+        self.owner = owner
+
+    def create(self, model: str = "", messages: List[Dict[str, Any]] = (), stream: bool = False, **kwargs):
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        content = fake_response(prompt)
+        if self.owner.behaviour.spoils(model):
+            content = content[:len(content) // 3]
+        kind = classify_prompt(prompt)
+        with self.owner.lock:
+            self.owner.calls[kind] = self.owner.calls.get(kind, 0) + 1
+        self.owner.behaviour.apply(len(content) // 4)
+        usage = types.SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(content) // 4,
+                                      total_tokens=(len(prompt) + len(content)) // 4)
+        if stream:
+            return (
+                types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=content[i:i + 16]))])
+                for i in range(0, len(content), 16)
+            )
+        message = types.SimpleNamespace(role="assistant", content=content)
+        return types.SimpleNamespace(
+            model=model, usage=usage,
+            choices=[types.SimpleNamespace(index=0, message=message, finish_reason="stop")]
+        )
+
+
+class _Embeddings:
+    def __init__(self, owner: "FakeOpenAI"):
+        self.owner = owner
+
+    def create(self, model: str = "", input: Any = (), **kwargs):
+        from pain_point_canon import HashingEmbedder
+        texts = input if isinstance(input, list) else [input]
+        with self.owner.lock:
+            self.owner.calls["embeddings"] = self.owner.calls.get("embeddings", 0) + 1
+        self.owner.behaviour.apply(0)
+        tokens = sum(len(str(t)) for t in texts) // 4
+        return types.SimpleNamespace(
+            model=model,
+            usage=types.SimpleNamespace(prompt_tokens=tokens, total_tokens=tokens),
+            data=[types.SimpleNamespace(index=i, embedding=vector)
+                  for i, vector in enumerate(HashingEmbedder(256).embed([str(t) for t in texts]))]
+        )
+
+
+class FakeOpenAI:
+    """Drop-in for ``openai.OpenAI`` covering ``chat.completions.create`` and ``embeddings.create``"""
+
+    def __init__(self, behaviour: Optional[FakeBehaviour] = None, **kwargs):
+        self.behaviour = behaviour or FakeBehaviour()
+        self.calls: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.chat = types.SimpleNamespace(completions=_Completions(self))
+        self.embeddings = _Embeddings(self)
+
+
+class FakeSerp:
+    """SerpAPI-shaped search results for any company"""
+
+    def __init__(self, behaviour: Optional[FakeBehaviour] = None):
+        self.behaviour = behaviour or FakeBehaviour()
+
+    def search(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        self.behaviour.apply()
+        return self.results(params)
+
+    def results(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        query = params.get("q", "")
+        company = query.replace(" pain points", "")
+        seed = _digest(query)
+        industry = AREAS[seed % len(AREAS)]
+        return {
+            "organic_results": [
+                {"title": f"{company} struggles with {point}", "link": f"https://news.example.com/{seed}/{i}",
+                 "snippet": f"{company} reported {point} across its {industry} operations."}
+                for i, point in enumerate(_pain_points(seed, 3))
+            ],
+            "knowledge_graph": {"title": company, "type": f"{industry.title()} company"},
+            "answer_box": {}
+        }
+
+
+class _FakeResult:
+    def __init__(self, rows: List[Dict[str, Any]], plan: Optional[Dict[str, Any]] = None):
+        self.rows = rows
+        self.plan = plan
+
+    def __iter__(self):
+        return iter(types.SimpleNamespace(data=lambda row=row: row) for row in self.rows)
+
+    def consume(self):
+        return types.SimpleNamespace(plan=self.plan)
+
+
+class _FakeSession:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query: str, parameters: Optional[Dict[str, Any]] = None, **kwargs):
+        if query.lstrip().upper().startswith("EXPLAIN"):
+            return _FakeResult([], {"operatorType": "ProduceResults", "args": {"EstimatedRows": 10.0}, "children": []})
+        # Introspection is not simulated; SchemaService falls back to the static schema
+        raise RuntimeError("FakeGraph does not run ad hoc Cypher")
+
+
+class _FakeDriver:
+    """Enough of a neo4j driver for CypherGuard's EXPLAIN checks"""
+
+    def session(self, **kwargs):
+        return _FakeSession()
+
+    def close(self):
+        pass
+
+
+class FakeGraph:
+    """In-memory stand-in for graph_db.GraphDB over a synthetic catalogue.
+
+    The named statements in queries.QUERIES are answered in Python with the
+    same row shapes; generated Cypher passes EXPLAIN and streams a few
+    project rows.
+    """
+
+    def __init__(self, projects: int = 200, seed: int = 42, behaviour: Optional[FakeBehaviour] = None):
+        self.driver = _FakeDriver()
+        self.database = None
+        self.statements: Dict[str, str] = {}
+        self.behaviour = behaviour or FakeBehaviour()
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        self.projects = []
+        self.regulations: Dict[str, List[str]] = {}
+        addressed: Dict[str, List[Dict[str, Any]]] = {}
+        for project in generate_projects(projects, seed=seed):
+            row = {
+                "p.id": project["id"], "p.name": project["name"], "p.summary": project["summary"],
+                "p.url": project["url"],
+                "p.deployment_status": "Not Deployed" if project["url"] == "Not Deployed" else "Deployed",
+                "pain_points": project["pain_points"], "capabilities": project["capabilities"],
+                "industries": project["industries"]
+            }
+            self.projects.append(row)
+            self.regulations[project["id"]] = project["regulations"]
+            for name in project["pain_points"]:
+                addressed.setdefault(name, []).append(row)
+        # (name, popularity, projects) by descending popularity, as the index would return them
+        self.pain_points = sorted(((name, len(rows), rows) for name, rows in addressed.items()),
+                                  key=lambda item: -item[1])
+        self.industries = sorted({i for row in self.projects for i in row["industries"]})
+        self._similarities = None
+
+    @classmethod
+    def from_env(cls) -> "FakeGraph":
+        """Catalogue size and seed from FAKE_GRAPH_PROJECTS and FAKE_SEED, latency from FAKE_GRAPH_*"""
+        return cls(projects=int(os.getenv("FAKE_GRAPH_PROJECTS", "200")), seed=int(os.getenv("FAKE_SEED", "42")),
+                   behaviour=FakeBehaviour.from_env("FAKE_GRAPH"))
+
+    def verify(self):
+        pass
+
+    def close(self):
+        pass
+
+    def prepare(self, name: str, text: str, write: bool = False, timeout: Optional[float] = None):
+        self.statements[name] = text
+
+    def warm(self, params: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        return {name: 0.0 for name in self.statements}
+
+    def statement_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: {"calls": self.calls.get(name, 0)} for name in self.statements}
+
+    def run(self, name: str, params: Optional[Dict[str, Any]] = None, raw: bool = False) -> List[Dict[str, Any]]:
+        params = params or {}
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        started = time.perf_counter()
+        self.behaviour.apply()
+        record(f"cypher:{name}", started)
+
+        if name == "project_catalogue":
+            return [dict(row) for row in self.projects]
+        if name == "pain_point_matches":
+            rows = []
+            for name_, popularity, projects in self.pain_points:
+                for target in params.get("pain_points", []):
+                    if name_ in target or target in name_:
+                        rows.extend({
+                            "p.id": p["p.id"], "p.name": p["p.name"], "p.summary": p["p.summary"],
+                            "p.url": p["p.url"], "p.deployment_status": p["p.deployment_status"],
+                            "matched_pain_point": name_, "target_pain": target,
+                            "pain_point_popularity": popularity
+                        } for p in projects)
+            return rows
+        if name == "fallback_projects":
+            ranked = sorted(self.projects, key=lambda p: -len(p["pain_points"]))[:params.get("limit", 3)]
+            return [{key: p[key] for key in ("p.id", "p.name", "p.summary", "p.url", "p.deployment_status",
+                                             "pain_points")} for p in ranked]
+        if name == "industries":
+            return [{"name": industry} for industry in self.industries]
+        if name == "plan_warm_up_combos":
+            # Industry popularity is the number of projects targeting it, as graph.py sets it
+            popularity = Counter(industry for p in self.projects for industry in set(p["industries"]))
+            combos = [{"project_id": p["p.id"], "project_name": p["p.name"], "summary": p["p.summary"],
+                       "industry": industry, "popularity": popularity[industry]}
+                      for p in self.projects for industry in dict.fromkeys(p["industries"])]
+            combos.sort(key=lambda c: (-c["popularity"], c["project_id"]))
+            return combos[:params.get("top_n", 30)]
+        if name == "pain_point_vocabulary":
+            return [{"name": name_, "popularity": popularity} for name_, popularity, _ in self.pain_points]
+        if name == "catalogue_snapshot":
+            # Technologies and domains are derived as graph.py derives them at build time
+            from graph import ProjectGraphBuilder
+            return [{
+                **p,
+                "technologies": ProjectGraphBuilder.extract_technologies_from_summary(p["p.summary"]),
+                "domains": ProjectGraphBuilder.categorize_into_domains(p["industries"], p["capabilities"],
+                                                                       p["pain_points"]),
+                "regulations": self.regulations[p["p.id"]]
+            } for p in self.projects]
+        if name == "graph_rank_addresses":
+            return [{"project": p["p.id"], "pain_point": pain_point}
+                    for p in self.projects for pain_point in p["pain_points"]]
+        if name == "graph_rank_similarities":
+            # Weighted pairs, each project's strongest neighbours only, as the Cypher returns them
+            weights = params.get("weights") or {}
+            totals: Dict[tuple, float] = {}
+            for row in self.similarities():
+                weight = (row["count"] or 1) * weights.get(row["type"], 0.0)
+                for pair in ((row["source"], row["target"]), (row["target"], row["source"])):
+                    totals[pair] = totals.get(pair, 0.0) + weight
+            neighbours: Dict[str, List[tuple]] = {}
+            for (source, target), weight in totals.items():
+                if weight > 0:
+                    neighbours.setdefault(source, []).append((-weight, target))
+            return [{"source": source, "target": target, "weight": -weight}
+                    for source, edges in neighbours.items()
+                    for weight, target in sorted(edges)[:params.get("neighbours", 50)]]
+        raise KeyError(name)
+
+    def similarities(self) -> List[Dict[str, Any]]:
+        """The SHARES_* edges graph.py would create, one row per project pair and type"""
+        if self._similarities is None:
+            rows = []
+            for kind, field in (("SHARES_PAIN_POINTS", "pain_points"), ("SHARES_CAPABILITIES", "capabilities"),
+                                ("SHARES_INDUSTRIES", "industries")):
+                members: Dict[str, List[str]] = {}
+                for p in self.projects:
+                    for value in set(p[field]):
+                        members.setdefault(value, []).append(p["p.id"])
+                shared: Dict[tuple, int] = {}
+                for ids in members.values():
+                    ids.sort()
+                    for i, source in enumerate(ids):
+                        for target in ids[i + 1:]:
+                            shared[(source, target)] = shared.get((source, target), 0) + 1
+                rows.extend({"source": source, "target": target, "type": kind, "count": count}
+                            for (source, target), count in shared.items())
+            self._similarities = rows
+        return self._similarities
+
+    def query(self, cypher: str, params: Optional[Dict[str, Any]] = None, write: bool = False,
+              raw: bool = False, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        return list(self.stream(cypher, params))
+
+    def stream(self, cypher: str, params: Optional[Dict[str, Any]] = None, fetch_size: int = 100,
+               timeout: Optional[float] = None):
+        self.behaviour.apply()
+        for row in self.projects[:10]:
+            yield {"p.name": row["p.name"], "p.deployment_status": row["p.deployment_status"]}
+
+    def explain(self, cypher: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return {"operatorType": "ProduceResults", "args": {"EstimatedRows": 10.0}, "children": []}
+
+
+def isolate_state(prefix: str = "offline_") -> str:
+    """Point the service's cache, job and checkpoint files at a new temporary directory"""
+    import tempfile
+    state = tempfile.mkdtemp(prefix=prefix)
+    for name, filename in (("JOBS_DB_PATH", "jobs.db"), ("SCHEMA_CACHE_PATH", "schema.json"),
+                           ("CYPHER_REPAIR_CACHE_PATH", "repairs.json"),
+                           ("INTEGRATION_PLAN_CACHE_PATH", "plans.json"), ("BATCH_CHECKPOINT_DIR", "batches"),
+                           ("PAIN_POINT_EMBEDDING_CACHE_PATH", "embeddings.json"),
+                           ("RECOMMENDATIONS_PATH", "recommendations.json")):
+        os.environ[name] = os.path.join(state, filename)
+    return state
+
+
+def create_app(llm: Optional[FakeOpenAI] = None, serp: Optional[FakeSerp] = None):
+    """OpenAI-compatible /v1/chat/completions and SerpAPI-compatible /search over HTTP"""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    llm = llm or FakeOpenAI(FakeBehaviour.from_env("FAKE_LLM"))
+    serp = serp or FakeSerp(FakeBehaviour.from_env("FAKE_SERP"))
+    app = FastAPI(title="Fake OpenAI and SerpAPI")
+
+    def error_response(e: FakeProviderError):
+        return JSONResponse({"error": {"message": str(e), "type": "fake_error", "code": e.status_code}},
+                            status_code=e.status_code)
+
+    @app.post("/v1/chat/completions")
+    def chat_completions(body: Dict[str, Any]):
+        try:
+            response = llm.chat.completions.create(**body)
+        except FakeProviderError as e:
+            return error_response(e)
+        model = body.get("model", "fake")
+        if body.get("stream"):
+            def events():
+                for chunk in response:
+                    data = {"object": "chat.completion.chunk", "model": model, "choices": [
+                        {"index": 0, "delta": {"content": chunk.choices[0].delta.content}, "finish_reason": None}
+                    ]}
+                    yield f"data: {json.dumps(data)}\n\n"
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(events(), media_type="text/event-stream")
+        return {
+            "id": f"chatcmpl-fake-{int(time.time() * 1000)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": response.choices[0].message.content}}],
+            "usage": vars(response.usage)
+        }
+
+    @app.get("/search")
+    def search(request: Request):
+        try:
+            return serp.search(dict(request.query_params))
+        except FakeProviderError as e:
+            return error_response(e)
+
+    @app.get("/stats")
+    def stats():
+        return {"llm_calls": llm.calls}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the fake OpenAI and SerpAPI endpoints")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,75 @@
 import json
-from neo4j import GraphDatabase
-try:
-    from langchain_neo4j import Neo4jGraph
-except ImportError:
-    from langchain_community.graphs import Neo4jGraph
+import os
+from graph_db import GraphDB
+from pain_point_canon import PainPointCanonicaliser, make_embedder
+from queries import QUERIES, WARM_PARAMS
+from recommendations import RECOMMENDATIONS_PATH, materialise, save
+
+# Merge near duplicate pain points ("Manual CV screening" / "manual resume screening") at ingestion
+CANONICALISE_PAIN_POINTS = os.getenv("CANONICALISE_PAIN_POINTS", "true").lower() == "true"
+
+# Range indexes for the properties the service filters and sorts on, text
+# indexes for CONTAINS matches on names, and full-text indexes for keyword
+# search over names and summaries
+INDEXES = [
+    "CREATE INDEX pain_point_popularity IF NOT EXISTS FOR (pp:PainPoint) ON (pp.popularity)",
+    "CREATE INDEX capability_popularity IF NOT EXISTS FOR (c:Capability) ON (c.popularity)",
+    "CREATE INDEX industry_popularity IF NOT EXISTS FOR (i:Industry) ON (i.popularity)",
+    "CREATE INDEX project_deployment_status IF NOT EXISTS FOR (p:Project) ON (p.deployment_status)",
+    "CREATE INDEX shares_pain_points_count IF NOT EXISTS FOR ()-[r:SHARES_PAIN_POINTS]-() ON (r.count)",
+    "CREATE INDEX shares_capabilities_count IF NOT EXISTS FOR ()-[r:SHARES_CAPABILITIES]-() ON (r.count)",
+    "CREATE INDEX shares_industries_count IF NOT EXISTS FOR ()-[r:SHARES_INDUSTRIES]-() ON (r.count)",
+    "CREATE INDEX shares_technologies_count IF NOT EXISTS FOR ()-[r:SHARES_TECHNOLOGIES]-() ON (r.count)",
+    "CREATE INDEX shares_domains_count IF NOT EXISTS FOR ()-[r:SHARES_DOMAINS]-() ON (r.count)",
+    "CREATE TEXT INDEX project_name_text IF NOT EXISTS FOR (p:Project) ON (p.name)",
+    "CREATE TEXT INDEX pain_point_name_text IF NOT EXISTS FOR (pp:PainPoint) ON (pp.name)",
+    "CREATE TEXT INDEX capability_name_text IF NOT EXISTS FOR (c:Capability) ON (c.name)",
+    "CREATE FULLTEXT INDEX project_search IF NOT EXISTS FOR (p:Project) ON EACH [p.name, p.summary]",
+    "CREATE FULLTEXT INDEX pain_point_search IF NOT EXISTS FOR (pp:PainPoint) ON EACH [pp.name]"
+]
+
+# Service statements (queries.QUERIES) that look nodes up and the property their plan must use an
+# index on. The others read whole labels by design (catalogue snapshots, edge lists, the vocabulary)
+INDEXED_READS = {
+    "pain_point_matches": "name",
+    "plan_warm_up_combos": "popularity",
+}
+
+# Loads a batch of projects with all their relationships in one transaction
+BULK_LOAD_QUERY = """
+UNWIND $projects AS project
+MERGE (p:Project {id: project.id})
+SET p.name = project.name,
+    p.summary = project.summary,
+    p.url = project.url,
+    p.deployment_status = CASE WHEN project.url = "Not Deployed" THEN "Not Deployed" ELSE "Deployed" END
+FOREACH (name IN project.pain_points | MERGE (pp:PainPoint {name: name}) MERGE (p)-[:ADDRESSES]->(pp))
+FOREACH (name IN project.capabilities | MERGE (c:Capability {name: name}) MERGE (p)-[:HAS_CAPABILITY]->(c))
+FOREACH (name IN project.industries | MERGE (i:Industry {name: name}) MERGE (p)-[:TARGETS]->(i))
+FOREACH (name IN project.regulations | MERGE (r:Regulation {name: name}) MERGE (p)-[:COMPLIES_WITH]->(r))
+FOREACH (name IN project.technologies | MERGE (t:Technology {name: name}) MERGE (p)-[:USES_TECHNOLOGY]->(t))
+FOREACH (name IN project.domains | MERGE (d:Domain {name: name}) MERGE (p)-[:BELONGS_TO]->(d))
+"""
+
+
+def _plan_operators(plan):
+    """(operatorType, details) of every operator in an EXPLAIN plan"""
+    args = plan.get("args") or {}
+    operators = [(plan.get("operatorType", ""), str(args.get("Details", "")))]
+    for child in plan.get("children") or []:
+        operators.extend(_plan_operators(child))
+    return operators
 
 class ProjectGraphBuilder:
     def __init__(self, neo4j_url="bolt://localhost:7687", username="neo4j", password="test1234"):
         """Initialize Neo4j connection"""
-        self.graph = Neo4jGraph(
-            url=neo4j_url,
-            username=username,
-            password=password,
-            refresh_schema=True
-        )
+        self.graph = GraphDB(neo4j_url, username, password)
+        self.pain_point_aliases = {}
     
     def clear_database(self):
         """Clear all nodes and relationships from the database"""
         query = "MATCH (n) DETACH DELETE n"
-        self.graph.query(query)
+        self.graph.query(query, write=True)
         print("Database cleared successfully!")
     
     def create_constraints(self):
@@ -35,12 +86,56 @@ class ProjectGraphBuilder:
         
         for constraint in constraints:
             try:
-                self.graph.query(constraint)
+                self.graph.query(constraint, write=True)
                 print(f"✓ Constraint created: {constraint.split('FOR')[1].split('REQUIRE')[0].strip()}")
             except Exception as e:
                 print(f"⚠ Constraint may already exist: {e}")
     
-    def extract_technologies_from_summary(self, summary):
+    def create_indexes(self, wait_seconds=300):
+        """Create range, text and full-text indexes for the read paths and wait until they are online"""
+        for index in INDEXES:
+            try:
+                self.graph.query(index, write=True)
+                print(f"✓ Index created: {index.split(' IF NOT EXISTS')[0].split('INDEX ')[1]}")
+            except Exception as e:
+                print(f"⚠ Index may already exist: {e}")
+        
+        try:
+            self.graph.query(f"CALL db.awaitIndexes({int(wait_seconds)})")
+        except Exception as e:
+            print(f"⚠ Indexes not online yet: {e}")
+    
+    def verify_index_usage(self):
+        """EXPLAIN every service statement with its WARM_PARAMS and check the INDEXED_READS use their index.
+
+        Returns a report per statement; ``missing`` lists the indexed reads whose plan uses no index.
+        """
+        report = {}
+        for name, query in QUERIES.items():
+            prop = INDEXED_READS.get(name)
+            try:
+                operators = _plan_operators(self.graph.explain(query, WARM_PARAMS.get(name, {})))
+            except Exception as e:
+                report[name] = {"expects_index_on": prop, "uses_index": False, "error": str(e)}
+                print(f"✗ {name}: {e}")
+                continue
+            index_operators = [op for op, details in operators if "Index" in op and (prop is None or prop in details)]
+            report[name] = {
+                "expects_index_on": prop,
+                "uses_index": bool(index_operators),
+                "label_scans": [op for op, _ in operators if op.endswith("LabelScan") or op == "AllNodesScan"],
+                "operators": [op for op, _ in operators]
+            }
+            if prop is not None:
+                mark = "✓" if index_operators else "✗"
+                print(f"{mark} {name}: {', '.join(index_operators) or 'no index used'}")
+        report["missing"] = [name for name, entry in report.items() if entry["expects_index_on"] and not entry["uses_index"]]
+        if report["missing"]:
+            print(f"⚠ Service queries not using their index: {', '.join(report['missing'])}")
+        return report
+    
+    @staticmethod
+    def extract_technologies_from_summary(summary):
         """Extract technology keywords from summary"""
         tech_keywords = [
             "AI", "GenAI", "LLM", "Machine Learning", "ML", "Deep Learning",
@@ -64,7 +159,8 @@ class ProjectGraphBuilder:
         
         return found_techs
     
-    def categorize_into_domains(self, industries, capabilities, pain_points):
+    @staticmethod
+    def categorize_into_domains(industries, capabilities, pain_points):
         """Categorize project into broader domains"""
         domains = []
         all_text = " ".join(industries + capabilities + pain_points)
@@ -101,6 +197,52 @@ class ProjectGraphBuilder:
         
         return domains if domains else ["General"]
     
+    def canonicalise_pain_points(self, data):
+        """Rewrite the projects' pain points onto one canonical spelling per group of near duplicates.
+        
+        The most common spelling of a group is kept; the others are remembered in
+        ``pain_point_aliases`` for ``store_pain_point_aliases``.
+        """
+        try:
+            from providers import make_llm_client
+            embedder = make_embedder(make_llm_client())
+        except Exception as e:
+            print(f"⚠ Embeddings unavailable, using local hashing embeddings: {e}")
+            embedder = make_embedder(None)
+        
+        mapping = PainPointCanonicaliser(embedder=embedder).cluster(
+            [pain_point for project in data for pain_point in project['pain_points']]
+        )
+        self.pain_point_aliases = {}
+        for name, canonical in mapping.items():
+            if name != canonical:
+                self.pain_point_aliases.setdefault(canonical, []).append(name)
+        
+        print(f"✓ {len(mapping)} distinct pain points merged into {len(set(mapping.values()))} canonical pain points")
+        return [
+            {**project, 'pain_points': list(dict.fromkeys(mapping[p] for p in project['pain_points']))}
+            for project in data
+        ]
+    
+    def store_pain_point_aliases(self):
+        """Keep the merged spellings on their PainPoint node, so lookups of them are exact"""
+        aliases = [{"name": name, "aliases": sorted(names)} for name, names in self.pain_point_aliases.items()]
+        if aliases:
+            self.graph.query(
+                "UNWIND $aliases AS a MATCH (pp:PainPoint {name: a.name}) SET pp.aliases = a.aliases",
+                {"aliases": aliases}, write=True
+            )
+    
+    def materialise_recommendations(self, path=RECOMMENDATIONS_PATH):
+        """Write the top projects per pain point and per frequent pain point pair for the service"""
+        try:
+            materialised = materialise(self.graph.query(QUERIES["project_catalogue"]))
+            save(materialised, path)
+            print(f"✓ Materialised recommendations for {len(materialised['pain_points'])} pain points "
+                  f"and {len(materialised['pairs'])} pairs -> {path}")
+        except Exception as e:
+            print(f"⚠ Could not materialise recommendations: {e}")
+    
     def build_graph_from_json(self, data):
         """Build comprehensive graph from JSON data"""
         print("Building graph from JSON data...")
@@ -132,7 +274,7 @@ class ProjectGraphBuilder:
                 'name': project['name'],
                 'summary': project['summary'],
                 'url': project['url']
-            })
+            }, write=True)
             
             # Create and connect Pain Points
             for pain_point in project['pain_points']:
@@ -145,7 +287,7 @@ class ProjectGraphBuilder:
                 self.graph.query(pain_point_query, {
                     'pain_point': pain_point,
                     'project_id': project['id']
-                })
+                }, write=True)
             
             # Create and connect Capabilities
             for capability in project['capabilities']:
@@ -158,7 +300,7 @@ class ProjectGraphBuilder:
                 self.graph.query(capability_query, {
                     'capability': capability,
                     'project_id': project['id']
-                })
+                }, write=True)
             
             # Create and connect Industries
             for industry in project['industries']:
@@ -171,7 +313,7 @@ class ProjectGraphBuilder:
                 self.graph.query(industry_query, {
                     'industry': industry,
                     'project_id': project['id']
-                })
+                }, write=True)
             
             # Create and connect Regulations
             for regulation in project['regulations']:
@@ -185,7 +327,7 @@ class ProjectGraphBuilder:
                     self.graph.query(regulation_query, {
                         'regulation': regulation,
                         'project_id': project['id']
-                    })
+                    }, write=True)
             
             # Create and connect Technologies
             for technology in technologies:
@@ -198,7 +340,7 @@ class ProjectGraphBuilder:
                 self.graph.query(tech_query, {
                     'technology': technology,
                     'project_id': project['id']
-                })
+                }, write=True)
             
             # Create and connect Domains
             for domain in domains:
@@ -211,7 +353,32 @@ class ProjectGraphBuilder:
                 self.graph.query(domain_query, {
                     'domain': domain,
                     'project_id': project['id']
-                })
+                }, write=True)
+    
+    def bulk_load(self, data, batch_size=1000):
+        """Load projects in batches of ``batch_size`` per transaction (same graph as build_graph_from_json)"""
+        batch = []
+        for i, project in enumerate(data, 1):
+            batch.append({
+                "id": project["id"],
+                "name": project["name"],
+                "summary": project["summary"],
+                "url": project["url"],
+                "pain_points": project["pain_points"],
+                "capabilities": project["capabilities"],
+                "industries": project["industries"],
+                "regulations": [r for r in project["regulations"] if r != "Not Applicable"],
+                "technologies": self.extract_technologies_from_summary(project["summary"]),
+                "domains": self.categorize_into_domains(
+                    project["industries"], project["capabilities"], project["pain_points"]
+                )
+            })
+            if len(batch) >= batch_size:
+                self.graph.query(BULK_LOAD_QUERY, {"projects": batch}, write=True)
+                print(f"Loaded {i} projects")
+                batch = []
+        if batch:
+            self.graph.query(BULK_LOAD_QUERY, {"projects": batch}, write=True)
     
     def create_similarity_relationships(self):
         """Create relationships between projects based on shared attributes"""
@@ -226,7 +393,7 @@ class ProjectGraphBuilder:
         MERGE (p1)-[r:SHARES_PAIN_POINTS]-(p2)
         SET r.count = shared_pain_points
         """
-        self.graph.query(shared_pain_points_query)
+        self.graph.query(shared_pain_points_query, write=True)
         
         # Projects sharing capabilities
         shared_capabilities_query = """
@@ -237,7 +404,7 @@ class ProjectGraphBuilder:
         MERGE (p1)-[r:SHARES_CAPABILITIES]-(p2)
         SET r.count = shared_capabilities
         """
-        self.graph.query(shared_capabilities_query)
+        self.graph.query(shared_capabilities_query, write=True)
         
         # Projects targeting same industries
         shared_industries_query = """
@@ -248,7 +415,7 @@ class ProjectGraphBuilder:
         MERGE (p1)-[r:SHARES_INDUSTRIES]-(p2)
         SET r.count = shared_industries
         """
-        self.graph.query(shared_industries_query)
+        self.graph.query(shared_industries_query, write=True)
         
         # Projects using same technologies
         shared_tech_query = """
@@ -259,7 +426,7 @@ class ProjectGraphBuilder:
         MERGE (p1)-[r:SHARES_TECHNOLOGIES]-(p2)
         SET r.count = shared_technologies
         """
-        self.graph.query(shared_tech_query)
+        self.graph.query(shared_tech_query, write=True)
         
         # Projects in same domain
         shared_domain_query = """
@@ -270,7 +437,7 @@ class ProjectGraphBuilder:
         MERGE (p1)-[r:SHARES_DOMAINS]-(p2)
         SET r.count = shared_domains
         """
-        self.graph.query(shared_domain_query)
+        self.graph.query(shared_domain_query, write=True)
     
     def create_aggregate_relationships(self):
         """Create high-level aggregate relationships"""
@@ -283,7 +450,7 @@ class ProjectGraphBuilder:
         WHERE project_count > 1
         SET pp.popularity = project_count
         """
-        self.graph.query(common_pain_points_query)
+        self.graph.query(common_pain_points_query, write=True)
         
         # Most common capabilities
         common_capabilities_query = """
@@ -292,7 +459,7 @@ class ProjectGraphBuilder:
         WHERE project_count > 1
         SET c.popularity = project_count
         """
-        self.graph.query(common_capabilities_query)
+        self.graph.query(common_capabilities_query, write=True)
         
         # Most targeted industries
         common_industries_query = """
@@ -300,7 +467,7 @@ class ProjectGraphBuilder:
         WITH i, COUNT(p) as project_count
         SET i.popularity = project_count
         """
-        self.graph.query(common_industries_query)
+        self.graph.query(common_industries_query, write=True)
     
     def get_graph_statistics(self):
         """Get basic statistics about the graph"""
@@ -407,8 +574,13 @@ class ProjectGraphBuilder:
         # Create constraints
         self.create_constraints()
         
+        # Merge near duplicate pain points before they become nodes
+        if CANONICALISE_PAIN_POINTS:
+            json_data = self.canonicalise_pain_points(json_data)
+        
         # Build graph from JSON
         self.build_graph_from_json(json_data)
+        self.store_pain_point_aliases()
         
         # Create similarity relationships
         self.create_similarity_relationships()
@@ -416,6 +588,13 @@ class ProjectGraphBuilder:
         # Create aggregate relationships
         self.create_aggregate_relationships()
         
+        # Index the read paths once the data is in, and check the plans use them
+        self.create_indexes()
+        self.verify_index_usage()
+        
+        # Rank projects per pain point now, so matching known pain points needs no LLM
+        self.materialise_recommendations()
+        
         # Show statistics and insights
         self.get_graph_statistics()
         self.show_project_similarities()
@@ -0,0 +1,181 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from neo4j import GraphDatabase, Query, READ_ACCESS, WRITE_ACCESS, unit_of_work
+
+from telemetry import record
+
+# Connection pool tuning; the defaults suit one API process with a few dozen worker threads
+NEO4J_POOL_SIZE = int(os.getenv("NEO4J_POOL_SIZE", "50"))
+NEO4J_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "30"))
+NEO4J_MAX_LIFETIME = float(os.getenv("NEO4J_MAX_LIFETIME", "3600"))
+# Pooled connections idle for longer than this are pinged before reuse
+NEO4J_LIVENESS_CHECK = float(os.getenv("NEO4J_LIVENESS_CHECK", "60"))
+# Total time a managed transaction is retried for on transient errors and leader switches
+NEO4J_RETRY_SECONDS = float(os.getenv("NEO4J_RETRY_SECONDS", "15"))
+
+Rows = Union[List[Dict[str, Any]], Tuple[List[str], List[tuple]]]
+
+
+class Statement:
+    """A fixed, parameterised query.
+
+    Neo4j caches plans by query text, so keeping the text constant and
+    passing values as parameters means it is planned once per server.
+    """
+
+    def __init__(self, name: str, text: str, write: bool = False, timeout: Optional[float] = None):
+        self.name = name
+        self.text = text
+        self.write = write
+        self.timeout = timeout
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_seconds = 0.0
+        self._recent = deque(maxlen=1000)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, rows: int = 0, error: bool = False):
+        with self._lock:
+            self.calls += 1
+            self.errors += int(error)
+            self.rows += rows
+            self.total_seconds += seconds
+            self._recent.append(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            recent = sorted(self._recent)
+            calls, errors, rows, total = self.calls, self.errors, self.rows, self.total_seconds
+        stats = {"calls": calls, "errors": errors, "rows": rows,
+                 "mean_ms": round(total / calls * 1000, 3) if calls else None}
+        if recent:
+            stats["p50_ms"] = round(recent[len(recent) // 2] * 1000, 3)
+            stats["p95_ms"] = round(recent[min(len(recent) - 1, int(len(recent) * 0.95))] * 1000, 3)
+        return stats
+
+
+class GraphDB:
+    """Thin data access layer on the official neo4j driver.
+
+    Queries run as managed transactions (``execute_read`` / ``execute_write``)
+    so the driver retries transient failures and, against a cluster
+    (``neo4j://`` URLs), routes reads to followers and writes to the leader.
+    ``query`` returns a list of dicts like ``Neo4jGraph.query``; with
+    ``raw=True`` it returns ``(keys, rows)`` with plain tuples, skipping the
+    per-record dict construction.
+    """
+
+    def __init__(self, url: str, username: str, password: str, database: Optional[str] = None,
+                 pool_size: int = NEO4J_POOL_SIZE, acquisition_timeout: float = NEO4J_ACQUISITION_TIMEOUT,
+                 max_lifetime: float = NEO4J_MAX_LIFETIME, liveness_check: float = NEO4J_LIVENESS_CHECK,
+                 retry_seconds: float = NEO4J_RETRY_SECONDS):
+        self.driver = GraphDatabase.driver(
+            url,
+            auth=(username, password),
+            max_connection_pool_size=pool_size,
+            connection_acquisition_timeout=acquisition_timeout,
+            max_connection_lifetime=max_lifetime,
+            liveness_check_timeout=liveness_check,
+            max_transaction_retry_time=retry_seconds,
+            keep_alive=True
+        )
+        self.database = database or os.getenv("NEO4J_DATABASE", "neo4j")
+        self.statements: Dict[str, Statement] = {}
+        self._lock = threading.Lock()
+
+    def verify(self):
+        """Raise if the server cannot be reached or the credentials are wrong"""
+        self.driver.verify_connectivity()
+
+    def close(self):
+        self.driver.close()
+
+    # Prepared statements
+
+    def prepare(self, name: str, text: str, write: bool = False, timeout: Optional[float] = None) -> Statement:
+        with self._lock:
+            statement = self.statements.get(name)
+            if statement is None or statement.text != text:
+                statement = self.statements[name] = Statement(name, text, write=write, timeout=timeout)
+        return statement
+
+    def run(self, name: str, params: Optional[Dict[str, Any]] = None, raw: bool = False) -> Rows:
+        """Execute a prepared statement by name, recording its timing"""
+        statement = self.statements[name]
+        started = time.perf_counter()
+        try:
+            rows = self._execute(statement.text, params or {}, statement.write, raw, statement.timeout)
+        except Exception:
+            statement.record(time.perf_counter() - started, error=True)
+            record(f"cypher:{name}", started, error=True)
+            raise
+        statement.record(time.perf_counter() - started, len(rows[1] if raw else rows))
+        record(f"cypher:{name}", started)
+        return rows
+
+    def warm(self, params: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Compile every prepared statement into the server's plan cache.
+
+        Runs each under EXPLAIN, which plans without executing. ``params``
+        maps statement names to sample parameters, since cached plans are
+        keyed by parameter types as well as query text.
+        Returns the planning time per statement, or the error.
+        """
+        report = {}
+        for name, statement in list(self.statements.items()):
+            started = time.perf_counter()
+            try:
+                self._execute(f"EXPLAIN {statement.text}", (params or {}).get(name, {}), statement.write, True, None)
+                report[name] = round((time.perf_counter() - started) * 1000, 3)
+            except Exception as e:
+                report[name] = f"error: {e}"
+        return report
+
+    def explain(self, cypher: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Execution plan of a read query, without running it"""
+        with self.driver.session(database=self.database, default_access_mode=READ_ACCESS) as session:
+            summary = session.run(f"EXPLAIN {cypher}", params or {}).consume()
+        plan = summary.plan or {}
+        return plan if isinstance(plan, dict) else dict(plan)
+
+    def statement_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: statement.stats() for name, statement in self.statements.items()}
+
+    # Ad hoc queries
+
+    def query(self, cypher: str, params: Optional[Dict[str, Any]] = None, write: bool = False,
+              raw: bool = False, timeout: Optional[float] = None) -> Rows:
+        return self._execute(cypher, params or {}, write, raw, timeout)
+
+    def stream(self, cypher: str, params: Optional[Dict[str, Any]] = None, fetch_size: int = 100,
+               timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Yield records as they arrive, pulling ``fetch_size`` at a time.
+
+        Uses an auto-commit read transaction because a managed transaction
+        has to be consumed inside its function; stopping early stops the
+        server producing rows. Not retried.
+        """
+        with self.driver.session(database=self.database, default_access_mode=READ_ACCESS,
+                                 fetch_size=fetch_size) as session:
+            for row in session.run(Query(cypher, timeout=timeout), params or {}):
+                yield row.data()
+
+    def _execute(self, cypher: str, params: Dict[str, Any], write: bool, raw: bool,
+                 timeout: Optional[float]) -> Rows:
+        @unit_of_work(timeout=timeout)
+        def work(tx):
+            result = tx.run(cypher, params)
+            if raw:
+                return result.keys(), [tuple(row.values()) for row in result]
+            return [row.data() for row in result]
+
+        access_mode = WRITE_ACCESS if write else READ_ACCESS
+        with self.driver.session(database=self.database, default_access_mode=access_mode) as session:
+            if write:
+                return session.execute_write(work)
+            return session.execute_read(work)
@@ -0,0 +1,354 @@
+"""Related projects by personalised PageRank over the project graph.
+
+Projects and pain points are held in memory as a sparse weighted adjacency
+matrix: ADDRESSES edges between a project and its pain points, and the
+SHARES_* edges graph.py creates between projects, weighted by their count
+and EDGE_WEIGHTS and summed per pair. The graph_rank_similarities query
+returns only each project's GRAPH_RANK_NEIGHBOURS strongest pairs, which
+bounds what is transferred and held as the catalogue grows. ``GraphRanker.rank`` runs a random walk with restart to
+the matched PainPoint nodes (power iteration with scipy.sparse) and returns
+each project's visit probability. Projects that address the pain points
+rank first, followed by the ones closely tied to them by shared pain points,
+capabilities, technologies, domains and industries.
+
+Personalised PageRank is linear in the restart distribution, so the vector
+for several pain points is the mean of their single pain point vectors.
+Those are cached (LRU of GRAPH_RANK_CACHE_SIZE) and the most connected
+GRAPH_RANK_PRECOMPUTE pain points are solved in one batch whenever the
+graph is (re)loaded. The graph is reloaded in a background thread every
+GRAPH_RANK_TTL seconds and rebuilt when its edge lists changed; ranking
+keeps using the previous matrix meanwhile, and returns nothing until the
+first one is built.
+
+numpy and scipy are imported on first use; without them ranking is
+disabled and matching works as before.
+
+    python graph_rank.py --fake --projects 2000 --queries 500
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+GRAPH_RANK_ENABLED = os.getenv("GRAPH_RANK_ENABLED", "true").lower() == "true"
+# Probability of jumping back to the seeds at each step; higher keeps the walk closer to them
+GRAPH_RANK_RESTART = float(os.getenv("GRAPH_RANK_RESTART", "0.25"))
+GRAPH_RANK_TTL = float(os.getenv("GRAPH_RANK_TTL", "600"))
+GRAPH_RANK_CACHE_SIZE = int(os.getenv("GRAPH_RANK_CACHE_SIZE", "1024"))
+GRAPH_RANK_PRECOMPUTE = int(os.getenv("GRAPH_RANK_PRECOMPUTE", "128"))
+# Similarity edges kept per project, strongest first; SHARES_INDUSTRIES alone is close to all pairs
+GRAPH_RANK_NEIGHBOURS = int(os.getenv("GRAPH_RANK_NEIGHBOURS", "50"))
+
+# Weight per shared element; sharing a pain point says more than sharing an industry
+EDGE_WEIGHTS = {
+    "ADDRESSES": 1.0,
+    "SHARES_PAIN_POINTS": 1.0,
+    "SHARES_CAPABILITIES": 0.5,
+    "SHARES_TECHNOLOGIES": 0.2,
+    "SHARES_DOMAINS": 0.2,
+    "SHARES_INDUSTRIES": 0.1,
+}
+
+TOLERANCE = 1e-6
+MAX_ITERATIONS = 100
+
+Loader = Callable[[], Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]
+
+
+class GraphRanker:
+    """Random walk with restart from PainPoint seeds over projects and pain points"""
+
+    def __init__(self, loader: Loader, restart: float = GRAPH_RANK_RESTART, ttl: float = GRAPH_RANK_TTL,
+                 cache_size: int = GRAPH_RANK_CACHE_SIZE, precompute: int = GRAPH_RANK_PRECOMPUTE,
+                 neighbours: int = GRAPH_RANK_NEIGHBOURS):
+        self.loader = loader
+        self.neighbours = neighbours
+        self.restart = restart
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.precompute = precompute
+        self.counts = Counter()
+        self.projects: List[str] = []
+        self.pain_points: Dict[str, int] = {}
+        self.edges = 0
+        self.build_seconds = None
+        self.rank_seconds = 0.0
+        self._transition = None
+        self._dangling = None
+        self._vectors: "OrderedDict[str, Any]" = OrderedDict()
+        # Seeds being solved by a request, so concurrent requests for them wait instead of solving again
+        self._solving: Dict[str, threading.Event] = {}
+        # Bumped on every rebuild; vectors solved on an older matrix are not cached
+        self._generation = 0
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._loading = False
+        self._signature = None
+        self._disabled = False
+
+    def refresh(self):
+        """Start a background reload when the graph is older than the TTL"""
+        with self._lock:
+            now = time.monotonic()
+            if self._disabled or self._loading or (self._loaded_at is not None and now - self._loaded_at < self.ttl):
+                return
+            self._loaded_at = now
+            self._loading = True
+        threading.Thread(target=self.load, name="graph-rank-load", daemon=True).start()
+
+    def load(self):
+        """Load the edge lists and rebuild the walk if they changed; ranking uses the old one until then"""
+        try:
+            addresses, similarities = self.loader()
+            signature = (len(addresses), len(similarities), round(sum(r.get("weight") or 0 for r in similarities), 3))
+            if signature == self._signature:
+                return
+            self._build(addresses, similarities)
+            self._signature = signature
+            with self._lock:
+                self.counts["graph_loads"] += 1
+        except ImportError as e:
+            print(f"Graph ranking disabled, numpy and scipy are needed: {e}")
+            self._disabled = True
+        except Exception as e:
+            print(f"Error loading the graph for ranking: {e}")
+        finally:
+            with self._lock:
+                self._loaded_at = time.monotonic()
+                self._loading = False
+
+    def _build(self, addresses: List[Dict[str, Any]], similarities: List[Dict[str, Any]]):
+        """Build the transition matrix and precomputed vectors aside, then swap them in"""
+        import numpy as np
+        from scipy import sparse
+
+        started = time.perf_counter()
+        projects = sorted({r["project"] for r in addresses} | {r[k] for r in similarities for k in ("source", "target")})
+        project_index = {project: i for i, project in enumerate(projects)}
+        pain_points = {name: len(projects) + i for i, name in enumerate(sorted({r["pain_point"] for r in addresses}))}
+
+        sources = [project_index[r["project"]] for r in addresses]
+        targets = [pain_points[r["pain_point"]] for r in addresses]
+        weights = [EDGE_WEIGHTS["ADDRESSES"]] * len(addresses)
+        n = len(projects) + len(pain_points)
+        # Both directions; duplicate entries are summed
+        adjacency = sparse.coo_matrix((weights + weights, (sources + targets, targets + sources)), shape=(n, n))
+
+        # Each row is one project's neighbour with the pair's summed weight; a pair kept from both ends appears twice
+        rows = [r for r in similarities if (r.get("weight") or 0) > 0]
+        similarity = sparse.coo_matrix((
+            [r["weight"] for r in rows],
+            ([project_index[r["source"]] for r in rows], [project_index[r["target"]] for r in rows])
+        ), shape=(n, n)).tocsr()
+        similarity = _strongest(similarity.maximum(similarity.T), self.neighbours)
+
+        adjacency = (adjacency.tocsr() + similarity).astype(np.float32)
+        out_weight = np.asarray(adjacency.sum(axis=1)).ravel()
+        inverse = np.divide(1.0, out_weight, out=np.zeros(n, dtype=np.float32), where=out_weight > 0)
+        # Column stochastic: column j holds where a walker at node j steps next
+        transition = (sparse.diags(inverse) @ adjacency).T.tocsr()
+        dangling = out_weight == 0
+
+        precomputed = {}
+        if self.precompute:
+            degree = Counter(r["pain_point"] for r in addresses)
+            seeds = [name for name, _ in degree.most_common(self.precompute)]
+            scores = self._walk(transition, dangling, [pain_points[s] for s in seeds])
+            precomputed = {seed: scores[:len(projects), k].copy() for k, seed in enumerate(seeds)}
+
+        with self._lock:
+            self._transition = transition
+            self._dangling = dangling
+            self.projects = projects
+            self.pain_points = pain_points
+            self.edges = adjacency.nnz // 2
+            self._generation += 1
+            self._vectors.clear()
+            self._cache(precomputed)
+            self.build_seconds = round(time.perf_counter() - started, 3)
+
+    def _walk(self, transition, dangling, seeds: List[int]):
+        """Solve the walk for each seed node at once, one column each"""
+        import numpy as np
+
+        n = transition.shape[0]
+        restart = np.zeros((n, len(seeds)), dtype=np.float32)
+        restart[seeds, np.arange(len(seeds))] = 1.0
+        scores = restart.copy()
+        for iteration in range(1, MAX_ITERATIONS + 1):
+            # Walkers at nodes without edges restart too, so every column keeps summing to 1
+            stuck = scores[dangling].sum(axis=0)
+            updated = (1 - self.restart) * (transition @ scores) + (self.restart + (1 - self.restart) * stuck) * restart
+            delta = np.abs(updated - scores).sum(axis=0).max()
+            scores = updated
+            if delta < TOLERANCE:
+                break
+        with self._lock:
+            self.counts["solves"] += 1
+            self.counts["iterations"] += iteration
+        return scores
+
+    def _cache(self, vectors: Dict[str, Any]):
+        for seed, vector in vectors.items():
+            self._vectors[seed] = vector
+            self._vectors.move_to_end(seed)
+        while len(self._vectors) > self.cache_size:
+            self._vectors.popitem(last=False)
+
+    def rank(self, pain_points: Sequence[str], limit: int = 50) -> Dict[str, float]:
+        """Project id -> visit probability for the ``limit`` best projects, seeded by the known pain points"""
+        self.refresh()
+        started = time.perf_counter()
+        with self._lock:
+            if self._transition is None:
+                self.counts["not_loaded"] += 1
+                return {}
+            seeds = [p for p in dict.fromkeys(pain_points) if p in self.pain_points]
+            if not seeds:
+                self.counts["unseeded"] += 1
+                return {}
+            # The matrix in use now; a rebuild during this call swaps in a new one without affecting it
+            generation, transition, dangling = self._generation, self._transition, self._dangling
+            projects, index = self.projects, self.pain_points
+            vectors = {s: self._vectors[s] for s in seeds if s in self._vectors}
+            for seed in vectors:
+                self._vectors.move_to_end(seed)
+            missing = [s for s in seeds if s not in vectors]
+            self.counts["vector_hits"] += len(vectors)
+            self.counts["vector_misses"] += len(missing)
+            waiting = {s: self._solving[s] for s in missing if s in self._solving}
+            owned = [s for s in missing if s not in waiting]
+            done = threading.Event()
+            for seed in owned:
+                self._solving[seed] = done
+
+        # Solved outside the lock, so cached ranks and other solves do not queue behind this one
+        if owned:
+            try:
+                scores = self._walk(transition, dangling, [index[s] for s in owned])
+                vectors.update({seed: scores[:len(projects), k].copy() for k, seed in enumerate(owned)})
+            finally:
+                with self._lock:
+                    for seed in owned:
+                        if self._solving.get(seed) is done:
+                            del self._solving[seed]
+                    if generation == self._generation:
+                        self._cache({seed: vectors[seed] for seed in owned if seed in vectors})
+                done.set()
+        for seed, event in waiting.items():
+            event.wait()
+            with self._lock:
+                vector = self._vectors.get(seed) if generation == self._generation else None
+                self.counts["solve_waits"] += 1
+            if vector is None:
+                # Failed, evicted or rebuilt meanwhile
+                vector = self._walk(transition, dangling, [index[seed]])[:len(projects), 0].copy()
+            vectors[seed] = vector
+
+        import numpy as np
+        ordered = [vectors[s] for s in seeds]
+        combined = ordered[0] if len(ordered) == 1 else np.mean(ordered, axis=0)
+        limit = min(limit, len(combined))
+        best = np.argpartition(-combined, limit - 1)[:limit]
+        best = best[np.argsort(-combined[best], kind="stable")]
+        ranked = {projects[i]: float(combined[i]) for i in best if combined[i] > 0}
+        with self._lock:
+            self.counts["ranks"] += 1
+            self.rank_seconds += time.perf_counter() - started
+        return ranked
+
+    def stats(self) -> Dict[str, Any]:
+        ranks = self.counts["ranks"]
+        solves = self.counts["solves"]
+        return {
+            "enabled": not self._disabled,
+            "loading": self._loading,
+            "projects": len(self.projects),
+            "pain_points": len(self.pain_points),
+            "edges": self.edges,
+            "build_seconds": self.build_seconds,
+            "cached_vectors": len(self._vectors),
+            **self.counts,
+            "mean_iterations": round(self.counts["iterations"] / solves, 1) if solves else None,
+            "mean_rank_ms": round(self.rank_seconds / ranks * 1000, 3) if ranks else None
+        }
+
+
+def _strongest(matrix, k: int):
+    """Keep each row's ``k`` largest entries, and an entry whenever either of its endpoints keeps it"""
+    import numpy as np
+
+    if k <= 0:
+        return matrix
+    matrix = matrix.tocsr()
+    keep = np.zeros(matrix.nnz, dtype=bool)
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        if end - start <= k:
+            keep[start:end] = True
+        else:
+            keep[start + np.argpartition(-matrix.data[start:end], k - 1)[:k]] = True
+    pruned = matrix.copy()
+    pruned.data = np.where(keep, pruned.data, 0)
+    pruned.eliminate_zeros()
+    return pruned.maximum(pruned.T)
+
+
+def graph_loader(graph, neighbours: int = GRAPH_RANK_NEIGHBOURS) -> Loader:
+    """Edge lists from the graph_rank_* named queries of a GraphDB (or FakeGraph)"""
+    params = {"weights": {k: v for k, v in EDGE_WEIGHTS.items() if k != "ADDRESSES"}, "neighbours": neighbours}
+    return lambda: (graph.run("graph_rank_addresses"), graph.run("graph_rank_similarities", params))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the graph walk and time related project ranking")
+    parser.add_argument("--url", default="bolt://localhost:7687")
+    parser.add_argument("--username", default="neo4j")
+    parser.add_argument("--password", default="test1234")
+    parser.add_argument("--fake", action="store_true", help="Use the synthetic in-memory catalogue instead of Neo4j")
+    parser.add_argument("--projects", type=int, default=2000, help="Synthetic catalogue size with --fake")
+    parser.add_argument("--queries", type=int, default=500, help="Random pain point sets to rank")
+    parser.add_argument("--restart", type=float, default=GRAPH_RANK_RESTART)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    if args.fake:
+        from fakes import FakeGraph
+        graph = FakeGraph(projects=args.projects)
+    else:
+        from graph_db import GraphDB
+        from queries import QUERIES
+        graph = GraphDB(args.url, args.username, args.password)
+        for name in ("graph_rank_addresses", "graph_rank_similarities"):
+            graph.prepare(name, QUERIES[name])
+
+    started = time.perf_counter()
+    ranker = GraphRanker(graph_loader(graph), restart=args.restart)
+    ranker.load()
+    load_seconds = time.perf_counter() - started
+
+    vocabulary = list(ranker.pain_points)
+    rng = random.Random(42)
+    timings = []
+    for _ in range(args.queries):
+        seeds = rng.sample(vocabulary, min(len(vocabulary), rng.randint(1, 4)))
+        started = time.perf_counter()
+        ranker.rank(seeds, limit=10)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+
+    report = {
+        "load_and_build_seconds": round(load_seconds, 3),
+        "ranks": len(timings),
+        "p50_ms": round(timings[len(timings) // 2] * 1000, 3) if timings else None,
+        "p99_ms": round(timings[int(len(timings) * 0.99)] * 1000, 3) if timings else None,
+        "stats": ranker.stats()
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
@@ -6,10 +6,10 @@ import asyncio
 from typing import Any, Dict, List, Optional, Sequence
 from dataclasses import dataclass
 from enum import Enum
-import requests
-from openai import OpenAI
 import os
 from dotenv import load_dotenv
+from llm_gateway import LLMGateway
+from providers import make_llm_client, make_serp_provider
 
 # MCP imports - CORRECTED
 from mcp.server.fastmcp import FastMCP
@@ -53,8 +53,8 @@ class GraphQASystem:
     """Simplified GraphQA system for MCP integration"""
     
     def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.serp_api_key = os.getenv("SERP_API_KEY", "31b2d407d3035b81ad59b575e9c82ceca4febe813f1b44ae622208813b42517e")
+        self.client = LLMGateway(make_llm_client())
+        self.serp = make_serp_provider()
         
         # Neo4j connection would go here
         self.neo4j_url = os.getenv("NEO4J_URL", "bolt://localhost:7687")
@@ -73,26 +73,17 @@ class GraphQASystem:
     def search_company_info(self, company_name: str) -> Dict[str, Any]:
         """Search for company information using SERP API"""
         try:
-            search_url = "https://serpapi.com/search"
-            search_params = {
+            search_results = self.serp.search({
                 "q": f"{company_name} company business model services products",
-                "api_key": self.serp_api_key,
                 "engine": "google",
                 "num": 3
+            })
+            return {
+                "name": company_name,
+                "search_results": search_results.get("organic_results", [])[:3],
+                "knowledge_graph": search_results.get("knowledge_graph", {}),
+                "answer_box": search_results.get("answer_box", {})
             }
-            
-            response = requests.get(search_url, params=search_params)
-            if response.status_code == 200:
-                search_results = response.json()
-                return {
-                    "name": company_name,
-                    "search_results": search_results.get("organic_results", [])[:3],
-                    "knowledge_graph": search_results.get("knowledge_graph", {}),
-                    "answer_box": search_results.get("answer_box", {})
-                }
-            else:
-                logger.warning(f"SERP API request failed: {response.status_code}")
-                return {"name": company_name, "error": "Search failed", "search_results": []}
         
         except Exception as e:
             logger.error(f"Error searching company info: {e}")
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TERMINAL_STATES = (SUCCEEDED, FAILED)
+
+# Accepted job priorities; submissions outside the range are clamped so no
+# caller can jump arbitrarily far ahead of other tenants' work
+MIN_PRIORITY = 0
+MAX_PRIORITY = 10
+
+
+class JobQueue:
+    """In-process worker pool for long running pipelines, persisted to SQLite.
+
+    Jobs are picked by priority (higher first, ``MIN_PRIORITY`` to
+    ``MAX_PRIORITY``) then age, at most
+    ``tenant_concurrency`` running at once per tenant. Submitting a job that
+    is identical to one still queued or running returns the existing job id.
+    Jobs that were running when the process stopped are re-queued on start.
+    """
+
+    def __init__(self, handlers: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]],
+                 db_path: str = "jobs.db", workers: int = 4, tenant_concurrency: int = 2,
+                 retention_hours: float = 24):
+        self.handlers = handlers
+        self.workers = max(1, workers)
+        self.tenant_concurrency = max(1, tenant_concurrency)
+        self.retention_hours = retention_hours
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._running_per_tenant: Dict[str, int] = {}
+        self._threads = []
+        self._stopping = False
+
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    tenant TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    dedup_key TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_pick ON jobs (status, priority DESC, created_at)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key, status)")
+            self._conn.commit()
+
+    def start(self):
+        """Recover interrupted jobs, purge old ones and start the worker threads"""
+        if self._threads:
+            return
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?", (QUEUED, RUNNING))
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (SUCCEEDED, FAILED, time.time() - self.retention_hours * 3600)
+            )
+            self._conn.commit()
+        self._stopping = False
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5):
+        """Ask workers to exit once their current job finishes"""
+        with self._changed:
+            self._stopping = True
+            self._changed.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    @staticmethod
+    def _dedup_key(kind: str, tenant: str, payload: Dict[str, Any]) -> str:
+        canonical = json.dumps([kind, tenant, payload], sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def submit(self, kind: str, payload: Dict[str, Any], tenant: str = "default",
+               priority: int = 0) -> Tuple[str, bool]:
+        """Queue a job and return (job_id, deduplicated)"""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        priority = min(max(int(priority), MIN_PRIORITY), MAX_PRIORITY)
+
+        dedup_key = self._dedup_key(kind, tenant, payload)
+        with self._changed:
+            existing = self._conn.execute(
+                "SELECT id FROM jobs WHERE dedup_key = ? AND status IN (?, ?) LIMIT 1",
+                (dedup_key, QUEUED, RUNNING)
+            ).fetchone()
+            if existing:
+                return existing["id"], True
+
+            job_id = uuid.uuid4().hex
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, tenant, priority, dedup_key, status, payload, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, tenant, priority, dedup_key, QUEUED, json.dumps(payload, default=str), time.time())
+            )
+            self._conn.commit()
+            self._changed.notify_all()
+        return job_id, False
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the public view of a job, or None if unknown"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            position = None
+            if row["status"] == QUEUED:
+                position = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? AND "
+                    "(priority > ? OR (priority = ? AND created_at < ?))",
+                    (QUEUED, row["priority"], row["priority"], row["created_at"])
+                ).fetchone()[0]
+
+        return {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "tenant": row["tenant"],
+            "priority": row["priority"],
+            "status": row["status"],
+            "queue_position": position,
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"]
+        }
+
+    def wait(self, job_id: str, last_status: Optional[str] = None, timeout: float = 15) -> Optional[Dict[str, Any]]:
+        """Block until the job's status differs from ``last_status`` or the timeout passes"""
+        deadline = time.time() + timeout
+        with self._changed:
+            while True:
+                row = self._conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                if row is None or row["status"] != last_status:
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+        return self.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Job counts per status and running jobs per tenant"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+            return {
+                "by_status": {row["status"]: row["n"] for row in rows},
+                "running_per_tenant": dict(self._running_per_tenant),
+                "workers": len(self._threads)
+            }
+
+    def _claim_next(self) -> Optional[sqlite3.Row]:
+        """Pick the best queued job whose tenant is under its limit. Caller holds the lock."""
+        saturated = [t for t, n in self._running_per_tenant.items() if n >= self.tenant_concurrency]
+        placeholders = ",".join("?" for _ in saturated)
+        tenant_filter = f"AND tenant NOT IN ({placeholders})" if saturated else ""
+        row = self._conn.execute(
+            f"SELECT * FROM jobs WHERE status = ? {tenant_filter} ORDER BY priority DESC, created_at LIMIT 1",
+            (QUEUED, *saturated)
+        ).fetchone()
+        if row is None:
+            return None
+
+        self._conn.execute("UPDATE jobs SET status = ?, started_at = ? WHERE id = ?", (RUNNING, time.time(), row["id"]))
+        self._conn.commit()
+        self._running_per_tenant[row["tenant"]] = self._running_per_tenant.get(row["tenant"], 0) + 1
+        self._changed.notify_all()
+        return row
+
+    def _worker(self):
+        while True:
+            with self._changed:
+                row = None
+                while not self._stopping:
+                    row = self._claim_next()
+                    if row is not None:
+                        break
+                    self._changed.wait(1.0)
+                if self._stopping:
+                    return
+
+            result, error = None, None
+            try:
+                result = self.handlers[row["kind"]](json.loads(row["payload"]))
+            except Exception as e:
+                # HTTPException carries its message in .detail
+                error = str(getattr(e, "detail", None) or e)
+                print(f"Error running job {row['id']} ({row['kind']}): {error}")
+
+            with self._changed:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                    (
+                        FAILED if error is not None else SUCCEEDED,
+                        json.dumps(result, default=str) if result is not None else None,
+                        error,
+                        time.time(),
+                        row["id"]
+                    )
+                )
+                self._conn.commit()
+                self._running_per_tenant[row["tenant"]] -= 1
+                if not self._running_per_tenant[row["tenant"]]:
+                    del self._running_per_tenant[row["tenant"]]
+                self._changed.notify_all()
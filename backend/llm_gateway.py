@@ -0,0 +1,361 @@
+"""Rate limiting, retries, deadlines, circuit breaking and hedging for LLM calls.
+
+``LLMGateway`` wraps an OpenAI-compatible client and keeps its
+``chat.completions.create`` and ``embeddings.create`` interfaces. Each call:
+
+1. fails fast with LLMUnavailable while the circuit breaker is open
+2. waits for the request and token buckets (sized to LLM_RPM / LLM_TPM)
+   and a concurrency slot, but never past its deadline
+3. runs with the time left as the client timeout; a call still pending
+   after the hedge delay gets a duplicate request, and the first answer wins
+4. retries rate limits, server errors and timeouts with full-jitter
+   exponential backoff (honouring Retry-After) until the deadline
+
+Errors that retrying cannot fix (bad request, auth) are raised unchanged.
+Everything else ends in LLMUnavailable, which callers turn into their
+fallbacks: complete_json raises StructuredOutputError, /ask answers 503.
+"""
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Optional
+
+from profiling import attach
+
+# Quota of the account; the buckets hold LLM_BURST_SECONDS worth of it
+LLM_RPM = float(os.getenv("LLM_RPM", "500"))
+LLM_TPM = float(os.getenv("LLM_TPM", "200000"))
+LLM_BURST_SECONDS = float(os.getenv("LLM_BURST_SECONDS", "10"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "30"))
+# Consecutive failed attempts that open the breaker, and how long it stays open
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+# "0" disables hedging, a number hedges after that many seconds, "p95" (or
+# another percentile) after that percentile of recent latencies for the model
+LLM_HEDGE_AFTER = os.getenv("LLM_HEDGE_AFTER", "0")
+LLM_HEDGE_MIN_SECONDS = float(os.getenv("LLM_HEDGE_MIN_SECONDS", "0.5"))
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {"APITimeoutError", "APIConnectionError", "Timeout", "TimeoutError", "ConnectionError",
+                    "ReadTimeout", "ConnectTimeout"}
+
+
+class LLMUnavailable(Exception):
+    """No completion within the deadline: breaker open, quota exhausted or provider failing"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_retryable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Refills at ``rate`` per second up to ``capacity``"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, deadline: float) -> Optional[float]:
+        """Take ``amount`` and return how long to wait before using it, or None if that passes the deadline"""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait_seconds = max(0.0, (amount - self.tokens) / self.rate)
+            if now + wait_seconds > deadline:
+                return None
+            # Going negative queues this caller behind earlier reservations
+            self.tokens -= amount
+            return wait_seconds
+
+    def try_take(self, amount: float) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens < amount:
+                return False
+            self.tokens -= amount
+            return True
+
+    def refund(self, amount: float):
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class CircuitBreaker:
+    """Opens after ``failures`` consecutive failed attempts; after ``cooldown`` one probe is let through"""
+
+    def __init__(self, failures: int = LLM_BREAKER_FAILURES, cooldown: float = LLM_BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.consecutive = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.opens = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown or self.probing:
+                return False
+            self.probing = True
+            return True
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def success(self):
+        with self._lock:
+            self.consecutive = 0
+            self.opened_at = None
+            self.probing = False
+
+    def cancel_probe(self):
+        """The admitted call never reached the provider; let the next one probe"""
+        with self._lock:
+            self.probing = False
+
+    def failure(self):
+        with self._lock:
+            self.consecutive += 1
+            if self.probing or (self.opened_at is None and self.consecutive >= self.failures):
+                self.opened_at = time.monotonic()
+                self.opens += 1
+            self.probing = False
+
+
+def _estimate_tokens(kwargs: Dict[str, Any]) -> int:
+    if "input" in kwargs:
+        # Embeddings: input tokens only
+        texts = kwargs["input"] if isinstance(kwargs["input"], list) else [kwargs["input"]]
+        return sum(len(str(t)) for t in texts) // 4 + 1
+    prompt_chars = sum(len(str(m.get("content", ""))) for m in kwargs.get("messages") or [])
+    return prompt_chars // 4 + int(kwargs.get("max_tokens") or 256)
+
+
+class _Embeddings:
+    def __init__(self, gateway: "LLMGateway"):
+        self._gateway = gateway
+
+    def create(self, deadline: Optional[float] = None, **kwargs):
+        """embeddings.create with the gateway policy"""
+        client = self._gateway._client
+        # Checked before admission so a client without embeddings costs no quota or breaker state
+        if not hasattr(client, "embeddings"):
+            raise AttributeError(f"{type(client).__name__} has no embeddings API")
+        return self._gateway._call(lambda **kw: client.embeddings.create(**kw), kwargs, deadline)
+
+
+class LLMGateway:
+    """OpenAI-compatible client wrapper applying the policy described in the module docstring"""
+
+    def __init__(self, client, rpm: float = LLM_RPM, tpm: float = LLM_TPM, burst_seconds: float = LLM_BURST_SECONDS,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, max_retries: int = LLM_MAX_RETRIES,
+                 deadline: float = LLM_DEADLINE_SECONDS, breaker: Optional[CircuitBreaker] = None,
+                 hedge_after: str = LLM_HEDGE_AFTER):
+        self._client = client
+        self.requests = TokenBucket(rpm / 60, max(1.0, rpm / 60 * burst_seconds))
+        self.tokens = TokenBucket(tpm / 60, max(1.0, tpm / 60 * burst_seconds))
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge_after = str(hedge_after).strip().lower()
+        self._latencies: Dict[str, deque] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency * 2, thread_name_prefix="llm-gateway")
+        self.counts = Counter()
+        self.waited_seconds = 0.0
+        self._lock = threading.Lock()
+        self.chat = type("Chat", (), {})()
+        self.chat.completions = self
+        self.embeddings = _Embeddings(self)
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+    def _count(self, key: str, amount: float = 1):
+        with self._lock:
+            self.counts[key] += amount
+
+    def _hedge_delay(self, model: str) -> Optional[float]:
+        if self.hedge_after in ("", "0", "off"):
+            return None
+        if not self.hedge_after.startswith("p"):
+            return float(self.hedge_after)
+        samples = sorted(self._latencies.get(model) or ())
+        if len(samples) < 20:
+            return None
+        percentile = float(self.hedge_after[1:]) / 100
+        return max(LLM_HEDGE_MIN_SECONDS, samples[min(len(samples) - 1, int(percentile * len(samples)))])
+
+    def _admit(self, estimate: int, deadline: float):
+        """Wait for quota and a concurrency slot; raise LLMUnavailable if they cannot be had in time"""
+        waits = []
+        reserved = []
+        for bucket, amount, name in ((self.requests, 1, "requests"), (self.tokens, estimate, "tokens")):
+            wait_seconds = bucket.reserve(amount, deadline)
+            if wait_seconds is None:
+                for taken, taken_amount in reserved:
+                    taken.refund(taken_amount)
+                self._count("quota_rejections")
+                raise LLMUnavailable(f"LLM {name} per minute quota exhausted for this deadline",
+                                     retry_after=amount / bucket.rate)
+            reserved.append((bucket, amount))
+            waits.append(wait_seconds)
+        if max(waits):
+            self._count("quota_waits")
+            with self._lock:
+                self.waited_seconds += max(waits)
+            time.sleep(max(waits))
+        if not self.slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            for bucket, amount in reserved:
+                bucket.refund(amount)
+            self._count("slot_timeouts")
+            raise LLMUnavailable("No LLM concurrency slot within the deadline")
+
+    def _attempt(self, target, kwargs: Dict[str, Any], deadline: float):
+        started = time.monotonic()
+        try:
+            # Hedges run on worker threads; sample them for the request being profiled
+            with attach():
+                response = target(**kwargs, timeout=max(0.1, deadline - time.monotonic()))
+        finally:
+            self.slots.release()
+        if not kwargs.get("stream"):
+            latencies = self._latencies.setdefault(kwargs.get("model", ""), deque(maxlen=256))
+            latencies.append(time.monotonic() - started)
+        return response
+
+    def _hedged(self, target, kwargs: Dict[str, Any], deadline: float, estimate: int):
+        """Run one attempt, adding a duplicate if it is slower than the hedge delay"""
+        delay = None if kwargs.get("stream") else self._hedge_delay(kwargs.get("model", ""))
+        if delay is None:
+            return self._attempt(target, kwargs, deadline)
+
+        # Worker threads get a copy of the caller's context so tracing labels carry over
+        primary = self._executor.submit(contextvars.copy_context().run, self._attempt, target, kwargs, deadline)
+        done, _ = wait([primary], timeout=min(delay, max(0.0, deadline - time.monotonic())))
+        if done:
+            return primary.result()
+        # Only hedge with spare capacity: no waiting for quota and a free slot
+        if not (self.breaker.state == "closed" and self.requests.try_take(1)):
+            return primary.result(timeout=max(0.0, deadline - time.monotonic()))
+        if not self.tokens.try_take(estimate):
+            self.requests.refund(1)
+            return primary.result(timeout=max(0.0, deadline - time.monotonic()))
+        if not self.slots.acquire(blocking=False):
+            self.requests.refund(1)
+            self.tokens.refund(estimate)
+            return primary.result(timeout=max(0.0, deadline - time.monotonic()))
+        self._count("hedges")
+        hedge = self._executor.submit(contextvars.copy_context().run, self._attempt, target, kwargs, deadline)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error or TimeoutError("LLM call exceeded its deadline")
+
+    def create(self, deadline: Optional[float] = None, **kwargs):
+        """chat.completions.create with the gateway policy; ``deadline`` is in seconds from now"""
+        return self._call(lambda **kw: self._client.chat.completions.create(**kw), kwargs, deadline)
+
+    def _call(self, target, kwargs: Dict[str, Any], deadline: Optional[float]):
+        """``target(**kwargs)`` under the policy; a caller's ``timeout`` serves as the deadline"""
+        self._count("calls")
+        timeout = kwargs.pop("timeout", None)
+        deadline_at = time.monotonic() + (deadline or timeout or self.deadline)
+        estimate = _estimate_tokens(kwargs)
+
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                self._count("breaker_rejections")
+                raise LLMUnavailable("LLM circuit breaker is open", retry_after=self.breaker.retry_after())
+            try:
+                self._admit(estimate, deadline_at)
+            except LLMUnavailable:
+                # Our own quota or slots ran out, the provider was not asked; a half-open probe stays available
+                self.breaker.cancel_probe()
+                raise
+            self._count("attempts")
+            try:
+                response = self._hedged(target, kwargs, deadline_at, estimate)
+            except Exception as e:
+                if not is_retryable(e):
+                    # The provider answered; the request itself is wrong
+                    self.breaker.success()
+                    raise
+                self.breaker.failure()
+                self._count(f"errors.{getattr(e, 'status_code', None) or type(e).__name__}")
+                backoff = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+                backoff = max(backoff, _retry_after(e) or 0.0)
+                if attempt == self.max_retries or time.monotonic() + backoff >= deadline_at:
+                    raise LLMUnavailable(f"LLM call failed after {attempt + 1} attempts: {e}",
+                                         retry_after=backoff) from e
+                self._count("retries")
+                time.sleep(backoff)
+                continue
+
+            self.breaker.success()
+            usage = getattr(response, "usage", None)
+            if usage is not None and getattr(usage, "total_tokens", None):
+                # Give back what the estimate over-reserved
+                self.tokens.refund(max(0, estimate - usage.total_tokens))
+            return response
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self.counts)
+        return {
+            **counts,
+            "waited_seconds": round(self.waited_seconds, 3),
+            "breaker": self.breaker.state,
+            "breaker_opens": self.breaker.opens,
+            "hedge_after": {model: self._hedge_delay(model) for model in self._latencies}
+        }
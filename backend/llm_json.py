@@ -0,0 +1,299 @@
+import json
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from llm_gateway import LLMUnavailable
+from model_router import router
+from telemetry import TELEMETRY_ENABLED, metrics
+
+FENCE_RE = re.compile(r"```[a-zA-Z]*\s*\n?(.*?)```", re.DOTALL)
+TRAILING_COMMA_RE = re.compile(r",\s*([\]}])")
+
+_decoder = json.JSONDecoder()
+
+
+class StructuredOutputError(ValueError):
+    """The model output could not be turned into the expected JSON, even after repair"""
+
+    def __init__(self, message: str, raw: str):
+        super().__init__(message)
+        self.raw = raw
+
+
+def strip_code_fences(text: str) -> str:
+    """Return the body of the first ``` fenced block, or the text unchanged"""
+    match = FENCE_RE.search(text)
+    return match.group(1).strip() if match else text.strip()
+
+
+def extract_json(text: str) -> Any:
+    """Tolerantly pull the first JSON value out of a model response.
+
+    Handles ```json fences, prose before/after the JSON and trailing commas.
+    Raises ValueError if nothing parseable is found.
+    """
+    if text is None:
+        raise ValueError("Empty response")
+    candidates = [strip_code_fences(text), text]
+
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            pass
+
+        for fixed in (candidate, TRAILING_COMMA_RE.sub(r"\1", candidate)):
+            for match in re.finditer(r"[\[{]", fixed):
+                try:
+                    value, _ = _decoder.raw_decode(fixed, match.start())
+                    return value
+                except json.JSONDecodeError:
+                    continue
+
+    raise ValueError("No JSON value found in response")
+
+
+class IncrementalJSONParser:
+    """Extract array items from a JSON response while it is still streaming.
+
+    Feed text chunks as they arrive; ``feed`` returns the items of the first
+    JSON array in the stream that have been completed so far. The array may be
+    top level or wrapped in an object (JSON mode), and fences or prose around
+    it are skipped. Call ``result`` at the end for the whole parsed value.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._array_depth = None  # depth of the array whose items we emit
+        self._item_start = None
+
+    def feed(self, chunk: str) -> List[Any]:
+        self.buffer += chunk
+        items = []
+        text = self.buffer
+
+        while self._pos < len(text):
+            ch = text[self._pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._item_start is not None and self._depth == self._array_depth:
+                        items.extend(self._close_item(self._pos + 1))
+            elif ch == '"':
+                self._in_string = True
+                if self._array_depth is not None and self._depth == self._array_depth and self._item_start is None:
+                    self._item_start = self._pos
+            elif ch in "[{":
+                if self._array_depth is not None and self._depth == self._array_depth and self._item_start is None:
+                    self._item_start = self._pos
+                self._depth += 1
+                if ch == "[" and self._array_depth is None:
+                    self._array_depth = self._depth
+            elif ch in "]}":
+                if self._array_depth is not None and self._depth == self._array_depth and self._item_start is not None:
+                    # Scalar item (number, true, ...) terminated by the closing bracket
+                    items.extend(self._close_item(self._pos))
+                self._depth -= 1
+                if self._array_depth is not None and self._depth == self._array_depth and self._item_start is not None:
+                    items.extend(self._close_item(self._pos + 1))
+                if self._array_depth is not None and self._depth < self._array_depth:
+                    self._array_depth = -1  # first array done; ignore anything after it
+            elif ch == ",":
+                if self._array_depth is not None and self._depth == self._array_depth and self._item_start is not None:
+                    items.extend(self._close_item(self._pos))
+            elif not ch.isspace():
+                if self._array_depth is not None and self._depth == self._array_depth and self._item_start is None:
+                    self._item_start = self._pos
+            self._pos += 1
+
+        return items
+
+    def _close_item(self, end: int) -> List[Any]:
+        raw = self.buffer[self._item_start:end].strip()
+        self._item_start = None
+        if not raw:
+            return []
+        try:
+            return [json.loads(raw)]
+        except json.JSONDecodeError:
+            return []
+
+    def result(self) -> Any:
+        return extract_json(self.buffer)
+
+
+class ParseStats:
+    """Per prompt-type counters of how model JSON was obtained"""
+
+    OUTCOMES = ("direct", "recovered", "repaired", "failed")
+
+    def __init__(self):
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, outcome: str):
+        with self._lock:
+            counts = self._counts.setdefault(name, {o: 0 for o in self.OUTCOMES})
+            counts[outcome] += 1
+        if TELEMETRY_ENABLED:
+            metrics.inc("llm_json_parse_total", prompt=name, outcome=outcome)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            report = {}
+            for name, counts in self._counts.items():
+                total = sum(counts.values())
+                report[name] = {
+                    **counts,
+                    "total": total,
+                    # Responses that needed more than a plain json.loads
+                    "malformed_rate": round((total - counts["direct"]) / total, 3) if total else 0.0,
+                    "failure_rate": round(counts["failed"] / total, 3) if total else 0.0
+                }
+            return report
+
+
+parse_stats = ParseStats()
+
+
+def _parse(text: str, key: Optional[str], validate: Optional[Callable[[Any], bool]]):
+    """Return (value, outcome) or raise ValueError"""
+    try:
+        value, outcome = json.loads(text.strip()), "direct"
+    except (json.JSONDecodeError, AttributeError):
+        value, outcome = extract_json(text), "recovered"
+
+    if key is not None and isinstance(value, dict) and key in value:
+        value = value[key]
+    elif key is not None and isinstance(value, dict):
+        # JSON mode sometimes picks its own wrapper key; take the only list in the object
+        lists = [v for v in value.values() if isinstance(v, list)]
+        if len(lists) == 1:
+            value = lists[0]
+
+    if validate is not None and not validate(value):
+        raise ValueError("Response JSON does not have the expected shape")
+    return value, outcome
+
+
+def complete_json(client, prompt: str, *, name: str, model: Optional[str] = None, max_tokens: int = 400,
+                  temperature: float = 0.3, key: Optional[str] = None,
+                  validate: Optional[Callable[[Any], bool]] = None, retries: int = 1,
+                  on_item: Optional[Callable[[Any], None]] = None) -> Any:
+    """Run a completion in JSON mode and return the parsed value.
+
+    ``key`` unwraps a field of the returned object (JSON mode always returns
+    an object, so list answers come wrapped). ``validate`` checks the shape.
+    On malformed output up to ``retries`` cheap repair calls are made that
+    send back only the broken text, not the original prompt. If ``on_item``
+    is given the response is streamed and each array item is passed to it
+    as soon as it is complete. Raises StructuredOutputError when nothing
+    usable comes back, including when the LLM gateway gives up, so callers
+    fall back instead of failing the request.
+
+    Without an explicit ``model`` the model router picks the tiers for
+    ``name`` and escalates to the next one when a tier's output cannot be
+    used. Streamed calls stay on the first tier, since their items have
+    already been handed out.
+    """
+    def attempt(params: Dict[str, Any]) -> Any:
+        return _complete_json(client, prompt, name, params["model"], params["max_tokens"], params["temperature"],
+                              key, validate, retries, on_item)
+
+    if model is not None:
+        return attempt({"model": model, "max_tokens": max_tokens, "temperature": temperature})
+    return router.run(name, attempt, cascade=on_item is None, max_tokens=max_tokens, temperature=temperature)
+
+
+def _complete_json(client, prompt: str, name: str, model: str, max_tokens: int, temperature: float,
+                   key: Optional[str], validate: Optional[Callable[[Any], bool]], retries: int,
+                   on_item: Optional[Callable[[Any], None]]) -> Any:
+    try:
+        raw = _complete_raw(client, prompt, model, max_tokens, temperature, on_item)
+    except LLMUnavailable as e:
+        raise StructuredOutputError(f"Could not get {name} response: {e}", "") from e
+
+    try:
+        value, outcome = _parse(raw, key, validate)
+        parse_stats.record(name, outcome)
+        return value
+    except ValueError as e:
+        error = str(e)
+
+    for _ in range(max(0, retries)):
+        shape = f'an object with a "{key}" field' if key else "the intended JSON value"
+        repair_prompt = (
+            f"The following output was meant to be valid JSON ({shape}) but is malformed: {error}.\n"
+            f"Return only the corrected JSON, changing as little as possible.\n\n{raw[-4000:]}"
+        )
+        try:
+            response = client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": repair_prompt}],
+                max_tokens=max_tokens,
+                temperature=0,
+                response_format={"type": "json_object"}
+            )
+            value, _ = _parse(response.choices[0].message.content or "", key, validate)
+            parse_stats.record(name, "repaired")
+            return value
+        except ValueError as e:
+            error = str(e)
+        except LLMUnavailable:
+            break
+
+    parse_stats.record(name, "failed")
+    raise StructuredOutputError(f"Could not parse {name} response: {error}", raw)
+
+
+def _complete_raw(client, prompt: str, model: str, max_tokens: int, temperature: float,
+                  on_item: Optional[Callable[[Any], None]]) -> str:
+    messages = [{"role": "user", "content": prompt}]
+
+    if on_item is not None:
+        parser = IncrementalJSONParser()
+        stream = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            response_format={"type": "json_object"},
+            stream=True
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            for item in parser.feed(delta):
+                on_item(item)
+        return parser.buffer
+
+    response = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        response_format={"type": "json_object"}
+    )
+    return response.choices[0].message.content or ""
+
+
+def is_string_list(value: Any) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(v, str) for v in value)
+
+
+def is_dict_list(value: Any, required: Iterable[str] = ()) -> bool:
+    required = tuple(required)
+    return isinstance(value, list) and all(
+        isinstance(v, dict) and all(k in v for k in required) for v in value
+    )
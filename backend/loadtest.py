@@ -0,0 +1,282 @@
+"""Load generator replaying the chatbot's conversations against the API.
+
+Each conversation follows frontend/src/components/Chatbot.jsx:
+
+1. analyse the company with the default pain points (marketing, sales, operations)
+2. analyse again with pain points picked from the suggestions
+3. express interest in the first recommended project (its name as the interest)
+4. follow-up messages, each a /project-interest call about that project
+5. AI Lab questions to /ask
+
+Conversations arrive as a Poisson process at ``--rate`` per second (or all
+at once with ``--rate 0``) and at most ``--concurrency`` run at the same
+time. Without ``--url`` the API is started in-process with the fake LLM,
+SERP and graph providers, so no network or database is needed:
+
+    python loadtest.py --conversations 200 --concurrency 16 --rate 10 --output loadtest.json
+    FAKE_LLM_LATENCY_MS=800 FAKE_LLM_MS_PER_TOKEN=15 python loadtest.py --concurrency 32
+
+The report has throughput, per-stage latency percentiles and histograms
+(fixed buckets, so reports from different runs line up), status codes and
+error rates.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from bench_scale import percentiles
+
+STAGES = ["analyze_initial", "analyze_with_pain_points", "project_interest", "follow_up", "ask"]
+# Upper bounds of the latency histogram buckets, in milliseconds
+BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+DEFAULT_PAIN_POINTS = ["marketing", "sales", "operations"]
+FOLLOW_UPS = [
+    "How long would the integration take with our current stack?",
+    "What would a pilot look like for one team?",
+    "Which of our systems would this need access to?",
+    "What are the main risks of rolling this out?",
+]
+QUESTIONS = [
+    "What projects use AI technology?",
+    "Which projects share the most pain points?",
+    "What are the most common capabilities across all projects?",
+    "Which projects are deployed vs not deployed?",
+    "Which industries have the most projects?",
+]
+
+
+def histogram(samples: List[float]) -> Dict[str, int]:
+    counts = Counter()
+    for seconds in samples:
+        ms = seconds * 1000
+        bucket = next((f"le_{b}" for b in BUCKETS_MS if ms <= b), "le_inf")
+        counts[bucket] += 1
+    return {key: counts[key] for key in [f"le_{b}" for b in BUCKETS_MS] + ["le_inf"]}
+
+
+class Recorder:
+    """Thread-safe latency and outcome samples per stage"""
+
+    def __init__(self):
+        self.latencies = {stage: [] for stage in STAGES}
+        self.statuses = {stage: Counter() for stage in STAGES}
+        self.conversations = Counter()
+        self.conversation_seconds: List[float] = []
+        self.queue_delays: List[float] = []
+        self._lock = threading.Lock()
+
+    def request(self, stage: str, seconds: float, status: str):
+        with self._lock:
+            self.latencies[stage].append(seconds)
+            self.statuses[stage][status] += 1
+
+    def conversation(self, outcome: str, seconds: float, queued: float):
+        with self._lock:
+            self.conversations[outcome] += 1
+            self.conversation_seconds.append(seconds)
+            self.queue_delays.append(queued)
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        stages = {}
+        total_requests = total_errors = 0
+        for stage in STAGES:
+            samples = self.latencies[stage]
+            errors = sum(n for status, n in self.statuses[stage].items() if status != "200")
+            total_requests += len(samples)
+            total_errors += errors
+            stages[stage] = {
+                **percentiles(samples),
+                "max_ms": round(max(samples) * 1000, 2) if samples else None,
+                "errors": errors,
+                "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+                "status_codes": dict(self.statuses[stage]),
+                "share_of_time": round(sum(samples) / max(sum(map(sum, self.latencies.values())), 1e-9), 3),
+                "histogram_ms": histogram(samples)
+            }
+        every = [s for samples in self.latencies.values() for s in samples]
+        return {
+            "elapsed_seconds": round(elapsed, 2),
+            "requests": total_requests,
+            "errors": total_errors,
+            "error_rate": round(total_errors / total_requests, 4) if total_requests else 0.0,
+            "throughput_rps": round(total_requests / elapsed, 2) if elapsed else None,
+            "conversations": {
+                **dict(self.conversations),
+                "per_second": round(sum(self.conversations.values()) / elapsed, 3) if elapsed else None,
+                "duration": percentiles(self.conversation_seconds),
+                "queue_delay": percentiles(self.queue_delays)
+            },
+            "latency": {**percentiles(every), "histogram_ms": histogram(every)},
+            "stages": stages
+        }
+
+
+class Conversation:
+    """One chatbot session, run stage by stage"""
+
+    def __init__(self, base_url: str, index: int, follow_ups: int, asks: int, think_seconds: float,
+                 recorder: Recorder, timeout: float, rng: random.Random):
+        self.base_url = base_url
+        # Fixed width: /project-interest finds the session by substring, so "Company 1" would match "Company 10"
+        self.company = f"Load Test Company {index:06d}"
+        self.follow_ups = follow_ups
+        self.asks = asks
+        self.think_seconds = think_seconds
+        self.recorder = recorder
+        self.timeout = timeout
+        self.rng = rng
+
+    def post(self, session: requests.Session, stage: str, path: str, payload: Dict[str, Any]) -> Optional[Dict]:
+        started = time.perf_counter()
+        try:
+            response = session.post(self.base_url + path, json=payload, timeout=self.timeout)
+            status = str(response.status_code)
+            body = response.json() if response.ok else None
+        except requests.RequestException as e:
+            status, body = type(e).__name__, None
+        except ValueError:
+            status, body = "invalid_json", None
+        self.recorder.request(stage, time.perf_counter() - started, status)
+        if self.think_seconds:
+            time.sleep(self.rng.expovariate(1 / self.think_seconds))
+        return body
+
+    def run(self, session: requests.Session) -> str:
+        first = self.post(session, "analyze_initial", "/analyze-company", {
+            "company_name": self.company, "pain_points": DEFAULT_PAIN_POINTS, "additional_context": None
+        })
+        if first is None:
+            return "failed_analysis"
+
+        suggested = first.get("suggested_pain_points") or first.get("identified_pain_points") or DEFAULT_PAIN_POINTS
+        picked = self.rng.sample(suggested, min(3, len(suggested)))
+        second = self.post(session, "analyze_with_pain_points", "/analyze-company", {
+            "company_name": self.company, "pain_points": picked, "additional_context": None
+        })
+        projects = ((second or first).get("recommended_projects") or [])
+        if projects:
+            project = projects[0]
+            self.post(session, "project_interest", "/project-interest", {
+                "company_name": self.company, "project_id": project["project_id"],
+                "user_interest": project["project_name"], "current_systems": ""
+            })
+            for i in range(self.follow_ups):
+                self.post(session, "follow_up", "/project-interest", {
+                    "company_name": self.company, "project_id": project["project_id"],
+                    "user_interest": FOLLOW_UPS[(i + self.rng.randrange(len(FOLLOW_UPS))) % len(FOLLOW_UPS)],
+                    "current_systems": ""
+                })
+
+        for _ in range(self.asks):
+            self.post(session, "ask", "/ask", {"question": self.rng.choice(QUESTIONS)})
+        return "completed" if projects else "no_recommendations"
+
+
+def start_offline_server() -> Any:
+    """Serve the API in this process on a free port with the fake providers; returns (url, main module)"""
+    from fakes import isolate_state
+    isolate_state("loadtest_")
+    for name in ("LLM_PROVIDER", "SERP_PROVIDER", "GRAPH_PROVIDER"):
+        os.environ[name] = "fake"
+
+    import uvicorn
+    import main
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}", main
+
+
+def run(base_url: str, conversations: int, concurrency: int, rate: float, follow_ups: int, asks: int,
+        think_seconds: float, timeout: float, seed: int) -> Dict[str, Any]:
+    recorder = Recorder()
+    rng = random.Random(seed)
+    local = threading.local()
+
+    def conversation(index: int, arrived: float, conversation_seed: int):
+        started = time.perf_counter()
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        try:
+            outcome = Conversation(base_url, index, follow_ups, asks, think_seconds, recorder, timeout,
+                                   random.Random(conversation_seed)).run(local.session)
+        except Exception as e:
+            print(f"Conversation {index} crashed: {e}")
+            outcome = "crashed"
+        recorder.conversation(outcome, time.perf_counter() - started, started - arrived)
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        next_arrival = began
+        for index in range(conversations):
+            if rate > 0:
+                next_arrival += rng.expovariate(rate)
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            pool.submit(conversation, index, time.perf_counter(), rng.randrange(2 ** 32))
+    return recorder.report(time.perf_counter() - began)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay chatbot conversations against the API")
+    parser.add_argument("--url", help="API base URL; without it the API runs in-process on the fakes")
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8, help="Conversations in flight at once")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="Conversation arrivals per second (Poisson); 0 starts them all at once")
+    parser.add_argument("--follow-ups", type=int, default=2, help="Follow-up messages per conversation")
+    parser.add_argument("--asks", type=int, default=1, help="/ask questions per conversation")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Mean pause between a user's requests")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    api = None
+    base_url = args.url
+    if not base_url:
+        base_url, api = start_offline_server()
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    config = {key: value for key, value in vars(args).items() if key != "output"}
+    fakes_config = {key: value for key, value in os.environ.items() if key.startswith("FAKE_")}
+    report = {
+        "meta": {"commit": commit, "target": args.url or "in-process fakes", "config": config,
+                 "fakes": fakes_config, "python": sys.version.split()[0], "platform": platform.platform(),
+                 "started_at": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        **run(base_url, args.conversations, args.concurrency, args.rate, args.follow_ups, args.asks,
+              args.think_ms / 1000, args.timeout, args.seed)
+    }
+    if api is not None:
+        report["llm_calls"] = dict(api.qa_system.client.calls)
+        report["graph_calls"] = dict(api.qa_system.graph.calls)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,59 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, UploadFile, File, Header, Query
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse, Response
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, Iterator
+import contextvars
+import hmac
 import json
 import os
-from openai import OpenAI
+import queue
+import threading
+import time
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-import requests
+from neo4j.exceptions import Neo4jError
 import asyncio
 from enum import Enum
 from fastapi.middleware.cors import CORSMiddleware
-
-try:
-    from langchain_neo4j import  Neo4jGraph
-except ImportError:
-    from langchain_community.graphs import Neo4jGraph
+from batch import BatchAnalyzer, load_companies_jsonl, checkpoint_path_for
+from jobs import JobQueue, MAX_PRIORITY, MIN_PRIORITY, TERMINAL_STATES
+from plan_cache import IntegrationPlanCache, industry_bucket, systems_signature
+from prompt_budget import encode_candidates
+from results import ResultDigest, capped
+from cypher_guard import CypherGuard, QueryRejected, QueryFailed, is_well_formed
+from cypher_repair import CypherRepairer
+from schema_service import SchemaService
+from providers import make_graph, make_llm_client, make_serp_provider
+from queries import QUERIES, WARM_PARAMS
+from telemetry import TELEMETRY_ENABLED, SERP_COST_USD, TelemetryMiddleware, add_cost, metrics, record, span, traced
+from llm_gateway import LLMGateway, LLMUnavailable
+from model_router import router
+from pain_point_canon import PainPointCanonicaliser, make_embedder
+from recommendations import MATERIALISED_RECOMMENDATIONS, RecommendationStore
+from graph_rank import GRAPH_RANK_ENABLED, GraphRanker, graph_loader
+from catalogue import CATALOGUE_MAX_PAGE_SIZE, CATALOGUE_PAGE_SIZE, CatalogueBrowser, CatalogueSnapshot, etag, not_modified
+from profiling import PROFILING_ENABLED, PROFILE_ADMIN_TOKEN, ProfiledRoute, ProfilingMiddleware, sampler as profile_sampler, store as profile_store
+from llm_json import complete_json, parse_stats, strip_code_fences, is_string_list, is_dict_list, StructuredOutputError
 
 load_dotenv()
 
-app = FastAPI(title="Graph Knowledge QA API", version="1.0.0")
+# Backends connect in the background after the server binds; requests that
+# need them before that connect on demand
+CONNECT_ON_STARTUP = os.getenv("CONNECT_ON_STARTUP", "true").lower() == "true"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_job_queue().start()
+    if CONNECT_ON_STARTUP:
+        threading.Thread(target=qa_system.warm_up, name="qa-warm-up", daemon=True).start()
+    yield
+    if _job_queue is not None:
+        _job_queue.stop()
+    qa_system.plan_cache.flush()
+
+
+app = FastAPI(title="Graph Knowledge QA API", version="1.0.0", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -25,6 +61,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Stack samples of slow and sampled requests, viewable under /admin/profiles.
+# Added before (so inside) the telemetry middleware, whose trace it reads
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+    # Sync endpoints run on threadpool threads, which are sampled through their route
+    app.router.route_class = ProfiledRoute
+# Per-request traces and latency/cost histograms for /metrics
+app.add_middleware(TelemetryMiddleware)
 
 
 # Pydantic models
@@ -38,6 +82,8 @@ class QuestionResponse(BaseModel):
     cypher_query: Optional[str] = None
     raw_results: Optional[List[Dict[str, Any]]] = None
     confidence: Optional[str] = None
+    result_summary: Optional[Dict[str, Any]] = None  # Row count and column aggregates of the full result
+    repairs: Optional[List[str]] = None  # How a failing generated query was fixed (cache, rules, llm)
 
 class CompanyAnalysisRequest(BaseModel):
     company_name: str
@@ -64,76 +110,223 @@ class CompanyAnalysisResponse(BaseModel):
     integration_suggestions: Optional[Dict[str, Any]] = None
     message: Optional[str] = None  # For guiding the user
 
+class BatchAnalysisRequest(BaseModel):
+    companies: List[CompanyAnalysisRequest]
+    max_workers: Optional[int] = 4
+    checkpoint_id: Optional[str] = None  # Reuse the same id to resume an interrupted batch
+
 class ProjectInterestRequest(BaseModel):
     company_name: str
     project_id: str
     user_interest: str
     current_systems: Optional[str] = None
 
+# Shared by the single and packed pain point prompts
+COMMON_PAIN_POINTS = """        - Manual processes that could be automated
+        - Data analysis and reporting challenges
+        - Customer service and engagement issues
+        - Security and compliance concerns
+        - Sales and marketing inefficiencies
+        - HR and recruitment challenges
+        - Contract and legal document management
+        - Manufacturing and operational inefficiencies
+        - Technology integration challenges
+        - Data management and analytics
+        - Customer relationship management
+        - Process automation needs"""
+
+# Companies per completion in suggest_pain_points_batch
+PAIN_POINT_PACK_SIZE = int(os.getenv("PAIN_POINT_PACK_SIZE", "5"))
+
+# Token budget for the candidate table sent to _semantic_project_matching
+SEMANTIC_MATCH_TOKEN_BUDGET = int(os.getenv("SEMANTIC_MATCH_TOKEN_BUDGET", "1500"))
+# Matches are topped up to this many with the projects closest to the pain points in the graph
+RELATED_PROJECTS_FILL = int(os.getenv("RELATED_PROJECTS_FILL", "5"))
+
+# /ask never reads more rows than this from Neo4j; records are pulled in batches of QA_FETCH_SIZE
+QA_ROW_CAP = int(os.getenv("QA_ROW_CAP", "1000"))
+QA_FETCH_SIZE = int(os.getenv("QA_FETCH_SIZE", "100"))
+# Generated queries whose plan estimates more rows than this at any step are refused
+QA_MAX_ESTIMATED_ROWS = float(os.getenv("QA_MAX_ESTIMATED_ROWS", "1000000"))
+QA_QUERY_TIMEOUT = float(os.getenv("QA_QUERY_TIMEOUT", "10"))
+# Attempts at fixing a generated query that fails to plan or run, and how many of them may call the LLM
+QA_MAX_REPAIRS = int(os.getenv("QA_MAX_REPAIRS", "3"))
+QA_MAX_LLM_REPAIRS = int(os.getenv("QA_MAX_LLM_REPAIRS", "1"))
+
+# SQLite file of the background job queue
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.db")
+
+# Returned when no integration plan could be generated
+DEFAULT_INTEGRATION_PLAN = {
+    "implementation_approach": "Custom integration approach needed",
+    "technical_requirements": ["API integration", "Authentication setup"],
+    "timeline": {"phase_1": "2-3 weeks: Initial setup and testing"},
+    "expected_benefits": ["Improved efficiency", "Better user experience"],
+    "potential_challenges": ["System integration complexity"],
+    "next_steps": ["Schedule demo", "Discuss technical requirements"],
+    "pilot_suggestions": "Start with a small pilot group to test functionality"
+}
+
+# Tailor cached integration plans to the company with a small extra completion
+PERSONALISE_INTEGRATION_PLANS = os.getenv("PERSONALISE_INTEGRATION_PLANS", "true").lower() == "true"
+# Industry names are reloaded when the graph version stamp changes, and at least this often (seconds)
+INDUSTRIES_TTL = float(os.getenv("INDUSTRIES_TTL", "300"))
+
 class GraphQASystem:
     def __init__(self, neo4j_url="bolt://localhost:7687", username="neo4j", password="test1234"):
-        """Initialize Neo4j connection and OpenAI client"""
-        self.graph = Neo4jGraph(
-            url=neo4j_url,
-            username=username,
-            password=password,
-            refresh_schema=True
-        )
+        """Store connection settings; Neo4j, LLM and search clients are created on first use"""
+        self.neo4j_url = neo4j_url
+        self.username = username
+        self.password = password
+        self._graph = None
+        self._client = None
+        self._serp = None
+        self._connect_lock = threading.Lock()
+        self.startup = {"neo4j": "pending", "schema": "pending", "connect_seconds": None, "query_plans": None}
         
-        # Initialize OpenAI client
-        self.client = OpenAI(
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
+        # Integration plans shared per (project, industry, systems) bucket
+        self.plan_cache = IntegrationPlanCache()
+        # Top projects per pain point, materialised after each graph build
+        self.recommendations = RecommendationStore()
+        # Project browsing by facet, from a snapshot reloaded every CATALOGUE_SNAPSHOT_TTL seconds
+        self.catalogue = CatalogueBrowser(lambda: self.graph.run("catalogue_snapshot"))
+        self._industries = None  # (graph version, loaded at, names)
+        self._pain_point_canon = None
+        self._graph_ranker = None
+    
+    @property
+    def client(self):
+        """OpenAI-compatible client from LLM_PROVIDER behind the shared LLM gateway.
         
-        # Graph schema for context
-        self.schema_context = self._get_schema_context()
-    
-    def _get_schema_context(self):
-        """Get graph schema information for OpenAI context"""
-        return """
-        GRAPH SCHEMA:
-        Node Types:
-        - Project: {id, name, summary, url, deployment_status}
-        - PainPoint: {name, popularity}
-        - Capability: {name, popularity}
-        - Industry: {name, popularity}
-        - Technology: {name}
-        - Domain: {name}
-        - Regulation: {name}
-        
-        Relationships:
-        - (Project)-[:ADDRESSES]->(PainPoint)
-        - (Project)-[:HAS_CAPABILITY]->(Capability)
-        - (Project)-[:TARGETS]->(Industry)
-        - (Project)-[:USES_TECHNOLOGY]->(Technology)
-        - (Project)-[:BELONGS_TO]->(Domain)
-        - (Project)-[:COMPLIES_WITH]->(Regulation)
-        - (Project)-[:SHARES_PAIN_POINTS]-(Project)
-        - (Project)-[:SHARES_CAPABILITIES]-(Project)
-        - (Project)-[:SHARES_INDUSTRIES]-(Project)
-        - (Project)-[:SHARES_TECHNOLOGIES]-(Project)
-        - (Project)-[:SHARES_DOMAINS]-(Project)
+        The gateway rate limits, retries, hedges and circuit breaks; tracing sits
+        inside it so every attempt is recorded. The package is imported on first use.
         """
+        if self._client is None:
+            self._client = LLMGateway(traced(make_llm_client()))
+        return self._client
+    
+    @client.setter
+    def client(self, client):
+        self._client = client
+    
+    @property
+    def pain_point_canon(self) -> PainPointCanonicaliser:
+        """Maps pain point texts onto the graph's PainPoint names; the vocabulary is reloaded every CANONICAL_VOCAB_TTL seconds"""
+        if self._pain_point_canon is None:
+            self._pain_point_canon = PainPointCanonicaliser(
+                embedder=make_embedder(self.client),
+                loader=lambda: self.graph.run("pain_point_vocabulary")
+            )
+        return self._pain_point_canon
+    
+    @property
+    def graph_ranker(self) -> GraphRanker:
+        """Personalised PageRank over projects and pain points; the graph is reloaded every GRAPH_RANK_TTL seconds"""
+        if self._graph_ranker is None:
+            self._graph_ranker = GraphRanker(graph_loader(self.graph))
+        return self._graph_ranker
+    
+    @property
+    def serp(self):
+        """Search provider from SERP_PROVIDER"""
+        if self._serp is None:
+            self._serp = make_serp_provider()
+        return self._serp
+    
+    @serp.setter
+    def serp(self, serp):
+        self._serp = serp
+    
+    @property
+    def graph(self):
+        """Neo4j connection, opened on first use"""
+        if self._graph is None:
+            with self._connect_lock:
+                if self._graph is None:
+                    self._connect()
+        return self._graph
+    
+    @property
+    def connected(self) -> bool:
+        return self._graph is not None
+    
+    def _connect(self):
+        started = time.perf_counter()
+        try:
+            graph = make_graph(self.neo4j_url, self.username, self.password)
+            graph.verify()
+            for name, text in QUERIES.items():
+                graph.prepare(name, text)
+        except Exception as e:
+            self.startup["neo4j"] = f"error: {e}"
+            raise
+        
+        # Graph schema for context
+        self._schema_service = SchemaService(graph.driver, database=graph.database)
+        
+        # Safety and cost gate for LLM generated Cypher
+        self._cypher_guard = CypherGuard(
+            graph.driver,
+            database=graph.database,
+            max_rows=QA_ROW_CAP + 1,  # one over the cap so truncation can be detected
+            max_estimated_rows=QA_MAX_ESTIMATED_ROWS
+        )
+        
+        # Fixes generated queries that fail with syntax or schema errors
+        self._cypher_repairer = CypherRepairer(self.client, self._schema_service)
+        
+        self._graph = graph
+        self.startup["neo4j"] = "ready"
+        self.startup["connect_seconds"] = round(time.perf_counter() - started, 3)
+    
+    # Everything below needs the Neo4j driver, so it is created with the connection
+    
+    @property
+    def schema_service(self) -> SchemaService:
+        self.graph
+        return self._schema_service
+    
+    @property
+    def cypher_guard(self) -> CypherGuard:
+        self.graph
+        return self._cypher_guard
+    
+    @property
+    def cypher_repairer(self) -> CypherRepairer:
+        self.graph
+        return self._cypher_repairer
+    
+    def warm_up(self):
+        """Connect to Neo4j and load the graph schema; run in the background at startup"""
+        try:
+            self.graph
+            # Compile the fixed service queries once so requests run on cached plans
+            self.startup["query_plans"] = self.graph.warm(WARM_PARAMS)
+            if GRAPH_RANK_ENABLED:
+                self.graph_ranker.refresh()
+            # Without a snapshot prompts fall back to the static schema
+            self.startup["schema"] = "ready" if self.schema_service.snapshot() else "static"
+        except Exception as e:
+            print(f"Error connecting to Neo4j at startup: {e}")
+    
+    def readiness(self) -> Dict[str, Any]:
+        return {"ready": self.connected, **self.startup}
+    
+    @property
+    def schema_context(self) -> str:
+        """Graph schema prompt fragment, re-introspected when the graph changes"""
+        return self.schema_service.prompt()
     
     def search_company_info(self, company_name: str) -> Dict[str, Any]:
         """Search for company information using SERP API"""
         try:
-            # SERP API configuration
-            serp_api_key = "31b2d407d3035b81ad59b575e9c82ceca4febe813f1b44ae622208813b42517e"
-            if not serp_api_key:
-                raise HTTPException(status_code=500, detail="SERP API key not configured")
-            
-            # Search for company information
-            search_url = "https://serpapi.com/search"
-            search_params = {
-                "q": f"{company_name} pain points",
-                "api_key": serp_api_key,
-                "engine": "google",
-                "num": 5
-            }
-            
-            response = requests.get(search_url, params=search_params)
-            search_results = response.json()
+            with span("serp"):
+                search_results = self.serp.search({
+                    "q": f"{company_name} pain points",
+                    "engine": "google",
+                    "num": 5
+                })
+            add_cost(SERP_COST_USD)
             
             # Extract relevant information
             company_info = {
@@ -153,10 +346,8 @@ class GraphQASystem:
                 "search_results": []
             }
     
-    def suggest_pain_points(self, company_info: Dict[str, Any]) -> List[str]:
-        """Use OpenAI to suggest potential pain points from company information"""
-        
-        # Create context from search results
+    def _build_company_context(self, company_info: Dict[str, Any]) -> str:
+        """Render the SERP results for a company as prompt context"""
         context = f"Company: {company_info['name']}\n"
         
         if company_info.get("knowledge_graph"):
@@ -169,45 +360,48 @@ class GraphQASystem:
             context += f"Title: {result.get('title', '')}\n"
             context += f"Snippet: {result.get('snippet', '')}\n"
         
+        return context
+    
+    def suggest_pain_points(self, company_info: Dict[str, Any],
+                            on_item: Optional[Callable[[str], None]] = None) -> List[str]:
+        """Use OpenAI to suggest potential pain points from company information"""
+        
+        # Create context from search results
+        context = self._build_company_context(company_info)
+        
         prompt = f"""
         Based on the following company information, suggest potential business pain points and challenges that this company might face. Focus on operational, technical, and business process pain points.
 
         {context}
 
         Common business pain points to consider:
-        - Manual processes that could be automated
-        - Data analysis and reporting challenges
-        - Customer service and engagement issues
-        - Security and compliance concerns
-        - Sales and marketing inefficiencies
-        - HR and recruitment challenges
-        - Contract and legal document management
-        - Manufacturing and operational inefficiencies
-        - Technology integration challenges
-        - Data management and analytics
-        - Customer relationship management
-        - Process automation needs
+{COMMON_PAIN_POINTS}
 
         Please suggest 8-10 specific pain points that this company likely faces based on their industry and business model. Be specific and actionable.
 
-        Return only a JSON array of pain point strings, like:
-        ["pain point 1", "pain point 2", "pain point 3"]
+        Return only a JSON object with the pain point strings, like:
+        {{"pain_points": ["pain point 1", "pain point 2", "pain point 3"]}}
         """
         
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=400,
-            temperature=0.3
-        )
+        # Streamed: each suggestion goes to on_item once complete, unless it restates an earlier one
+        emitted: List[str] = []
+        def emit(item: Any):
+            if isinstance(item, str) and len(self.pain_point_canon.dedupe(emitted + [item])) > len(emitted):
+                emitted.append(item)
+                on_item(item)
         
         try:
-            # Parse the JSON response
-            pain_points = json.loads(response.choices[0].message.content.strip())
-            return pain_points
-        except json.JSONDecodeError:
+            with span("pain_points"):
+                suggestions = complete_json(
+                    self.client, prompt, name="suggest_pain_points", key="pain_points",
+                    max_tokens=400, temperature=0.3, validate=is_string_list,
+                    on_item=emit if on_item is not None else None
+                )
+            # The model often restates a pain point in other words
+            return self.pain_point_canon.dedupe(suggestions)
+        except StructuredOutputError as e:
             # Fallback: extract pain points from text
-            content = response.choices[0].message.content.strip()
+            content = e.raw.strip()
             lines = content.split('\n')
             pain_points = []
             for line in lines:
@@ -217,42 +411,108 @@ class GraphQASystem:
                         pain_points.append(cleaned)
             return pain_points[:10]
     
-    def find_matching_projects(self, pain_points: List[str], company_name: str = None) -> List[Dict[str, Any]]:
-        """Find projects that address the identified pain points with fallback logic"""
-        
-        # Create a comprehensive query to find matching projects
-        pain_points_str = "', '".join(pain_points)
-        
-        # Query for projects that address similar pain points
-        similarity_query = f"""
-        WITH ['{pain_points_str}'] as target_pain_points
-        UNWIND target_pain_points as target_pain
-        MATCH (pp:PainPoint) 
-        WHERE pp.name CONTAINS target_pain OR target_pain CONTAINS pp.name
-        WITH pp, target_pain
-        MATCH (pp)<-[:ADDRESSES]-(p:Project)
-        RETURN p.id, p.name, p.summary, p.url, p.deployment_status,
-               pp.name as matched_pain_point, target_pain,
-               pp.popularity as pain_point_popularity
-        ORDER BY pp.popularity DESC
+    def get_project_catalogue(self) -> List[Dict[str, Any]]:
+        """Fetch every project with its pain points, capabilities and industries"""
+        return self.graph.run("project_catalogue")
+    
+    def suggest_pain_points_batch(self, company_infos: List[Dict[str, Any]],
+                                  pack_size: int = PAIN_POINT_PACK_SIZE) -> List[List[str]]:
+        """Suggest pain points for several companies, packing up to ``pack_size`` per completion.
+        
+        The instructions and the common pain point list are sent once per pack
+        instead of once per company. Companies whose answer is missing or
+        malformed are retried individually with suggest_pain_points.
+        Results are returned in the same order as ``company_infos``.
+        """
+        results: List[Optional[List[str]]] = [None] * len(company_infos)
+        
+        for start in range(0, len(company_infos), max(1, pack_size)):
+            pack = company_infos[start:start + max(1, pack_size)]
+            if len(pack) == 1:
+                results[start] = self.suggest_pain_points(pack[0])
+                continue
+            
+            companies_context = ""
+            for i, company_info in enumerate(pack, 1):
+                companies_context += f"\n[C{i}]\n{self._build_company_context(company_info)}"
+            
+            prompt = f"""
+        For each company below, suggest potential business pain points and challenges that it might face. Focus on operational, technical, and business process pain points.
+
+        Common business pain points to consider:
+{COMMON_PAIN_POINTS}
+
+        Suggest 8-10 specific, actionable pain points per company based on its industry and business model.
+        {companies_context}
+        Return only a JSON object keyed by company tag, like:
+        {{"C1": ["pain point 1", "pain point 2"], "C2": ["pain point 1", "pain point 2"]}}
+        """
+            
+            packed = {}
+            try:
+                with span("pain_points_batch", companies=len(pack)):
+                    packed = complete_json(
+                        self.client, prompt, name="suggest_pain_points_batch",
+                        max_tokens=250 * len(pack), temperature=0.3,
+                        validate=lambda value: isinstance(value, dict)
+                    )
+            except Exception as e:
+                print(f"Error in packed pain point suggestion: {e}")
+            
+            for i, company_info in enumerate(pack, 1):
+                pain_points = packed.get(f"C{i}") if isinstance(packed, dict) else None
+                if isinstance(pain_points, list) and pain_points and all(isinstance(p, str) for p in pain_points):
+                    # Same near duplicate removal as the single company path
+                    results[start + i - 1] = self.pain_point_canon.dedupe(pain_points)[:10]
+                else:
+                    # Retry just this company
+                    results[start + i - 1] = self.suggest_pain_points(company_info)
+        
+        return results
+    
+    def find_matching_projects(self, pain_points: List[str], company_name: str = None,
+                               all_projects: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Find projects that address the identified pain points with fallback logic.
+        
+        Pass ``all_projects`` (see ``get_project_catalogue``) to reuse a catalogue
+        snapshot instead of re-reading it from the graph.
         """
         
         try:
-            results = self.graph.query(similarity_query)
+            # Free text and near duplicates onto the graph's PainPoint names, so each is
+            # looked up once and the ranking prompt lists it once
+            with span("pain_point_canonicalisation", inputs=len(pain_points)) as canon_span:
+                entries = self.pain_point_canon.canonicalise(pain_points)
+                pain_points = [entry["name"] for entry in entries] or pain_points
+                canon_span.set(distinct=len(pain_points))
             
-            # Also do a broader search using OpenAI for semantic matching
-            projects_query = """
-            MATCH (p:Project)-[:ADDRESSES]->(pp:PainPoint)
-            RETURN p.id, p.name, p.summary, p.url, p.deployment_status,
-                   COLLECT(pp.name) as pain_points,
-                   [(p)-[:HAS_CAPABILITY]->(c:Capability) | c.name] as capabilities,
-                   [(p)-[:TARGETS]->(i:Industry) | i.name] as industries
-            """
+            # Known pain points are answered from the materialised lists, without the catalogue or an LLM
+            if MATERIALISED_RECOMMENDATIONS and entries and all(entry["canonical"] for entry in entries):
+                with span("materialised_recommendations") as rec_span:
+                    recommended = self.recommendations.recommend(pain_points)
+                    rec_span.set(hit=recommended is not None)
+                if recommended:
+                    if len(recommended) >= RELATED_PROJECTS_FILL:
+                        return recommended
+                    # Short lists are topped up by the graph walk, with details from the catalogue snapshot
+                    proximity = self._graph_proximity(pain_points)
+                    catalogue = all_projects if all_projects is not None else self.catalogue.snapshot.projects
+                    return self._add_related_projects(recommended, pain_points, catalogue, proximity)
+            
+            # Query for projects that address similar pain points
+            results = self.graph.run("pain_point_matches", {"pain_points": pain_points})
             
-            all_projects = self.graph.query(projects_query)
+            # Rank the projects around the matched PainPoint nodes by a walk over the graph
+            seeds = [entry["name"] for entry in entries if entry["canonical"]]
+            proximity = self._graph_proximity(seeds + [row["matched_pain_point"] for row in results])
+            
+            # Also do a broader search using OpenAI for semantic matching
+            if all_projects is None:
+                all_projects = self.get_project_catalogue()
             
             # Use OpenAI to find the best matches
-            matched_projects = self._semantic_project_matching(pain_points, all_projects, company_name)
+            matched_projects = self._semantic_project_matching(pain_points, all_projects, company_name, proximity)
+            matched_projects = self._add_related_projects(matched_projects, pain_points, all_projects, proximity)
             
             # If no matches found, provide at least one generic suggestion
             if not matched_projects:
@@ -265,21 +525,52 @@ class GraphQASystem:
             # Return fallback projects if there's an error
             return self._get_fallback_projects(company_name)
     
+    def _graph_proximity(self, seeds: List[str]) -> Dict[str, float]:
+        """Projects ranked by the graph walk from the seed pain points; empty when it is disabled"""
+        if not GRAPH_RANK_ENABLED:
+            return {}
+        with span("graph_rank", seeds=len(set(seeds))) as rank_span:
+            proximity = self.graph_ranker.rank(seeds)
+            rank_span.set(projects=len(proximity))
+        return proximity
+    
+    def _add_related_projects(self, matched_projects: List[Dict[str, Any]], pain_points: List[str],
+                              all_projects: List[Dict[str, Any]], proximity: Dict[str, float]) -> List[Dict[str, Any]]:
+        """Fill up to RELATED_PROJECTS_FILL matches with the projects the graph walk ranks highest"""
+        if not proximity or len(matched_projects) >= RELATED_PROJECTS_FILL:
+            return matched_projects
+        catalogue = {project.get("p.id", project.get("id")): project for project in all_projects}
+        seen = {match["project_id"] for match in matched_projects}
+        wanted = set(pain_points)
+        top = max(proximity.values())
+        related = []
+        for project_id, score in proximity.items():
+            project = catalogue.get(project_id)
+            if project_id in seen or project is None:
+                continue
+            addresses = [p for p in project["pain_points"] if p in wanted]
+            related.append({
+                "project_id": project_id,
+                "project_name": project.get("p.name", project.get("name")),
+                "summary": project.get("p.summary", project.get("summary")),
+                "url": project.get("p.url", project.get("url")),
+                "deployment_status": project.get("p.deployment_status", project.get("deployment_status")),
+                # Below the model's confident picks; the walk ranks, it does not judge fit
+                "match_score": max(1, round(60 * score / top)),
+                "explanation": (f"Addresses {', '.join(addresses)}" if addresses else
+                                "Closely connected in the graph to projects that address these pain points"),
+                "addresses_pain_points": addresses or project["pain_points"][:2]
+            })
+            if len(matched_projects) + len(related) >= RELATED_PROJECTS_FILL:
+                break
+        return matched_projects + related
+    
     def _get_fallback_projects(self, company_name: str = None) -> List[Dict[str, Any]]:
         """Provide fallback project suggestions when no matches are found"""
         
-        # Get some general projects from the database
-        fallback_query = """
-        MATCH (p:Project)-[:ADDRESSES]->(pp:PainPoint)
-        WITH p, COUNT(pp) as pain_point_count
-        ORDER BY pain_point_count DESC
-        LIMIT 3
-        RETURN p.id, p.name, p.summary, p.url, p.deployment_status,
-               [(p)-[:ADDRESSES]->(pp2:PainPoint) | pp2.name] as pain_points
-        """
-        
         try:
-            fallback_results = self.graph.query(fallback_query)
+            # Get some general projects from the database
+            fallback_results = self.graph.run("fallback_projects", {"limit": 3})
             
             fallback_projects = []
             for project in fallback_results:
@@ -310,8 +601,15 @@ class GraphQASystem:
                 "deployment_status": "Available"
             }]
     
-    def _semantic_project_matching(self, pain_points: List[str], all_projects: List[Dict], company_name: str = None) -> List[Dict[str, Any]]:
-        """Use OpenAI to semantically match pain points with projects"""
+    def _semantic_project_matching(self, pain_points: List[str], all_projects: List[Dict], company_name: str = None,
+                                   proximity: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+        """Use OpenAI to semantically match pain points with projects.
+        
+        Candidates are sent as a compact table with short refs, within a token
+        budget, the ones closest to the pain points in the graph (``proximity``)
+        first; full project details are re-attached from the catalogue after
+        the model returns its picks.
+        """
         
         projects_context = []
         for project in all_projects:
@@ -327,75 +625,122 @@ class GraphQASystem:
             }
             projects_context.append(project_info)
         
+        candidates_table, refs = encode_candidates(projects_context, pain_points, SEMANTIC_MATCH_TOKEN_BUDGET,
+                                                  proximity=proximity)
+        
         prompt = f"""
-        I have identified these pain points for {company_name or 'a company'}:
-        {json.dumps(pain_points, indent=2)}
-
-        Here are available projects that might help:
-        {json.dumps(projects_context, indent=2)}
-
-        Please analyze and return the top 3-5 projects that best match these pain points. 
-        IMPORTANT: Even if the match is not perfect, please provide at least 1 project suggestion.
-        If direct matches are not available, find projects that could be adapted or are generally useful.
-
-        For each project, provide:
-        1. Match score (0-100)
-        2. Explanation of why it matches (or could be adapted)
-        3. Which specific pain points it addresses (or could potentially address)
-
-        Return as JSON array with this structure:
-        [
-            {{
-                "project_id": "project-id",
-                "project_name": "Project Name",
-                "match_score": 85,
-                "explanation": "Why this project matches...",
-                "addresses_pain_points": ["pain point 1", "pain point 2"],
-                "summary": "project summary",
-                "url": "project url",
-                "deployment_status": "status"
-            }}
-        ]
+        Pain points for {company_name or 'a company'}: {"; ".join(pain_points)}
+
+        Candidate projects (ref|name|pain_points|capabilities|industries|summary):
+        {candidates_table}
+
+        Return the top 3-5 projects that best match these pain points.
+        IMPORTANT: Even if the match is not perfect, provide at least 1 project.
+        If direct matches are not available, pick projects that could be adapted or are generally useful.
+
+        Return as a JSON object, where score is 0-100, why explains the match (or how it could be adapted) and addresses lists the pain points it addresses:
+        {{"matches": [{{"ref": "P1", "score": 85, "why": "...", "addresses": ["pain point 1"]}}]}}
         """
         
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=800,
-            temperature=0.3
-        )
+        def project_details(project: Dict[str, Any]) -> Dict[str, Any]:
+            return {
+                "project_id": project["id"],
+                "project_name": project["name"],
+                "summary": project["summary"],
+                "url": project["url"],
+                "deployment_status": project["deployment_status"]
+            }
         
         try:
-            matched_projects = json.loads(response.choices[0].message.content.strip())
-            return matched_projects
-        except json.JSONDecodeError:
-            # Fallback: return top projects based on simple matching
-            return [
-                {
-                    "project_id": project["id"],
-                    "project_name": project["name"],
-                    "match_score": 50,
-                    "explanation": "Basic match based on available data",
-                    "addresses_pain_points": project["pain_points"][:2],
-                    "summary": project["summary"],
-                    "url": project["url"],
-                    "deployment_status": project["deployment_status"]
-                }
-                for project in projects_context[:3]
-            ]
+            with span("project_matching", candidates=len(refs)):
+                matches = complete_json(
+                    self.client, prompt, name="semantic_project_matching", key="matches",
+                    max_tokens=500, temperature=0.3,
+                    validate=lambda value: is_dict_list(value, ("ref",))
+                )
+            matched_projects = []
+            for match in matches:
+                project = refs.get(str(match["ref"]).strip())
+                if project is None:
+                    continue
+                matched_projects.append({
+                    **project_details(project),
+                    "match_score": match.get("score", 50),
+                    "explanation": match.get("why", ""),
+                    "addresses_pain_points": match.get("addresses") or project["pain_points"][:2]
+                })
+            if matched_projects:
+                return matched_projects
+        except StructuredOutputError:
+            pass
+        
+        # Fallback: return the most relevant candidates
+        return [
+            {
+                **project_details(project),
+                "match_score": 50,
+                "explanation": "Basic match based on available data",
+                "addresses_pain_points": project["pain_points"][:2]
+            }
+            for project in list(refs.values())[:3]
+        ]
+    
+    def get_industries(self) -> List[str]:
+        """Industry names in the graph, reloaded when the graph version changes or after INDUSTRIES_TTL"""
+        try:
+            snapshot = self.schema_service.snapshot()
+        except Exception:
+            snapshot = None
+        version = snapshot["version"] if snapshot else None
+        if self._industries is not None:
+            cached_version, loaded_at, names = self._industries
+            if cached_version == version and time.time() - loaded_at < INDUSTRIES_TTL:
+                return names
+        try:
+            names = [row["name"] for row in self.graph.run("industries")]
+        except Exception as e:
+            print(f"Error loading industries: {e}")
+            # Keep serving the last list rather than none while Neo4j is unavailable
+            return self._industries[2] if self._industries else []
+        self._industries = (version, time.time(), names)
+        return names
     
     def generate_integration_suggestions(self, company_info: Dict[str, Any], project_info: Dict[str, Any], 
                                        user_interest: str, current_systems: Optional[str] = None) -> Dict[str, Any]:
-        """Generate integration suggestions for a specific project"""
+        """Generate integration suggestions for a specific project.
+        
+        The plan itself is cached per (project, industry, current systems) bucket
+        and only personalised for the company and user interest on top.
+        """
+        kg_type = (company_info.get("knowledge_graph") or {}).get("type")
+        industry = industry_bucket(kg_type, self.get_industries())
+        key = IntegrationPlanCache.bucket_key(
+            project_info.get("project_id", project_info["project_name"]), industry, systems_signature(current_systems)
+        )
+        
+        plan = self.plan_cache.get(key)
+        if plan is None:
+            with span("integration_plan", industry=industry):
+                plan = self.generate_bucket_plan(project_info, industry, current_systems)
+            if plan is None:
+                return dict(DEFAULT_INTEGRATION_PLAN)
+            self.plan_cache.put(key, plan)
+        
+        if not PERSONALISE_INTEGRATION_PLANS:
+            return dict(plan)
+        return self._personalise_plan(plan, company_info, project_info, user_interest)
+    
+    def generate_bucket_plan(self, project_info: Dict[str, Any], industry: str,
+                             current_systems: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Generate a company agnostic integration plan for a project and industry bucket"""
         
         prompt = f"""
-        Company: {company_info['name']}
+        Company Industry: {industry if industry != "general" else "Not specified"}
         Project: {project_info['project_name']}
         Project Summary: {project_info['summary']}
-        User Interest: {user_interest}
         Current Systems: {current_systems or 'Not specified'}
 
-        Based on the user's interest in this project, provide detailed integration suggestions including:
+        Provide detailed integration suggestions for a typical company in this industry adopting this project, including:
 
         1. Implementation approach (how to integrate with their existing systems)
         2. Technical requirements and dependencies
@@ -420,26 +765,43 @@ class GraphQASystem:
         }}
         """
         
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=600,
-            temperature=0.3
-        )
+        try:
+            return complete_json(
+                self.client, prompt, name="integration_plan", max_tokens=600, temperature=0.3,
+                validate=lambda value: isinstance(value, dict) and "implementation_approach" in value
+            )
+        except StructuredOutputError:
+            return None
+    
+    def _personalise_plan(self, plan: Dict[str, Any], company_info: Dict[str, Any],
+                          project_info: Dict[str, Any], user_interest: str) -> Dict[str, Any]:
+        """Tailor the approach and pilot of a cached plan to the company with a short completion"""
         
+        prompt = f"""
+        Company: {company_info['name']}
+        Project: {project_info['project_name']}
+        User Interest: {user_interest}
+
+        Generic implementation approach: {plan.get('implementation_approach', '')}
+        Generic pilot suggestions: {plan.get('pilot_suggestions', '')}
+
+        Rewrite both for this company and the user's interest. Keep them concise.
+        Return as JSON: {{"implementation_approach": "...", "pilot_suggestions": "..."}}
+        """
+        
+        personalised = dict(plan)
         try:
-            integration_suggestions = json.loads(response.choices[0].message.content.strip())
-            return integration_suggestions
-        except json.JSONDecodeError:
-            return {
-                "implementation_approach": "Custom integration approach needed",
-                "technical_requirements": ["API integration", "Authentication setup"],
-                "timeline": {"phase_1": "2-3 weeks: Initial setup and testing"},
-                "expected_benefits": ["Improved efficiency", "Better user experience"],
-                "potential_challenges": ["System integration complexity"],
-                "next_steps": ["Schedule demo", "Discuss technical requirements"],
-                "pilot_suggestions": "Start with a small pilot group to test functionality"
-            }
+            with span("plan_personalisation"):
+                tailored = complete_json(
+                    self.client, prompt, name="integration_plan_personalisation", max_tokens=250,
+                    temperature=0.3, retries=0, validate=lambda value: isinstance(value, dict)
+                )
+            for field in ("implementation_approach", "pilot_suggestions"):
+                if isinstance(tailored.get(field), str) and tailored[field].strip():
+                    personalised[field] = tailored[field]
+        except Exception as e:
+            print(f"Error personalising integration plan: {e}")
+        return personalised
     
     def generate_cypher_query(self, question: str) -> str:
         """Generate Cypher query from natural language question using OpenAI"""
@@ -479,29 +841,59 @@ class GraphQASystem:
         
         Cypher Query:"""
         
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=200,
-            temperature=0.1
-        )
+        def attempt(params: Dict[str, Any]) -> str:
+            response = self.client.chat.completions.create(
+                messages=[{"role": "user", "content": prompt}], **params
+            )
+            # The model often wraps the query in a ```cypher fence
+            return strip_code_fences(response.choices[0].message.content or "")
         
-        return response.choices[0].message.content.strip()
+        # Escalates to the next model tier when the query does not even parse locally
+        with span("cypher_generation"):
+            return router.run("cypher_generation", attempt, validate=is_well_formed,
+                              max_tokens=200, temperature=0.1)
     
-    def execute_cypher_query(self, cypher_query: str) -> List[Dict[str, Any]]:
-        """Execute Cypher query and return results"""
+    def stream_cypher_query(self, cypher_query: str) -> Iterator[Dict[str, Any]]:
+        """Execute a Cypher query and yield records as the driver receives them.
+        
+        Records are pulled from the server in batches of QA_FETCH_SIZE, so a
+        consumer that stops early also stops the server producing more rows.
+        The transaction is aborted server side after QA_QUERY_TIMEOUT seconds.
+        """
         try:
-            results = self.graph.query(cypher_query)
-            return results
+            yield from self._run_cypher(cypher_query)
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Query execution failed: {str(e)}")
     
+    def _run_cypher(self, cypher_query: str) -> Iterator[Dict[str, Any]]:
+        # Timed by hand: a span's context variable should not stay set across yields
+        started, failed = time.perf_counter(), False
+        try:
+            yield from self.graph.stream(cypher_query, fetch_size=QA_FETCH_SIZE, timeout=QA_QUERY_TIMEOUT)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            # Also reached when the consumer stops early at the row cap
+            record("cypher:generated", started, error=failed)
+    
+    def execute_cypher_query(self, cypher_query: str) -> List[Dict[str, Any]]:
+        """Execute Cypher query and return at most QA_ROW_CAP results"""
+        digest = ResultDigest(row_cap=QA_ROW_CAP)
+        return capped(self.stream_cypher_query(cypher_query), digest, keep=QA_ROW_CAP)
+    
     def generate_natural_language_response(self, question: str, cypher_query: str, 
-                                         raw_results: List[Dict[str, Any]]) -> Dict[str, str]:
-        """Generate natural language response from query results using OpenAI"""
+                                         raw_results: Optional[List[Dict[str, Any]]] = None,
+                                         digest: Optional[ResultDigest] = None) -> Dict[str, str]:
+        """Generate natural language response from query results using OpenAI.
         
-        # Limit results for context
-        limited_results = raw_results[:10] if raw_results else []
+        The prompt gets a column-wise digest of the results (counts, distinct
+        values, top values, numeric ranges and a few sample rows) rather than
+        the raw rows.
+        """
+        
+        if digest is None:
+            digest = ResultDigest(row_cap=QA_ROW_CAP).consume(raw_results or [])
         
         prompt = f"""
         You are a helpful assistant analyzing project data from a graph database.
@@ -510,7 +902,8 @@ class GraphQASystem:
         
         Cypher Query Used: {cypher_query}
         
-        Query Results: {json.dumps(limited_results, indent=2)}
+        Query Results Digest:
+        {digest.to_prompt()}
         
         Please provide a clear, informative answer to the human's question based on the results.
         
@@ -521,21 +914,25 @@ class GraphQASystem:
         - Include specific project names, technologies, or metrics when relevant
         - Keep response concise but informative
         - If results show relationships or patterns, highlight them
+        - If the results were stopped at the row cap, say the answer covers only part of the data
         
         Response:"""
         
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=500,
-            temperature=0.3
-        )
+        with span("answer"):
+            response = router.run(
+                "answer",
+                lambda params: self.client.chat.completions.create(
+                    messages=[{"role": "user", "content": prompt}], **params
+                ),
+                validate=lambda response: bool((response.choices[0].message.content or "").strip()),
+                max_tokens=500, temperature=0.3
+            )
         
         # Determine confidence based on results
-        confidence = "High" if raw_results else "Low"
-        if raw_results and len(raw_results) > 5:
+        confidence = "High" if digest.row_count else "Low"
+        if digest.row_count > 5:
             confidence = "High"
-        elif raw_results and len(raw_results) > 2:
+        elif digest.row_count > 2:
             confidence = "Medium"
         
         return {
@@ -548,21 +945,62 @@ class GraphQASystem:
         
         # Generate Cypher query
         cypher_query = self.generate_cypher_query(question)
+        generated_query = cypher_query
+        repairs = []
         
-        # Execute query
-        raw_results = self.execute_cypher_query(cypher_query)
+        for attempt in range(QA_MAX_REPAIRS + 1):
+            try:
+                # Reject writes and over-budget plans, and make sure there is a LIMIT
+                with span("cypher_guard"):
+                    safe_query = self.cypher_guard.check(cypher_query)
+                
+                # Execute query, streaming records into the digest; only the rows
+                # returned to the client are kept
+                digest = ResultDigest(row_cap=QA_ROW_CAP)
+                raw_results = capped(self._run_cypher(safe_query), digest, keep=context_limit)
+                break
+            except QueryFailed as e:
+                error, code, detail = str(e), e.code, f"Query rejected: {str(e)}"
+            except QueryRejected as e:
+                # Unsafe or too expensive; not something to repair
+                raise HTTPException(status_code=400, detail=f"Query rejected: {str(e)}")
+            except Neo4jError as e:
+                error, code, detail = e.message or str(e), e.code, f"Query execution failed: {str(e)}"
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Query execution failed: {str(e)}")
+            
+            # Only statement errors (syntax, unknown labels/properties, type errors) can be
+            # fixed by rewriting the query; timeouts and connection problems cannot
+            if attempt == QA_MAX_REPAIRS or not (code or "").startswith("Neo.ClientError.Statement"):
+                raise HTTPException(status_code=400, detail=detail)
+            
+            with span("cypher_repair") as repair_span:
+                fix = self.cypher_repairer.repair(
+                    question, cypher_query, error, use_llm=repairs.count("llm") < QA_MAX_LLM_REPAIRS
+                )
+                repair_span.set(source=fix[1] if fix else "failed")
+            if fix is None:
+                raise HTTPException(status_code=400, detail=detail)
+            cypher_query, source = fix
+            repairs.append(source)
+        
+        if repairs and repairs != ["cache"]:
+            self.cypher_repairer.remember(generated_query, cypher_query)
+        cypher_query = safe_query
         
         # Generate natural language response
         response_data = self.generate_natural_language_response(
-            question, cypher_query, raw_results
+            question, cypher_query, digest=digest
         )
         
         return {
             "question": question,
             "answer": response_data["answer"],
             "cypher_query": cypher_query,
-            "raw_results": raw_results[:context_limit],
-            "confidence": response_data["confidence"]
+            "raw_results": raw_results,
+            "confidence": response_data["confidence"],
+            "result_summary": digest.to_dict(),
+            "repairs": repairs or None
         }
 
 # Initialize the QA system
@@ -571,6 +1009,66 @@ qa_system = GraphQASystem()
 # Store conversation sessions (in production, use Redis or database)
 conversation_sessions = {}
 
+def run_company_analysis(request: CompanyAnalysisRequest) -> CompanyAnalysisResponse:
+    """Run the /analyze-company pipeline synchronously (shared by the endpoint and the job queue)"""
+    
+    # Step 1: Search for company information
+    company_info = qa_system.search_company_info(request.company_name)
+    
+    # Step 2: Handle pain points
+    if not request.pain_points:
+        # No pain points provided - suggest some and ask user to confirm
+        suggested_pain_points = qa_system.suggest_pain_points(company_info)
+        
+        return CompanyAnalysisResponse(
+            company_name=request.company_name,
+            company_info=company_info,
+            identified_pain_points=[],
+            suggested_pain_points=suggested_pain_points,
+            recommended_projects=[],
+            conversation_state=ConversationState.PAIN_POINTS_NEEDED,
+            next_questions=[
+                "Which of these pain points are most relevant to your company?",
+                "Are there any other pain points you'd like to add?",
+                "Please select 3-5 pain points that are most critical for your business."
+            ],
+            message="I've analyzed your company and identified potential pain points. Please review the suggested pain points and let me know which ones are most relevant to your business. You can call this endpoint again with the selected pain points in the 'pain_points' field."
+        )
+    
+    else:
+        # Pain points provided - find matching projects
+        pain_points = request.pain_points
+        
+        # Step 3: Find matching projects (with fallback logic)
+        recommended_projects = qa_system.find_matching_projects(pain_points, request.company_name)
+        
+        # Step 4: Generate next questions for engagement
+        next_questions = [
+            f"Which of these projects seems most relevant for {request.company_name}?",
+            "Would you like to know more about any specific project?",
+            "What's your current approach to handling these challenges?",
+            "Do you have any existing systems that need to be integrated?"
+        ]
+        
+        # Store session for follow-up
+        session_id = f"{request.company_name}_{len(conversation_sessions)}"
+        conversation_sessions[session_id] = {
+            "company_info": company_info,
+            "pain_points": pain_points,
+            "recommended_projects": recommended_projects,
+            "state": ConversationState.PROJECTS_RECOMMENDED
+        }
+        
+        return CompanyAnalysisResponse(
+            company_name=request.company_name,
+            company_info=company_info,
+            identified_pain_points=pain_points,
+            recommended_projects=recommended_projects,
+            conversation_state=ConversationState.PROJECTS_RECOMMENDED,
+            next_questions=next_questions,
+            message=f"Based on your pain points, I've found {len(recommended_projects)} project recommendations. Use the /project-interest endpoint to express interest in any specific project."
+        )
+
 @app.post("/analyze-company", response_model=CompanyAnalysisResponse)
 async def analyze_company(request: CompanyAnalysisRequest):
     """
@@ -587,66 +1085,131 @@ async def analyze_company(request: CompanyAnalysisRequest):
         raise HTTPException(status_code=400, detail="Company name cannot be empty")
     
     try:
-        # Step 1: Search for company information
-        company_info = qa_system.search_company_info(request.company_name)
-        
-        # Step 2: Handle pain points
-        if not request.pain_points:
-            # No pain points provided - suggest some and ask user to confirm
-            suggested_pain_points = qa_system.suggest_pain_points(company_info)
-            
-            return CompanyAnalysisResponse(
-                company_name=request.company_name,
-                company_info=company_info,
-                identified_pain_points=[],
-                suggested_pain_points=suggested_pain_points,
-                recommended_projects=[],
-                conversation_state=ConversationState.PAIN_POINTS_NEEDED,
-                next_questions=[
-                    "Which of these pain points are most relevant to your company?",
-                    "Are there any other pain points you'd like to add?",
-                    "Please select 3-5 pain points that are most critical for your business."
-                ],
-                message="I've analyzed your company and identified potential pain points. Please review the suggested pain points and let me know which ones are most relevant to your business. You can call this endpoint again with the selected pain points in the 'pain_points' field."
-            )
-        
-        else:
-            # Pain points provided - find matching projects
-            pain_points = request.pain_points
-            
-            # Step 3: Find matching projects (with fallback logic)
-            recommended_projects = qa_system.find_matching_projects(pain_points, request.company_name)
-            
-            # Step 4: Generate next questions for engagement
-            next_questions = [
-                f"Which of these projects seems most relevant for {request.company_name}?",
-                "Would you like to know more about any specific project?",
-                "What's your current approach to handling these challenges?",
-                "Do you have any existing systems that need to be integrated?"
-            ]
-            
-            # Store session for follow-up
-            session_id = f"{request.company_name}_{len(conversation_sessions)}"
-            conversation_sessions[session_id] = {
-                "company_info": company_info,
-                "pain_points": pain_points,
-                "recommended_projects": recommended_projects,
-                "state": ConversationState.PROJECTS_RECOMMENDED
-            }
-            
-            return CompanyAnalysisResponse(
-                company_name=request.company_name,
-                company_info=company_info,
-                identified_pain_points=pain_points,
-                recommended_projects=recommended_projects,
-                conversation_state=ConversationState.PROJECTS_RECOMMENDED,
-                next_questions=next_questions,
-                message=f"Based on your pain points, I've found {len(recommended_projects)} project recommendations. Use the /project-interest endpoint to express interest in any specific project."
-            )
-        
+        return run_company_analysis(request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing company: {str(e)}")
 
+@app.post("/analyze-company/suggestions")
+def stream_pain_point_suggestions(request: CompanyAnalysisRequest):
+    """
+    Server-sent events with each suggested pain point as soon as the model has written it.
+    
+    Sends a pain_point event per distinct suggestion, then a done event with the
+    full list (the suggested_pain_points /analyze-company would return), or an
+    error event.
+    """
+    if not request.company_name.strip():
+        raise HTTPException(status_code=400, detail="Company name cannot be empty")
+    
+    events_queue: "queue.Queue[tuple]" = queue.Queue()
+    
+    def produce():
+        try:
+            company_info = qa_system.search_company_info(request.company_name)
+            suggestions = qa_system.suggest_pain_points(
+                company_info, on_item=lambda item: events_queue.put(("pain_point", item)))
+            events_queue.put(("done", {"company_name": request.company_name, "suggested_pain_points": suggestions}))
+        except Exception as e:
+            events_queue.put(("error", {"detail": f"Error suggesting pain points: {e}"}))
+    
+    # The completion runs in its own thread, with the request's tracing context
+    threading.Thread(target=contextvars.copy_context().run, args=(produce,),
+                     name="pain-point-stream", daemon=True).start()
+    
+    def events():
+        while True:
+            event, data = events_queue.get()
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            if event != "pain_point":
+                return
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+MAX_BATCH_WORKERS = int(os.getenv("MAX_BATCH_WORKERS", "8"))
+
+def _stream_batch(companies: List[Dict[str, Any]], max_workers: int, checkpoint_id: Optional[str]):
+    """Build the NDJSON streaming response shared by both batch endpoints"""
+    if not companies:
+        raise HTTPException(status_code=400, detail="No companies provided")
+    
+    analyzer = BatchAnalyzer(
+        qa_system,
+        max_workers=min(max(1, max_workers), MAX_BATCH_WORKERS),
+        checkpoint_path=checkpoint_path_for(checkpoint_id) if checkpoint_id else None,
+        pack_size=PAIN_POINT_PACK_SIZE
+    )
+    return StreamingResponse(analyzer.run_ndjson(companies), media_type="application/x-ndjson")
+
+@app.post("/analyze-companies/batch")
+async def analyze_companies_batch(request: BatchAnalysisRequest):
+    """
+    Analyze many companies in one call.
+    
+    Companies run through a bounded worker pool that shares one catalogue snapshot
+    and SERP cache. Results are streamed back as NDJSON in completion order, followed
+    by a final {"summary": ...} line; repeated companies get a {"status": "duplicate"}
+    line instead of a second analysis. Pass a checkpoint_id to make the batch resumable:
+    companies already finished under that id are replayed instead of re-analyzed.
+    """
+    companies = [company.model_dump() for company in request.companies if company.company_name.strip()]
+    return _stream_batch(companies, request.max_workers, request.checkpoint_id)
+
+@app.post("/analyze-companies/batch/upload")
+async def analyze_companies_batch_upload(file: UploadFile = File(...), max_workers: int = 4,
+                                         checkpoint_id: Optional[str] = None):
+    """Same as /analyze-companies/batch but reads companies from an uploaded JSONL file"""
+    content = (await file.read()).decode("utf-8")
+    try:
+        companies = load_companies_jsonl(content.splitlines())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSONL upload: {str(e)}")
+    return _stream_batch(companies, max_workers, checkpoint_id)
+
+def run_project_interest(request: ProjectInterestRequest) -> Dict[str, Any]:
+    """Run the /project-interest pipeline synchronously (shared by the endpoint and the job queue)"""
+    
+    # Find the session, newest first so a refined analysis replaces the earlier recommendations
+    session = None
+    for session_id, session_data in reversed(list(conversation_sessions.items())):
+        if request.company_name.lower() in session_id.lower():
+            session = session_data
+            break
+    
+    if not session:
+        raise HTTPException(status_code=404, detail="Company analysis session not found. Please run company analysis first.")
+    
+    # Find the specific project
+    project_info = None
+    for project in session["recommended_projects"]:
+        if project["project_id"] == request.project_id:
+            project_info = project
+            break
+    
+    if not project_info:
+        raise HTTPException(status_code=404, detail="Project not found in recommendations")
+    
+    # Generate integration suggestions
+    integration_suggestions = qa_system.generate_integration_suggestions(
+        session["company_info"],
+        project_info,
+        request.user_interest,
+        request.current_systems
+    )
+    
+    # Update session state
+    session["state"] = ConversationState.INTEGRATION_DISCUSSION
+    session["selected_project"] = project_info
+    session["integration_suggestions"] = integration_suggestions
+    
+    return {
+        "company_name": request.company_name,
+        "project": project_info,
+        "user_interest": request.user_interest,
+        "integration_suggestions": integration_suggestions,
+        "next_steps": integration_suggestions.get("next_steps", []),
+        "pilot_suggestions": integration_suggestions.get("pilot_suggestions", "")
+    }
+
 @app.post("/project-interest")
 async def express_project_interest(request: ProjectInterestRequest):
     """
@@ -660,53 +1223,102 @@ async def express_project_interest(request: ProjectInterestRequest):
     """
     
     try:
-        # Find the session
-        session = None
-        for session_id, session_data in conversation_sessions.items():
-            if request.company_name.lower() in session_id.lower():
-                session = session_data
-                break
-        
-        if not session:
-            raise HTTPException(status_code=404, detail="Company analysis session not found. Please run company analysis first.")
-        
-        # Find the specific project
-        project_info = None
-        for project in session["recommended_projects"]:
-            if project["project_id"] == request.project_id:
-                project_info = project
-                break
-        
-        if not project_info:
-            raise HTTPException(status_code=404, detail="Project not found in recommendations")
-        
-        # Generate integration suggestions
-        integration_suggestions = qa_system.generate_integration_suggestions(
-            session["company_info"],
-            project_info,
-            request.user_interest,
-            request.current_systems
-        )
-        
-        # Update session state
-        session["state"] = ConversationState.INTEGRATION_DISCUSSION
-        session["selected_project"] = project_info
-        session["integration_suggestions"] = integration_suggestions
-        
-        return {
-            "company_name": request.company_name,
-            "project": project_info,
-            "user_interest": request.user_interest,
-            "integration_suggestions": integration_suggestions,
-            "next_steps": integration_suggestions.get("next_steps", []),
-            "pilot_suggestions": integration_suggestions.get("pilot_suggestions", "")
-        }
-        
+        return run_project_interest(request)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing project interest: {str(e)}")
 
+# Background jobs: the same pipelines, executed by an in-process worker pool.
+# The SQLite file is opened on first use (at startup or the first /jobs call), not on import
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue() -> JobQueue:
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(
+                {
+                    "analyze-company": lambda payload: run_company_analysis(CompanyAnalysisRequest(**payload)).model_dump(mode="json"),
+                    "project-interest": lambda payload: run_project_interest(ProjectInterestRequest(**payload))
+                },
+                db_path=JOBS_DB_PATH,
+                workers=int(os.getenv("JOB_WORKERS", "4")),
+                tenant_concurrency=int(os.getenv("JOB_TENANT_CONCURRENCY", "2"))
+            )
+        return _job_queue
+
+def _submit_job(kind: str, payload: Dict[str, Any], tenant: Optional[str], priority: int) -> JSONResponse:
+    job_id, deduplicated = get_job_queue().submit(kind, payload, tenant=tenant or "default", priority=priority)
+    return JSONResponse(
+        status_code=202,
+        content={
+            "job_id": job_id,
+            "deduplicated": deduplicated,
+            "status_url": f"/jobs/{job_id}",
+            "events_url": f"/jobs/{job_id}/events"
+        }
+    )
+
+@app.post("/jobs/analyze-company", status_code=202)
+async def submit_analyze_company_job(request: CompanyAnalysisRequest,
+                                     priority: int = Query(default=0, ge=MIN_PRIORITY, le=MAX_PRIORITY),
+                                     x_tenant_id: Optional[str] = Header(default=None)):
+    """
+    Queue an /analyze-company run and return a job id immediately.
+    
+    Poll /jobs/{job_id} or subscribe to /jobs/{job_id}/events for the result.
+    Higher priority jobs (0 to 10) run first; X-Tenant-Id scopes the per-tenant concurrency
+    limit and deduplication of identical pending jobs.
+    """
+    if not request.company_name.strip():
+        raise HTTPException(status_code=400, detail="Company name cannot be empty")
+    return _submit_job("analyze-company", request.model_dump(), x_tenant_id, priority)
+
+@app.post("/jobs/project-interest", status_code=202)
+async def submit_project_interest_job(request: ProjectInterestRequest,
+                                      priority: int = Query(default=0, ge=MIN_PRIORITY, le=MAX_PRIORITY),
+                                      x_tenant_id: Optional[str] = Header(default=None)):
+    """Queue a /project-interest run and return a job id immediately"""
+    return _submit_job("project-interest", request.model_dump(), x_tenant_id, priority)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get the status of a job, including its result once finished"""
+    job = get_job_queue().get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/events")
+def stream_job_events(job_id: str):
+    """Server-sent events with the job state on every status change until it finishes"""
+    if not get_job_queue().get(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    def events():
+        last_status = None
+        while True:
+            job = get_job_queue().wait(job_id, last_status)
+            if job is None:
+                return
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield f"event: {last_status}\ndata: {json.dumps(job, default=str)}\n\n"
+                if last_status in TERMINAL_STATES:
+                    return
+            else:
+                # Keep proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.get("/jobs")
+async def get_job_stats():
+    """Queue depth per status and running jobs per tenant"""
+    return get_job_queue().stats()
+
 @app.post("/ask", response_model=QuestionResponse)
 async def ask_question(request: QuestionRequest):
     """
@@ -727,18 +1339,202 @@ async def ask_question(request: QuestionRequest):
         result = qa_system.process_question(request.question, request.context_limit)
         return QuestionResponse(**result)
     
+    except HTTPException:
+        raise
+    except LLMUnavailable as e:
+        # No answer is possible without the model; tell clients when to come back
+        raise HTTPException(status_code=503, detail=f"Language model unavailable: {str(e)}",
+                            headers={"Retry-After": str(max(1, round(e.retry_after or 1)))})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing question: {str(e)}")
 
+def _catalogue_snapshot() -> CatalogueSnapshot:
+    try:
+        return qa_system.catalogue.snapshot
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Catalogue unavailable: {str(e)}")
+
+def _conditional(tag: str, if_none_match: Optional[str], build) -> Response:
+    """304 when the client's copy is current, else ``build()`` as JSON; both carry the ETag"""
+    headers = {"ETag": tag, "Cache-Control": "no-cache"}
+    if not_modified(if_none_match, tag):
+        qa_system.catalogue.counts["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(build(), headers=headers)
+
+@app.get("/catalogue/projects")
+def browse_projects(
+    industry: Optional[List[str]] = Query(default=None),
+    capability: Optional[List[str]] = Query(default=None),
+    technology: Optional[List[str]] = Query(default=None),
+    domain: Optional[List[str]] = Query(default=None),
+    regulation: Optional[List[str]] = Query(default=None),
+    deployment_status: Optional[List[str]] = Query(default=None),
+    limit: int = Query(default=CATALOGUE_PAGE_SIZE, ge=1, le=CATALOGUE_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(default=None)
+):
+    """
+    Browse projects by facet, one page at a time, without the language model.
+    
+    Repeat a filter for any of several values (?industry=Retail&industry=Healthcare);
+    different filters must all match. Pass ``next_cursor`` back as ``cursor`` for the
+    next page. Send the ETag back in If-None-Match to get a 304 while the page is unchanged.
+    """
+    # Sync endpoints: a stale snapshot is rebuilt from the graph inside this
+    # call, which must run on the threadpool rather than the event loop
+    snapshot = _catalogue_snapshot()
+    filters = {"industry": industry, "capability": capability, "technology": technology, "domain": domain,
+               "regulation": regulation, "deployment_status": deployment_status}
+    normalised = {facet: sorted(v.strip().lower() for v in values) for facet, values in filters.items() if values}
+    tag = etag(snapshot.version, "projects", normalised, limit, cursor)
+    try:
+        return _conditional(tag, if_none_match, lambda: snapshot.page(filters, limit, cursor))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/catalogue/facets")
+def catalogue_facets(if_none_match: Optional[str] = Header(default=None)):
+    """Values of every browsable facet with their project counts, for building the filters"""
+    snapshot = _catalogue_snapshot()
+    return _conditional(etag(snapshot.version, "facets"), if_none_match,
+                        lambda: {"facets": snapshot.facets(), "snapshot": {"version": snapshot.version,
+                                                                           "built_at": snapshot.built_at}})
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy", "message": "Graph QA API is running"}
+    """Liveness (the process serves requests) and readiness (Neo4j connected, schema loaded)"""
+    readiness = qa_system.readiness()
+    return {
+        "status": "healthy",
+        "message": "Graph QA API is running",
+        "live": True,
+        "ready": readiness["ready"],
+        "checks": readiness
+    }
+
+@app.get("/ready")
+async def readiness_check():
+    """503 until the backends are connected, for load balancers and orchestrators"""
+    readiness = qa_system.readiness()
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
+@app.get("/llm-stats")
+async def get_llm_stats():
+    """How LLM JSON output was obtained, model tier usage per prompt type and gateway counters"""
+    stats = {"json_parse": parse_stats.snapshot(), "routing": router.stats()}
+    if isinstance(qa_system._client, LLMGateway):
+        stats["gateway"] = qa_system._client.stats()
+    if qa_system.connected:
+        stats["cypher_plans"] = qa_system.cypher_guard.stats()
+        stats["cypher_repairs"] = qa_system.cypher_repairer.stats()
+    return stats
+
+def _cache_samples():
+    """Hit counts and ratios of the in-process caches, read at scrape time"""
+    caches = {"integration_plans": qa_system.plan_cache.stats()}
+    recommendations = qa_system.recommendations.stats()
+    caches["materialised_recommendations"] = {"hits": recommendations.get("hits", 0),
+                                              "misses": recommendations.get("misses", 0)}
+    if qa_system._pain_point_canon is not None:
+        canon = qa_system._pain_point_canon.stats()
+        caches["pain_point_matches"] = {"hits": canon.get("cache_hits", 0), "misses": canon.get("cache_misses", 0)}
+    if qa_system._graph_ranker is not None:
+        ranker = qa_system._graph_ranker.stats()
+        caches["graph_rank_vectors"] = {"hits": ranker.get("vector_hits", 0), "misses": ranker.get("vector_misses", 0)}
+    if qa_system.connected:
+        guard = qa_system.cypher_guard.stats()
+        caches["cypher_plans"] = {"hits": guard["hits"], "misses": guard["misses"]}
+        repairs = qa_system.cypher_repairer.stats()
+        caches["cypher_repairs"] = {"hits": repairs["cache"],
+                                    "misses": repairs["rules"] + repairs["llm"] + repairs["failed"]}
+    for cache, stats in caches.items():
+        total = stats["hits"] + stats["misses"]
+        yield "cache_hits_total", "counter", {"cache": cache}, stats["hits"]
+        yield "cache_misses_total", "counter", {"cache": cache}, stats["misses"]
+        yield "cache_hit_ratio", "gauge", {"cache": cache}, stats["hits"] / total if total else None
+
+
+def _gateway_samples():
+    """LLM gateway counters and breaker state"""
+    gateway = qa_system._client
+    if not isinstance(gateway, LLMGateway):
+        return
+    stats = gateway.stats()
+    for key, value in stats.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            name = key.split(".")[0]
+            labels = {"error": key.split(".", 1)[1]} if "." in key else {}
+            yield f"llm_gateway_{name}_total", "counter", labels, value
+    yield "llm_gateway_breaker_open", "gauge", {}, 1 if stats["breaker"] == "open" else 0
+
+
+metrics.add_collector(_cache_samples)
+metrics.add_collector(_gateway_samples)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics: stage, endpoint and completion histograms, tokens, cost and cache hit ratios"""
+    if not TELEMETRY_ENABLED:
+        raise HTTPException(status_code=404, detail="Telemetry is disabled (TELEMETRY_ENABLED=false)")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def _check_profiling_access(token: Optional[str]):
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled (PROFILING_ENABLED=false)")
+    # Dumps expose stacks and request timelines, so without a configured token nobody gets them
+    if not PROFILE_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Profiling endpoints need PROFILE_ADMIN_TOKEN to be set")
+    if not token or not hmac.compare_digest(token, PROFILE_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/admin/profiles")
+async def list_profiles(x_admin_token: Optional[str] = Header(default=None)):
+    """Slow and sampled request dumps held in the ring buffer, newest first"""
+    _check_profiling_access(x_admin_token)
+    return {
+        "captured": dict(profile_store.captured),
+        "sampler_ticks": profile_sampler.ticks,
+        "profiles": profile_store.summaries()
+    }
+
+@app.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: int, format: str = "json", x_admin_token: Optional[str] = Header(default=None)):
+    """One request dump: stage timeline, hot functions and stack samples (format=folded for flame graphs)"""
+    _check_profiling_access(x_admin_token)
+    dump = profile_store.get(profile_id)
+    if dump is None:
+        raise HTTPException(status_code=404, detail="Profile not found (it may have left the ring buffer)")
+    if format == "folded":
+        return PlainTextResponse(dump["folded"])
+    return dump
+
+@app.get("/query-stats")
+async def get_query_stats():
+    """Calls, errors, rows and latency per named service query, pain point canonicalisation, materialised recommendation, graph ranking and catalogue counters"""
+    if not qa_system.connected:
+        return {"queries": {}}
+    stats = {"queries": qa_system.graph.statement_stats(), "warm_up_ms": qa_system.startup["query_plans"],
+             "recommendations": qa_system.recommendations.stats()}
+    if qa_system._pain_point_canon is not None:
+        stats["pain_points"] = qa_system._pain_point_canon.stats()
+    if qa_system._graph_ranker is not None:
+        stats["graph_rank"] = qa_system._graph_ranker.stats()
+    stats["catalogue"] = qa_system.catalogue.stats()
+    return stats
 
 @app.get("/schema")
 async def get_schema():
     """Get graph schema information"""
-    return {"schema": qa_system.schema_context}
+    snapshot = qa_system.schema_service.snapshot()
+    if not snapshot:
+        return {"schema": qa_system.schema_context}
+    return {
+        "schema": snapshot["prompt"],
+        "version": snapshot["version"],
+        "introspected_at": snapshot["introspected_at"],
+        "structure": snapshot["schema"]
+    }
 
 @app.get("/sample-questions")
 async def get_sample_questions():
@@ -0,0 +1,197 @@
+"""Model routing per prompt type, with cheapest-first cascading.
+
+Every prompt type (the ``name`` given to complete_json, or cypher_generation,
+cypher_repair and answer) has a list of tiers, cheapest first. A tier sets
+the model and optionally max_tokens and temperature; unset values keep the
+caller's. ``ModelRouter.run`` tries the tiers in order and only moves on when
+a call fails or its output does not validate, so the larger model is paid
+for only on the requests the small one gets wrong. The last tier's answer is
+returned whatever it is, and the caller's own fallbacks take over from there.
+
+Routes are DEFAULT_ROUTES updated with MODEL_ROUTES, given either as inline
+JSON or as the path of a JSON file:
+
+    MODEL_ROUTES='{"answer": [{"model": "gpt-4o-mini", "max_tokens": 300}],
+                   "cypher_generation": [{"model": "gpt-4o-mini", "temperature": 0}, {"model": "gpt-4.1"}]}'
+
+Prompt types without a route use DEFAULT_MODEL. Latency, cost and outcome
+of every tier tried are kept per prompt type (``stats()``, /llm-stats) and
+exported as the llm_route_* metrics, which is what the routes are tuned from.
+"""
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Dict, List, Optional
+
+from telemetry import TELEMETRY_ENABLED, CostMeter, metrics
+
+DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "gpt-4o-mini")
+
+DEFAULT_ROUTES: Dict[str, List[Dict[str, Any]]] = {
+    # Precision matters and the output can be checked cheaply
+    "cypher_generation": [{"model": "gpt-4o-mini", "temperature": 0.1}, {"model": "gpt-4o", "temperature": 0}],
+    "semantic_project_matching": [{"model": "gpt-4o-mini"}, {"model": "gpt-4o"}],
+    "integration_plan": [{"model": "gpt-4o-mini"}, {"model": "gpt-4o"}],
+    # Suggestions and rewrites are judged by the user; a mistake costs little
+    "suggest_pain_points": [{"model": "gpt-4o-mini"}],
+    "suggest_pain_points_batch": [{"model": "gpt-4o-mini"}],
+    "integration_plan_personalisation": [{"model": "gpt-4o-mini"}],
+    "cypher_repair": [{"model": "gpt-4o-mini", "temperature": 0}],
+    # Latency sensitive: the user waits for it after the query has run
+    "answer": [{"model": "gpt-4o-mini"}],
+}
+
+TIER_FIELDS = ("model", "max_tokens", "temperature")
+LATENCY_WINDOW = 512
+
+
+def load_routes(value: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """DEFAULT_ROUTES updated from MODEL_ROUTES (inline JSON or a file path)"""
+    value = os.getenv("MODEL_ROUTES", "") if value is None else value
+    routes = dict(DEFAULT_ROUTES)
+    if not value.strip():
+        return routes
+    try:
+        if value.lstrip().startswith("{"):
+            configured = json.loads(value)
+        else:
+            with open(value, "r", encoding="utf-8") as f:
+                configured = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error loading MODEL_ROUTES, using the default routes: {e}")
+        return routes
+
+    for prompt, tiers in configured.items():
+        if isinstance(tiers, dict):
+            tiers = [tiers]
+        if not isinstance(tiers, list) or not all(isinstance(t, dict) and t.get("model") for t in tiers):
+            print(f"Ignoring route for {prompt}: expected a list of tiers with a model each")
+            continue
+        routes[prompt] = [{k: t[k] for k in TIER_FIELDS if t.get(k) is not None} for t in tiers]
+    return routes
+
+
+class _TierStats:
+    __slots__ = ("outcomes", "seconds", "cost_usd", "latencies")
+
+    def __init__(self):
+        self.outcomes = Counter()
+        self.seconds = 0.0
+        self.cost_usd = 0.0
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+
+
+class ModelRouter:
+    """Picks model settings per prompt type and cascades through the tiers"""
+
+    def __init__(self, routes: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+                 default_model: str = DEFAULT_MODEL):
+        self._routes = routes
+        self.default_model = default_model
+        self._tiers: Dict[str, Dict[str, _TierStats]] = {}
+        self._served = Counter()  # (prompt, tier index)
+        self._exhausted = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def routes(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Loaded on first use, after main has read .env"""
+        if self._routes is None:
+            self._routes = load_routes()
+        return self._routes
+
+    def tiers(self, prompt: str) -> List[Dict[str, Any]]:
+        return self.routes.get(prompt) or [{"model": self.default_model}]
+
+    def run(self, prompt: str, attempt: Callable[[Dict[str, Any]], Any],
+            validate: Optional[Callable[[Any], bool]] = None, cascade: bool = True, **defaults) -> Any:
+        """Return ``attempt(params)`` from the first tier whose output is accepted.
+
+        ``params`` holds model, max_tokens and temperature: ``defaults``
+        overridden by the tier. A tier is rejected when ``attempt`` raises
+        or ``validate`` returns False. The last tier's result is returned
+        even if it fails validation and its exception propagates. With
+        ``cascade=False`` only the first tier is used.
+        """
+        tiers = self.tiers(prompt)
+        if not cascade:
+            tiers = tiers[:1]
+        for index, tier in enumerate(tiers):
+            params = {**defaults, **tier}
+            last = index == len(tiers) - 1
+            started = time.perf_counter()
+            with CostMeter() as meter:
+                try:
+                    value = attempt(params)
+                except Exception as e:
+                    # ValueError covers StructuredOutputError: the model answered, but unusably
+                    outcome = "invalid" if isinstance(e, ValueError) else "error"
+                    self._record(prompt, params["model"], outcome, started, meter.cost_usd)
+                    if last:
+                        self._exhaust(prompt)
+                        raise
+                    continue
+            if validate is None or validate(value):
+                self._record(prompt, params["model"], "accepted", started, meter.cost_usd, served=index)
+                return value
+            self._record(prompt, params["model"], "invalid", started, meter.cost_usd)
+            if last:
+                self._exhaust(prompt)
+                return value
+
+    def _record(self, prompt: str, model: str, outcome: str, started: float, cost: float,
+                served: Optional[int] = None):
+        seconds = time.perf_counter() - started
+        with self._lock:
+            stats = self._tiers.setdefault(prompt, {}).setdefault(model, _TierStats())
+            stats.outcomes[outcome] += 1
+            stats.seconds += seconds
+            stats.cost_usd += cost
+            stats.latencies.append(seconds)
+            if served is not None:
+                self._served[(prompt, served)] += 1
+        if TELEMETRY_ENABLED:
+            metrics.observe("llm_route_seconds", seconds, prompt=prompt, model=model, outcome=outcome)
+            metrics.inc("llm_route_cost_usd_total", cost, prompt=prompt, model=model)
+
+    def _exhaust(self, prompt: str):
+        with self._lock:
+            self._exhausted[prompt] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Per prompt type: the route, which tier served how often and per model outcomes, latency and cost"""
+        report = {}
+        with self._lock:
+            for prompt, models in self._tiers.items():
+                route = self.tiers(prompt)
+                served = {f"{i}:{route[i]['model'] if i < len(route) else '?'}": n
+                          for (p, i), n in sorted(self._served.items()) if p == prompt}
+                requests = sum(served.values()) + self._exhausted[prompt]
+                escalated = sum(n for (p, i), n in self._served.items() if p == prompt and i > 0)
+                tiers = {}
+                for model, stats in models.items():
+                    calls = sum(stats.outcomes.values())
+                    latencies = sorted(stats.latencies)
+                    tiers[model] = {
+                        **stats.outcomes,
+                        "calls": calls,
+                        "acceptance_rate": round(stats.outcomes["accepted"] / calls, 3) if calls else 0.0,
+                        "mean_ms": round(stats.seconds / calls * 1000, 2) if calls else None,
+                        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 2) if latencies else None,
+                        "cost_usd": round(stats.cost_usd, 6),
+                        "cost_per_call_usd": round(stats.cost_usd / calls, 6) if calls else None
+                    }
+                report[prompt] = {
+                    "route": [t["model"] for t in route],
+                    "requests": requests,
+                    "served_by": served,
+                    "escalation_rate": round(escalated / requests, 3) if requests else 0.0,
+                    "exhausted": self._exhausted[prompt],
+                    "tiers": tiers
+                }
+        return report
+
+
+router = ModelRouter()
@@ -0,0 +1,423 @@
+"""Canonical pain points: maps free-text pain points onto the graph's PainPoint names.
+
+Users type their own pain points and suggest_pain_points returns free text,
+so "manual resume screening" and "Manual CV screening" would be matched
+separately and bloat the ranking prompt, and near duplicate PainPoint nodes
+split a pain point's popularity. A text is matched against the vocabulary
+in two steps:
+
+1. lexical: texts are normalised (lower case, SYNONYMS such as cv -> resume,
+   light stemming) and candidates sharing character trigrams are found
+   through an inverted index and scored by token Jaccard and trigram Dice
+2. embedding: the best lexical candidates are re-scored by the cosine
+   similarity of their embeddings - OpenAI embeddings when the client has
+   them, otherwise (or for PAIN_POINT_EMBEDDING_RETRY_SECONDS after a call
+   fails or times out) a local hashed n-gram embedding
+
+The confidence blends both; at or above CANONICAL_MIN_CONFIDENCE the text
+maps onto the candidate. Matches are cached until the vocabulary changes
+and OpenAI embeddings are persisted to PAIN_POINT_EMBEDDING_CACHE_PATH.
+
+``cluster`` groups near duplicates within a list of names; graph.py uses it
+at ingestion to merge PainPoint nodes before they are created, and main.py
+uses ``canonicalise`` and ``dedupe`` at query time.
+"""
+import json
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+CANONICAL_MIN_CONFIDENCE = float(os.getenv("CANONICAL_MIN_CONFIDENCE", "0.8"))
+CANONICAL_VOCAB_TTL = float(os.getenv("CANONICAL_VOCAB_TTL", "300"))
+# openai (falls back to hashing when unavailable) or hashing
+PAIN_POINT_EMBEDDINGS = os.getenv("PAIN_POINT_EMBEDDINGS", "openai").lower()
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_CACHE_PATH = os.getenv("PAIN_POINT_EMBEDDING_CACHE_PATH", "pain_point_embeddings.json")
+# Seconds one embeddings request may take, and how long hashing stands in after one fails
+EMBEDDING_TIMEOUT = float(os.getenv("PAIN_POINT_EMBEDDING_TIMEOUT", "5"))
+EMBEDDING_RETRY_SECONDS = float(os.getenv("PAIN_POINT_EMBEDDING_RETRY_SECONDS", "60"))
+
+# Lexical candidates kept per lookup, and how many of those are re-scored by embedding
+MAX_CANDIDATES = 50
+RERANK_CANDIDATES = 10
+MATCH_CACHE_SIZE = 10000
+
+STOPWORDS = {"a", "an", "the", "of", "for", "and", "in", "on", "to", "with", "our", "their", "too", "very"}
+
+# Spellings of the same thing, so they normalise to the same tokens
+SYNONYMS = {
+    "cv": "resume", "cvs": "resume", "résumé": "resume", "resumes": "resume",
+    "recruitment": "hiring", "recruiting": "hiring", "hire": "hiring",
+    "customer service": "customer support", "client": "customer", "clients": "customer",
+    "invoicing": "invoice", "paperwork": "document", "docs": "document",
+    "manually": "manual", "hand": "manual",
+    "staff": "employee", "employees": "employee", "workforce": "employee",
+    "time consuming": "slow", "timeconsuming": "slow",
+    "mistakes": "error", "mistake": "error", "errors": "error",
+    "crm": "customer relationship management", "hr": "human resources",
+}
+_PHRASE_SYNONYMS = sorted((k for k in SYNONYMS if " " in k), key=len, reverse=True)
+
+
+def _stem(token: str) -> str:
+    for suffix, replacement in (("ies", "y"), ("sses", "ss"), ("ing", ""), ("ed", ""), ("es", ""), ("s", "")):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[:-len(suffix)] + replacement
+    return token
+
+
+def normalise(text: str) -> List[str]:
+    """Stemmed content tokens of ``text`` with synonyms applied"""
+    text = text.lower().replace("&", " and ").replace("-", " ")
+    text = re.sub(r"[^\w+#\s]", " ", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    for phrase in _PHRASE_SYNONYMS:
+        text = re.sub(rf"\b{re.escape(phrase)}\b", SYNONYMS[phrase], text)
+    tokens = []
+    for token in text.split():
+        token = SYNONYMS.get(token, token)
+        for part in token.split():
+            if part not in STOPWORDS:
+                tokens.append(_stem(part))
+    return tokens
+
+
+def _trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+@lru_cache(maxsize=20000)
+def _hashed_vector(key: str, dimensions: int) -> List[float]:
+    vector = [0.0] * dimensions
+    features = [key[i:i + n] for n in (3, 4) for i in range(max(0, len(key) - n + 1))] + key.split()
+    for feature in features:
+        digest = zlib.crc32(feature.encode("utf-8"))
+        vector[digest % dimensions] += 1.0 if digest & 0x80000000 else -1.0
+    return vector
+
+
+class HashingEmbedder:
+    """Local embedding: signed hashed character n-grams and tokens of the normalised text"""
+
+    name = "hashing"
+    weight = 0.25  # share of the confidence; it largely repeats the lexical signal
+    floor = 0.0    # cosine treated as no similarity at all
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return [_hashed_vector(" ".join(normalise(text)), self.dimensions) for text in texts]
+
+
+class OpenAIEmbedder:
+    """Embeddings API of the LLM client, with vectors persisted to a JSON cache"""
+
+    name = "openai"
+    weight = 0.5
+    floor = 0.3  # unrelated short phrases still score around here
+
+    def __init__(self, client, model: str = EMBEDDING_MODEL, cache_path: Optional[str] = EMBEDDING_CACHE_PATH,
+                 batch_size: int = 256):
+        self.client = client
+        self.model = model
+        self.cache_path = cache_path
+        self.batch_size = batch_size
+        self._vectors: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        # Serialises cache file writes
+        self._save_lock = threading.Lock()
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    cached = json.load(f)
+                if cached.get("model") == model:
+                    self._vectors.update(cached.get("vectors") or {})
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Error loading pain point embedding cache: {e}")
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            missing = list(dict.fromkeys(t for t in texts if t not in self._vectors))
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            response = self.client.embeddings.create(model=self.model, input=batch, timeout=EMBEDDING_TIMEOUT)
+            with self._lock:
+                for text, item in zip(batch, response.data):
+                    self._vectors[text] = [round(x, 5) for x in item.embedding]
+        if missing:
+            self._save()
+        with self._lock:
+            return [self._vectors[t] for t in texts]
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        with self._save_lock:
+            # Taken under the save lock, so the last write carries every vector embedded before it
+            with self._lock:
+                snapshot = {"model": self.model, "vectors": dict(self._vectors)}
+            # The pid keeps other processes off our temp file
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(snapshot, f)
+                os.replace(tmp_path, self.cache_path)
+            except OSError as e:
+                print(f"Error saving pain point embedding cache: {e}")
+
+
+def make_embedder(client=None, kind: Optional[str] = None):
+    """OpenAIEmbedder over ``client`` for PAIN_POINT_EMBEDDINGS=openai, else HashingEmbedder"""
+    kind = (kind or PAIN_POINT_EMBEDDINGS).lower()
+    if kind == "openai" and client is not None:
+        return OpenAIEmbedder(client)
+    return HashingEmbedder()
+
+
+class PainPointCanonicaliser:
+    """Maps pain point texts onto a vocabulary of canonical names with a confidence.
+
+    The vocabulary is given up front or read through ``loader`` (rows with a
+    ``name`` and optional ``popularity`` and ``aliases``), reloaded after
+    ``ttl`` seconds.
+    """
+
+    def __init__(self, vocabulary: Iterable[str] = (), embedder=None,
+                 loader: Optional[Callable[[], List[Dict[str, Any]]]] = None, ttl: float = CANONICAL_VOCAB_TTL,
+                 min_confidence: float = CANONICAL_MIN_CONFIDENCE):
+        self.embedder = embedder or HashingEmbedder()
+        self.loader = loader
+        self.ttl = ttl
+        self.min_confidence = min_confidence
+        self.counts = Counter()
+        self._fallback = HashingEmbedder()
+        self._embedder_down_until = None
+        self._matches: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._signature = None
+        self._reset()
+        for name in vocabulary:
+            self.add(name)
+
+    def _reset(self):
+        self.names: List[str] = []
+        self.popularity: Dict[str, int] = {}
+        self._keys: List[str] = []
+        self._tokens: List[set] = []
+        self._grams: List[set] = []
+        self._by_key: Dict[str, int] = {}
+        self._index: Dict[str, List[int]] = {}
+        self._matches.clear()
+        self.version = 0
+
+    def add(self, name: str, popularity: int = 0, aliases: Iterable[str] = ()):
+        """Add a canonical name and spellings known to mean it; False if its normalised form is already known"""
+        tokens = normalise(name)
+        key = " ".join(tokens)
+        with self._lock:
+            if not key or key in self._by_key:
+                return False
+            index = len(self.names)
+            grams = _trigrams(key)
+            self.names.append(name)
+            self.popularity[name] = popularity
+            self._keys.append(key)
+            self._tokens.append(set(tokens))
+            self._grams.append(grams)
+            self._by_key[key] = index
+            for gram in grams:
+                self._index.setdefault(gram, []).append(index)
+            for alias in aliases:
+                self._by_key.setdefault(" ".join(normalise(alias)), index)
+            self.version += 1
+            self._matches.clear()
+            return True
+
+    def _refresh(self):
+        if self.loader is None:
+            return
+        now = time.monotonic()
+        if self._loaded_at is not None and now - self._loaded_at < self.ttl:
+            return
+        self._loaded_at = now
+        try:
+            rows = self.loader()
+        except Exception as e:
+            print(f"Error loading pain point vocabulary: {e}")
+            return
+        signature = sorted((r["name"], tuple(r.get("aliases") or ())) for r in rows)
+        with self._lock:
+            if signature == self._signature:
+                return
+            self._signature = signature
+            self._reset()
+            for row in sorted(rows, key=lambda r: -(r.get("popularity") or 0)):
+                self.add(row["name"], row.get("popularity") or 0, row.get("aliases") or ())
+            self.counts["vocabulary_loads"] += 1
+
+    def _active_embedder(self):
+        """The configured embedder, or the local one while it cools down after a failure"""
+        if self._embedder_down_until is not None and time.monotonic() < self._embedder_down_until:
+            return self._fallback
+        return self.embedder
+
+    def _embed(self, texts: List[str]):
+        """(embedder used, vectors); a failing embedder is skipped for EMBEDDING_RETRY_SECONDS"""
+        embedder = self._active_embedder()
+        try:
+            return embedder, embedder.embed(texts)
+        except Exception as e:
+            print(f"Embeddings unavailable, using local hashing embeddings for {EMBEDDING_RETRY_SECONDS:g}s: {e}")
+            self.counts["embedding_fallbacks"] += 1
+            self._embedder_down_until = time.monotonic() + EMBEDDING_RETRY_SECONDS
+            return self._fallback, self._fallback.embed(texts)
+
+    def _candidates(self, key: str, tokens: set) -> List[Dict[str, Any]]:
+        grams = _trigrams(key)
+        shared = Counter()
+        for gram in grams:
+            for index in self._index.get(gram, ()):
+                shared[index] += 1
+        scored = []
+        for index, overlap in shared.most_common(MAX_CANDIDATES):
+            dice = 2 * overlap / (len(grams) + len(self._grams[index]))
+            union = tokens | self._tokens[index]
+            jaccard = len(tokens & self._tokens[index]) / len(union) if union else 0.0
+            scored.append({"index": index, "lexical": (dice + jaccard) / 2})
+        scored.sort(key=lambda c: -c["lexical"])
+        return scored[:RERANK_CANDIDATES]
+
+    def match(self, text: str) -> Dict[str, Any]:
+        """Best canonical name for ``text``: {"input", "canonical", "confidence", "method"}.
+
+        ``canonical`` is None when no name reaches the minimum confidence.
+        """
+        self._refresh()
+        tokens = normalise(text)
+        key = " ".join(tokens)
+        with self._lock:
+            cached = self._matches.get(key)
+            if cached is not None:
+                self._matches.move_to_end(key)
+                self.counts["cache_hits"] += 1
+                return {**cached, "input": text}
+            self.counts["cache_misses"] += 1
+            version = self.version
+
+            result, candidates = None, []
+            if key in self._by_key:
+                result = {"canonical": self.names[self._by_key[key]], "confidence": 1.0, "method": "exact"}
+            elif key:
+                candidates = self._candidates(key, set(tokens))
+            names = [self.names[c["index"]] for c in candidates]
+
+        degraded = False
+        if result is None and not candidates:
+            result = {"canonical": None, "confidence": 0.0, "method": "none"}
+        elif result is None:
+            embedder = self._active_embedder()
+            # Only candidates that could still reach the threshold with a perfect embedding score
+            reachable = [(c, n) for c, n in zip(candidates, names)
+                         if (1 - embedder.weight) * c["lexical"] + embedder.weight >= self.min_confidence]
+            top = candidates[0]
+            best = {"canonical": names[0], "confidence": (1 - embedder.weight) * top["lexical"],
+                    "method": "lexical"}
+            if reachable:
+                embedder, vectors = self._embed([text] + [n for _, n in reachable])
+                best["confidence"] = (1 - embedder.weight) * top["lexical"]
+                for (candidate, name), vector in zip(reachable, vectors[1:]):
+                    cosine = _cosine(vectors[0], vector)
+                    semantic = max(0.0, (cosine - embedder.floor) / (1 - embedder.floor))
+                    confidence = (1 - embedder.weight) * candidate["lexical"] + embedder.weight * semantic
+                    if confidence > best["confidence"] or best["method"] == "lexical":
+                        best = {"canonical": name, "confidence": confidence, "method": embedder.name}
+            best["confidence"] = round(min(1.0, best["confidence"]), 3)
+            degraded = embedder is not self.embedder
+            result = best if best["confidence"] >= self.min_confidence else {
+                "canonical": None, "confidence": best["confidence"], "method": best["method"], "nearest": best["canonical"]
+            }
+
+        with self._lock:
+            # Matches scored with the stand-in embedder are not kept past its cool-down
+            if version == self.version and not degraded:
+                self._matches[key] = result
+                while len(self._matches) > MATCH_CACHE_SIZE:
+                    self._matches.popitem(last=False)
+            self.counts["mapped" if result["canonical"] else "unmapped"] += 1
+        return {**result, "input": text}
+
+    def canonicalise(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Match every text; inputs mapping to the same canonical name (or to each other) are merged.
+
+        Returns one entry per distinct pain point, in input order, with the
+        inputs it absorbed under ``inputs``. Unmatched inputs keep their text.
+        """
+        merged: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        local = PainPointCanonicaliser(embedder=self._fallback, min_confidence=self.min_confidence)
+        for text in texts:
+            if not text or not text.strip():
+                continue
+            result = self.match(text)
+            name = result["canonical"]
+            if name is None:
+                # Not in the vocabulary; still merge near duplicates among the inputs
+                near = local.match(text)
+                name = near["canonical"] or text
+                local.add(text)
+            entry = merged.setdefault(name, {"name": name, "canonical": result["canonical"] is not None,
+                                             "confidence": result["confidence"], "inputs": []})
+            entry["inputs"].append(text)
+        return list(merged.values())
+
+    def dedupe(self, texts: List[str]) -> List[str]:
+        """``texts`` without near duplicates of an earlier text, wording kept"""
+        return [entry["inputs"][0] for entry in
+                PainPointCanonicaliser(embedder=self._fallback, min_confidence=self.min_confidence)
+                .canonicalise(texts)]
+
+    def cluster(self, names: List[str]) -> Dict[str, str]:
+        """Map each name onto the canonical name of its group of near duplicates.
+
+        The most frequent spelling (then the shortest) of a group becomes
+        canonical, so it is processed first and later variants attach to it.
+        """
+        frequency = Counter(names)
+        ordered = sorted(frequency, key=lambda n: (-frequency[n], len(n), n))
+        if isinstance(self._active_embedder(), OpenAIEmbedder):
+            self._embed(ordered)  # one batched prefetch instead of a call per name
+        mapping = {}
+        for name in ordered:
+            result = self.match(name)
+            if result["canonical"] is not None:
+                mapping[name] = result["canonical"]
+            else:
+                self.add(name, frequency[name])
+                mapping[name] = name
+        return mapping
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self.counts)
+            lookups = counts.get("cache_hits", 0) + counts.get("cache_misses", 0)
+            return {
+                "vocabulary": len(self.names),
+                "embedder": self._active_embedder().name,
+                "cached_matches": len(self._matches),
+                **counts,
+                "hit_ratio": round(counts.get("cache_hits", 0) / lookups, 3) if lookups else None
+            }
@@ -0,0 +1,198 @@
+import argparse
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+PLAN_CACHE_PATH = os.getenv("INTEGRATION_PLAN_CACHE_PATH", "integration_plans.json")
+# New plans are written to the file together, at most this many seconds after the first of them
+PLAN_CACHE_SAVE_DELAY = float(os.getenv("INTEGRATION_PLAN_CACHE_SAVE_DELAY", "2"))
+
+# Words that say nothing about the industry itself ("Software company" -> "software")
+INDUSTRY_STOPWORDS = {
+    "company", "companies", "corporation", "corp", "inc", "ltd", "llc", "group", "industry",
+    "industries", "business", "services", "service", "provider", "firm", "and", "the", "of", "&"
+}
+
+# Common spellings of the same system, so "MS Excel, SAP" and "sap / excel" share a bucket
+SYSTEM_ALIASES = {
+    "ms excel": "excel",
+    "microsoft excel": "excel",
+    "sfdc": "salesforce",
+    "sap erp": "sap",
+    "ms teams": "teams",
+    "microsoft teams": "teams",
+    "google sheets": "sheets",
+    "postgres": "postgresql",
+    "none": "",
+    "not specified": "",
+    "n/a": ""
+}
+
+
+def _tokens(text: str) -> List[str]:
+    return [t for t in re.split(r"[^a-z0-9+#]+", text.lower()) if t and t not in INDUSTRY_STOPWORDS]
+
+
+def industry_bucket(kg_type: Optional[str], known_industries: List[str]) -> str:
+    """Map a SERP knowledge_graph.type onto the closest graph Industry name, or 'general'"""
+    if not kg_type:
+        return "general"
+    type_tokens = set(_tokens(kg_type))
+    best, best_overlap = "general", 0
+    for industry in known_industries:
+        overlap = len(type_tokens & set(_tokens(industry)))
+        if overlap > best_overlap:
+            best, best_overlap = industry, overlap
+    return best
+
+
+def systems_signature(current_systems: Optional[str]) -> str:
+    """Normalise a free text list of current systems into an order independent signature"""
+    if not current_systems:
+        return "none"
+    systems = set()
+    for part in re.split(r"[,;\n|/]|\band\b", current_systems.lower()):
+        part = re.sub(r"\s+", " ", part).strip(" .-")
+        part = SYSTEM_ALIASES.get(part, part)
+        if part:
+            systems.add(part)
+    return "|".join(sorted(systems)) or "none"
+
+
+class IntegrationPlanCache:
+    """Integration plans keyed by (project id, industry bucket, systems signature).
+
+    Plans are company agnostic so they can be shared between companies in
+    the same bucket; personalisation happens on top of the cached plan.
+    Entries are kept in LRU order and persisted to a JSON file, written
+    ``save_delay`` seconds after a put so that a burst of new plans costs one
+    write; call ``flush`` to write pending plans immediately.
+    """
+
+    def __init__(self, path: str = PLAN_CACHE_PATH, max_entries: int = 5000,
+                 save_delay: float = PLAN_CACHE_SAVE_DELAY):
+        self.path = path
+        self.max_entries = max_entries
+        self.save_delay = save_delay
+        self.hits = 0
+        self.misses = 0
+        self.saves = 0
+        self._plans: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Serialises writers; held across the write so requests only wait for _lock's snapshot
+        self._save_lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._plans.update(json.load(f))
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Error loading integration plan cache: {e}")
+
+    @staticmethod
+    def bucket_key(project_id: str, industry: str, systems_sig: str) -> str:
+        return json.dumps([project_id, industry.lower(), systems_sig])
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is None:
+                self.misses += 1
+                return None
+            self._plans.move_to_end(key)
+            self.hits += 1
+            return plan
+
+    def put(self, key: str, plan: Dict[str, Any]):
+        with self._lock:
+            self._plans[key] = plan
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.max_entries:
+                self._plans.popitem(last=False)
+            if not self.path or self._save_timer is not None:
+                return
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """Write the plans to the file now if any are pending"""
+        with self._save_lock:
+            with self._lock:
+                if self._save_timer is None:
+                    return
+                self._save_timer.cancel()
+                self._save_timer = None
+                snapshot = dict(self._plans)
+            # _save_lock orders writers in this process; the pid keeps other processes off our temp file
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(snapshot, f)
+                os.replace(tmp_path, self.path)
+                self.saves += 1
+            except OSError as e:
+                print(f"Error saving integration plan cache: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._plans),
+            "hits": self.hits,
+            "misses": self.misses,
+            "saves": self.saves,
+            "hit_ratio": round(self.hits / total, 3) if total else None
+        }
+
+
+def warm_up(qa_system, top_n: int = 30) -> int:
+    """Precompute plans for the most popular project x industry combinations in the graph.
+
+    Combinations are ranked by industry popularity (number of projects
+    targeting it); every project also gets its 'general' bucket. Returns the
+    number of plans generated.
+    """
+    combos = qa_system.graph.run("plan_warm_up_combos", {"top_n": top_n})
+
+    buckets = []
+    seen_projects = set()
+    for combo in combos:
+        project_info = {
+            "project_id": combo["project_id"],
+            "project_name": combo["project_name"],
+            "summary": combo["summary"]
+        }
+        buckets.append((project_info, combo["industry"]))
+        if combo["project_id"] not in seen_projects:
+            seen_projects.add(combo["project_id"])
+            buckets.append((project_info, "general"))
+
+    generated = 0
+    for project_info, industry in buckets:
+        key = IntegrationPlanCache.bucket_key(project_info["project_id"], industry, "none")
+        if qa_system.plan_cache.get(key) is not None:
+            continue
+        plan = qa_system.generate_bucket_plan(project_info, industry, None)
+        if plan is not None:
+            qa_system.plan_cache.put(key, plan)
+            generated += 1
+            print(f"✓ Cached plan: {project_info['project_name']} / {industry}")
+    return generated
+
+
+# Offline warm-up:
+#   python plan_cache.py --top 30
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute integration plans for popular buckets")
+    parser.add_argument("--top", type=int, default=30, help="Number of project x industry combinations")
+    args = parser.parse_args()
+
+    from main import qa_system
+
+    count = warm_up(qa_system, args.top)
+    qa_system.plan_cache.flush()
+    print(f"✅ Generated {count} integration plans ({qa_system.plan_cache.stats()['entries']} cached)")
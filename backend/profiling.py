@@ -0,0 +1,253 @@
+"""Opt-in request profiling with slow-request capture.
+
+While PROFILING_ENABLED is set, a background thread samples the Python
+stack of every thread serving a request each PROFILE_INTERVAL_MS. When a
+request ends it is kept if it took at least PROFILE_SLOW_SECONDS, or if it
+was picked by PROFILE_SAMPLE_RATE. A kept request becomes a dump: its
+stage timeline from telemetry, its stack samples (folded, ready for
+flamegraph.pl or speedscope) and the hottest functions. The last
+PROFILE_BUFFER_SIZE dumps are held in a ring buffer for the admin endpoints.
+
+The request's profile is carried in a contextvar. On the event loop
+thread a sample counts for a request only while that request's task is the
+one running, so overlapping async requests keep their own samples. Work
+moved to other threads is sampled where it runs: sync endpoints (through
+ProfiledRoute) and LLM gateway workers register their thread with
+``attach`` for as long as they work on the request.
+"""
+import asyncio
+import contextlib
+import contextvars
+import functools
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Dict, List, Optional
+
+from fastapi.routing import APIRoute
+
+from telemetry import current_trace
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.01"))
+PROFILE_SLOW_SECONDS = float(os.getenv("PROFILE_SLOW_SECONDS", "2.0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "50"))
+# The admin endpoints require it in the X-Admin-Token header, and refuse everyone while it is unset
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN")
+
+MAX_STACK_DEPTH = 64
+
+_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar("profile", default=None)
+
+
+def _fold(frame) -> str:
+    """Stack as 'outer;...;inner' of function (file:line) entries"""
+    entries = []
+    while frame is not None and len(entries) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        entries.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(entries))
+
+
+class RequestProfile:
+    """Stack samples and metadata of one in-flight request"""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.samples: Counter = Counter()
+
+
+class StackSampler:
+    """Background thread sampling the stacks of threads working on requests in flight"""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_MS / 1000):
+        self.interval = interval
+        # thread id -> [(profile, task)]; with a task, samples count only while it runs on its loop
+        self._active: Dict[int, List[tuple]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.ticks = 0
+
+    def register(self, thread_id: int, profile: RequestProfile, task: Optional[asyncio.Task] = None) -> bool:
+        """Sample ``thread_id`` for ``profile``; False if it already is"""
+        with self._lock:
+            entries = self._active.setdefault(thread_id, [])
+            if any(p is profile for p, _ in entries):
+                return False
+            entries.append((profile, task))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+            return True
+
+    def unregister(self, thread_id: int, profile: RequestProfile) -> Counter:
+        """Stop sampling ``thread_id`` for ``profile`` and return the profile's samples so far"""
+        with self._lock:
+            entries = [e for e in self._active.get(thread_id, []) if e[0] is not profile]
+            if entries:
+                self._active[thread_id] = entries
+            else:
+                self._active.pop(thread_id, None)
+            return Counter(profile.samples)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                self.ticks += 1
+                for thread_id, entries in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is None:
+                        continue
+                    stack = _fold(frame)
+                    for profile, task in entries:
+                        if task is None or asyncio.current_task(task.get_loop()) is task:
+                            profile.samples[stack] += 1
+
+
+@contextlib.contextmanager
+def attach():
+    """Sample the current thread for the request profile in context, if there is one"""
+    profile = _profile.get()
+    thread_id = threading.get_ident()
+    if profile is None or not sampler.register(thread_id, profile):
+        yield
+        return
+    try:
+        yield
+    finally:
+        sampler.unregister(thread_id, profile)
+
+
+def profiled(func):
+    """``func`` with its thread sampled for the request in context while it runs"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with attach():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose sync endpoints are sampled on the threadpool thread that runs them"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if not asyncio.iscoroutinefunction(endpoint):
+            endpoint = profiled(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+class ProfileStore:
+    """Ring buffer of the most recent request dumps"""
+
+    def __init__(self, size: int = PROFILE_BUFFER_SIZE):
+        self._dumps: deque = deque(maxlen=size)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.captured = Counter()
+
+    def add(self, dump: Dict[str, Any]) -> int:
+        with self._lock:
+            dump["id"] = next(self._ids)
+            self._dumps.append(dump)
+            self.captured[dump["reason"]] += 1
+            return dump["id"]
+
+    def get(self, profile_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return next((d for d in self._dumps if d["id"] == profile_id), None)
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        keys = ("id", "reason", "method", "path", "endpoint", "status", "duration_ms", "started_at", "samples")
+        with self._lock:
+            return [{k: d.get(k) for k in keys} for d in reversed(self._dumps)]
+
+
+def build_dump(profile: RequestProfile, samples: Counter, reason: str, interval: float,
+               info: Dict[str, Any]) -> Dict[str, Any]:
+    trace = current_trace()
+    timeline = trace.timeline() if trace is not None else []
+    by_stage: Dict[str, float] = {}
+    for span in timeline:
+        by_stage[span["name"]] = round(by_stage.get(span["name"], 0.0) + span["duration_ms"], 2)
+    leaves = Counter()
+    for stack, count in samples.items():
+        leaves[stack.rsplit(";", 1)[-1]] += count
+    total = sum(samples.values())
+    return {
+        "reason": reason,
+        "method": profile.method,
+        "path": profile.path,
+        **info,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(profile.started_at)),
+        "cost_usd": round(trace.cost_usd, 6) if trace is not None else None,
+        "tokens": trace.tokens if trace is not None else None,
+        "timeline": timeline,
+        "stage_totals_ms": dict(sorted(by_stage.items(), key=lambda item: -item[1])),
+        "samples": total,
+        "interval_ms": round(interval * 1000, 2),
+        "hot_functions": [{"function": f, "samples": n, "share": round(n / total, 3)}
+                          for f, n in leaves.most_common(15)],
+        "folded": "\n".join(f"{stack} {count}" for stack, count in samples.most_common())
+    }
+
+
+sampler = StackSampler()
+store = ProfileStore()
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that samples each request's stack and keeps slow or sampled ones.
+
+    Add it inside TelemetryMiddleware so the request's trace is available.
+    """
+
+    def __init__(self, app, sample_rate: float = PROFILE_SAMPLE_RATE, slow_seconds: float = PROFILE_SLOW_SECONDS):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith("/admin/profiles"):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"])
+        sampled = random.random() < self.sample_rate
+        thread_id = threading.get_ident()
+        token = _profile.set(profile)
+        sampler.register(thread_id, profile, asyncio.current_task())
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            samples = sampler.unregister(thread_id, profile)
+            _profile.reset(token)
+            duration = time.perf_counter() - profile.started
+            reason = "slow" if duration >= self.slow_seconds else "sampled" if sampled else None
+            if reason is not None:
+                route = scope.get("route")
+                store.add(build_dump(profile, samples, reason, sampler.interval, {
+                    "endpoint": getattr(route, "path", None) or "unmatched",
+                    "status": status,
+                    "duration_ms": round(duration * 1000, 2)
+                }))
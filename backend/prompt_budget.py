@@ -0,0 +1,102 @@
+import math
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    # tiktoken is optional; fall back to the usual ~4 characters per token estimate
+    _encoding = None
+
+STOPWORDS = {
+    "a", "an", "and", "or", "the", "of", "to", "for", "in", "on", "with", "by", "via", "is", "are",
+    "lack", "low", "poor", "slow", "manual", "inefficient", "difficulty", "issues", "challenges"
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count of ``text`` for gpt-4o family models (approximate without tiktoken)"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def _terms(text: str) -> set:
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    # Crude stemming so "contracts"/"contract" and "screening"/"screen" meet
+    return {re.sub(r"(ing|s)$", "", w) for w in words if w not in STOPWORDS and len(w) > 2}
+
+
+def relevance(pain_points: Sequence[str], project: Dict[str, Any]) -> float:
+    """Cheap lexical relevance of a project to the request, used to order candidates"""
+    wanted = _terms(" ".join(pain_points))
+    if not wanted:
+        return 0.0
+    strong = _terms(" ".join(project.get("pain_points") or []) + " " + " ".join(project.get("capabilities") or []))
+    weak = _terms(f"{project.get('name') or ''} {project.get('summary') or ''} {' '.join(project.get('industries') or [])}")
+    return (2 * len(wanted & strong) + len(wanted & weak)) / len(wanted)
+
+
+def _cell(value: Any) -> str:
+    if isinstance(value, (list, tuple)):
+        value = ";".join(str(v) for v in value)
+    return re.sub(r"[|\n\r]+", " ", str(value or "")).strip()
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    if max_chars <= 0:
+        return ""
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0] + "…"
+
+
+def encode_candidates(projects: List[Dict[str, Any]], pain_points: Sequence[str], budget_tokens: int,
+                      summary_chars: Sequence[int] = (100, 50, 0),
+                      proximity: Optional[Dict[str, float]] = None) -> Tuple[str, Dict[str, Dict[str, Any]]]:
+    """Encode projects as a compact pipe separated table that fits ``budget_tokens``.
+
+    Only ranking relevant fields are sent (pain points, capabilities,
+    industries, a truncated summary) and each project gets a short ref such as
+    ``P3`` instead of its id. Projects are ordered by lexical relevance, plus
+    up to 2 for their graph ``proximity`` (project id -> score, see
+    graph_rank.py), so the least relevant ones are dropped first when the
+    catalogue does not fit; summaries are shortened before any project is dropped.
+    Returns (table, refs) where refs maps each ref back to its project.
+    """
+    top = max(proximity.values()) if proximity else 0.0
+
+    def score(project: Dict[str, Any]) -> float:
+        boost = 2 * proximity.get(project.get("id"), 0.0) / top if top else 0.0
+        return relevance(pain_points, project) + boost
+
+    ranked = sorted(projects, key=score, reverse=True)
+    header = "ref|name|pain_points|capabilities|industries|summary"
+
+    for max_chars in summary_chars:
+        lines = [header]
+        refs: Dict[str, Dict[str, Any]] = {}
+        used = estimate_tokens(header)
+        for project in ranked:
+            ref = f"P{len(refs) + 1}"
+            line = "|".join([
+                ref,
+                _cell(project.get("name")),
+                _cell(project.get("pain_points")),
+                _cell(project.get("capabilities")),
+                _cell(project.get("industries")),
+                _truncate(_cell(project.get("summary")), max_chars)
+            ])
+            cost = estimate_tokens(line) + 1
+            if used + cost > budget_tokens:
+                break
+            lines.append(line)
+            refs[ref] = project
+            used += cost
+        if len(refs) == len(ranked) or max_chars == summary_chars[-1]:
+            return "\n".join(lines), refs
+
+    return "\n".join(lines), refs
@@ -0,0 +1,77 @@
+"""LLM and search providers, chosen from the environment.
+
+LLM_PROVIDER=openai (default) uses the OpenAI client, which honours
+OPENAI_BASE_URL so it can also point at the mock server in fakes.py.
+LLM_PROVIDER=fake answers in-process with fakes.FakeOpenAI.
+
+SERP_PROVIDER=serpapi (default) queries SERP_API_URL with SERP_API_KEY;
+SERP_PROVIDER=fake returns fakes.FakeSerp results.
+
+GRAPH_PROVIDER=neo4j (default) connects with graph_db.GraphDB;
+GRAPH_PROVIDER=fake serves a synthetic catalogue from fakes.FakeGraph.
+
+The fakes read their latency and error settings from FAKE_LLM_* and
+FAKE_SERP_* and FAKE_GRAPH_* (see fakes.FakeBehaviour.from_env). Settings are read when a
+provider is made, so values loaded from .env after import still apply.
+"""
+import os
+from typing import Any, Dict
+
+import requests
+
+DEFAULT_SERP_API_URL = "https://serpapi.com/search"
+DEFAULT_SERP_API_KEY = "31b2d407d3035b81ad59b575e9c82ceca4febe813f1b44ae622208813b42517e"
+
+
+class SerpApiProvider:
+    """SerpAPI search over HTTP"""
+
+    def __init__(self, url: str = None, api_key: str = None, timeout: float = None):
+        self.url = url or os.getenv("SERP_API_URL", DEFAULT_SERP_API_URL)
+        self.api_key = api_key or os.getenv("SERP_API_KEY", DEFAULT_SERP_API_KEY)
+        self.timeout = timeout or float(os.getenv("SERP_TIMEOUT", "10"))
+        self.session = requests.Session()
+
+    def search(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a search; raises on HTTP errors"""
+        if not self.api_key:
+            raise RuntimeError("SERP API key not configured")
+        response = self.session.get(self.url, params={**params, "api_key": self.api_key}, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+
+def make_llm_client(provider: str = None):
+    """OpenAI-compatible client for ``provider`` (default $LLM_PROVIDER, else openai)"""
+    provider = (provider or os.getenv("LLM_PROVIDER", "openai")).lower()
+    if provider == "fake":
+        from fakes import FakeBehaviour, FakeOpenAI
+        return FakeOpenAI(FakeBehaviour.from_env("FAKE_LLM"))
+    if provider == "openai":
+        from openai import OpenAI
+        # Retries and timeouts are applied by llm_gateway.LLMGateway, not the client
+        return OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    raise ValueError(f"Unknown LLM_PROVIDER: {provider}")
+
+
+def make_serp_provider(provider: str = None):
+    """Search provider with a ``search(params)`` method for ``provider`` (default $SERP_PROVIDER, else serpapi)"""
+    provider = (provider or os.getenv("SERP_PROVIDER", "serpapi")).lower()
+    if provider == "fake":
+        from fakes import FakeBehaviour, FakeSerp
+        return FakeSerp(FakeBehaviour.from_env("FAKE_SERP"))
+    if provider == "serpapi":
+        return SerpApiProvider()
+    raise ValueError(f"Unknown SERP_PROVIDER: {provider}")
+
+
+def make_graph(url: str, username: str, password: str, provider: str = None):
+    """GraphDB-compatible connection for ``provider`` (default $GRAPH_PROVIDER, else neo4j)"""
+    provider = (provider or os.getenv("GRAPH_PROVIDER", "neo4j")).lower()
+    if provider == "fake":
+        from fakes import FakeGraph
+        return FakeGraph.from_env()
+    if provider == "neo4j":
+        from graph_db import GraphDB
+        return GraphDB(url, username, password)
+    raise ValueError(f"Unknown GRAPH_PROVIDER: {provider}")
@@ -0,0 +1,82 @@
+"""Fixed Cypher used by the service, by name.
+
+Every query takes its values as parameters so its text never changes and
+Neo4j plans it once. ``WARM_PARAMS`` holds sample parameters of the right
+types for pre-warming the plan cache at startup (plans are cached per query
+text and parameter types).
+"""
+
+QUERIES = {
+    "project_catalogue": """
+        MATCH (p:Project)-[:ADDRESSES]->(pp:PainPoint)
+        RETURN p.id, p.name, p.summary, p.url, p.deployment_status,
+               COLLECT(pp.name) as pain_points,
+               [(p)-[:HAS_CAPABILITY]->(c:Capability) | c.name] as capabilities,
+               [(p)-[:TARGETS]->(i:Industry) | i.name] as industries
+        """,
+    "pain_point_matches": """
+        UNWIND $pain_points as target_pain
+        MATCH (pp:PainPoint)
+        WHERE pp.name CONTAINS target_pain OR target_pain CONTAINS pp.name
+        WITH pp, target_pain
+        MATCH (pp)<-[:ADDRESSES]-(p:Project)
+        RETURN p.id, p.name, p.summary, p.url, p.deployment_status,
+               pp.name as matched_pain_point, target_pain,
+               pp.popularity as pain_point_popularity
+        ORDER BY pp.popularity DESC
+        """,
+    "fallback_projects": """
+        MATCH (p:Project)-[:ADDRESSES]->(pp:PainPoint)
+        WITH p, COUNT(pp) as pain_point_count
+        ORDER BY pain_point_count DESC
+        LIMIT $limit
+        RETURN p.id, p.name, p.summary, p.url, p.deployment_status,
+               [(p)-[:ADDRESSES]->(pp2:PainPoint) | pp2.name] as pain_points
+        """,
+    "industries": "MATCH (i:Industry) RETURN i.name as name",
+    # Most popular project x industry combinations, for precomputing integration plans (plan_cache.py)
+    "plan_warm_up_combos": """
+        MATCH (p:Project)-[:TARGETS]->(i:Industry)
+        RETURN p.id as project_id, p.name as project_name, p.summary as summary,
+               i.name as industry, coalesce(i.popularity, 0) as popularity
+        ORDER BY popularity DESC, project_id
+        LIMIT $top_n
+        """,
+    "pain_point_vocabulary": """
+        MATCH (pp:PainPoint)
+        RETURN pp.name as name, coalesce(pp.popularity, 0) as popularity, coalesce(pp.aliases, []) as aliases
+        """,
+    # Every project with all its facets, for catalogue browsing (catalogue.py)
+    "catalogue_snapshot": """
+        MATCH (p:Project)
+        RETURN p.id, p.name, p.summary, p.url, p.deployment_status,
+               [(p)-[:ADDRESSES]->(pp:PainPoint) | pp.name] as pain_points,
+               [(p)-[:HAS_CAPABILITY]->(c:Capability) | c.name] as capabilities,
+               [(p)-[:TARGETS]->(i:Industry) | i.name] as industries,
+               [(p)-[:USES_TECHNOLOGY]->(t:Technology) | t.name] as technologies,
+               [(p)-[:BELONGS_TO]->(d:Domain) | d.name] as domains,
+               [(p)-[:COMPLIES_WITH]->(r:Regulation) | r.name] as regulations
+        """,
+    # Edge lists for the in-memory graph walk (graph_rank.py)
+    "graph_rank_addresses": """
+        MATCH (p:Project)-[:ADDRESSES]->(pp:PainPoint)
+        RETURN p.id as project, pp.name as pain_point
+        """,
+    # Each project's $neighbours strongest pairs only; SHARES_INDUSTRIES alone is close to all pairs
+    "graph_rank_similarities": """
+        MATCH (p1:Project)-[r:SHARES_PAIN_POINTS|SHARES_CAPABILITIES|SHARES_INDUSTRIES|SHARES_TECHNOLOGIES|SHARES_DOMAINS]-(p2:Project)
+        WITH p1, p2, sum(coalesce(r.count, 1) * coalesce($weights[type(r)], 0.0)) as weight
+        WHERE weight > 0
+        ORDER BY weight DESC
+        WITH p1, collect([p2.id, weight])[..$neighbours] as strongest
+        UNWIND strongest as edge
+        RETURN p1.id as source, edge[0] as target, edge[1] as weight
+        """,
+}
+
+WARM_PARAMS = {
+    "pain_point_matches": {"pain_points": ["Manual processes"]},
+    "fallback_projects": {"limit": 3},
+    "plan_warm_up_combos": {"top_n": 30},
+    "graph_rank_similarities": {"weights": {"SHARES_PAIN_POINTS": 1.0}, "neighbours": 50},
+}
@@ -0,0 +1,278 @@
+"""Recommendations materialised per pain point, merged online without the catalogue scan or an LLM.
+
+After the graph is built (graph.py calls ``materialise`` at the end of
+build_complete_graph, or run this module) every PainPoint gets its top-k
+projects with scores, and so does every pair of pain points addressed
+together by at least ``min_support`` projects. The lists go to a JSON file
+at RECOMMENDATIONS_PATH:
+
+- a project that addresses the pain point scores 0.6 to 1.0: more for
+  focused projects (few pain points) and for deployed ones
+- when fewer than k projects address it, the list is filled with projects
+  sharing capabilities with those that do, scored up to 0.5
+
+``RecommendationStore.recommend`` sums the lists of the request's pain
+points (pair lists add projects addressing both that fell outside either
+single list) and returns the best projects in the shape the matching
+pipeline returns. It answers only when every pain point has a list, and it
+reloads the file when it changes.
+
+    python recommendations.py                               # from Neo4j, after graph.py
+    python recommendations.py --fake --projects 10000 --bench 2000
+"""
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from itertools import combinations
+from typing import Any, Dict, List, Optional, Sequence
+
+RECOMMENDATIONS_PATH = os.getenv("RECOMMENDATIONS_PATH", "recommendations.json")
+RECOMMENDATIONS_TOP_K = int(os.getenv("RECOMMENDATIONS_TOP_K", "10"))
+# Serve /analyze-company from the materialised lists when they cover every pain point
+MATERIALISED_RECOMMENDATIONS = os.getenv("MATERIALISED_RECOMMENDATIONS", "true").lower() == "true"
+
+# Capabilities shared by more projects than this are too generic to relate projects
+RELATED_CAPABILITY_LIMIT = 500
+MAX_PAIRS = 20000
+RELOAD_CHECK_SECONDS = 5.0
+
+
+def _field(row: Dict[str, Any], name: str) -> Any:
+    """Catalogue rows come as p.id, p.name, ... from Cypher or as plain keys"""
+    return row[f"p.{name}"] if f"p.{name}" in row else row.get(name)
+
+
+def _direct_score(project: Dict[str, Any]) -> float:
+    focus = 1 / math.sqrt(max(1, len(project["pain_points"])))
+    return 0.6 + 0.3 * focus + (0.1 if project["deployment_status"] == "Deployed" else 0.0)
+
+
+def pair_key(a: str, b: str) -> str:
+    return json.dumps(sorted((a, b)))
+
+
+def materialise(catalogue: List[Dict[str, Any]], top_k: int = RECOMMENDATIONS_TOP_K, min_support: int = 2,
+                max_pairs: int = MAX_PAIRS) -> Dict[str, Any]:
+    """Top-k projects per pain point and per frequent pain point pair, from project_catalogue rows"""
+    started = time.perf_counter()
+    projects = {}
+    for row in catalogue:
+        project_id = _field(row, "id")
+        projects[project_id] = {
+            "name": _field(row, "name"),
+            "summary": _field(row, "summary"),
+            "url": _field(row, "url"),
+            "deployment_status": _field(row, "deployment_status"),
+            "pain_points": list(dict.fromkeys(row.get("pain_points") or [])),
+            "capabilities": list(dict.fromkeys(row.get("capabilities") or []))
+        }
+    scores = {project_id: round(_direct_score(project), 4) for project_id, project in projects.items()}
+
+    addressed_by: Dict[str, List[str]] = defaultdict(list)
+    by_capability: Dict[str, List[str]] = defaultdict(list)
+    pair_support = Counter()
+    for project_id, project in projects.items():
+        for pain_point in project["pain_points"]:
+            addressed_by[pain_point].append(project_id)
+        for capability in project["capabilities"]:
+            by_capability[capability].append(project_id)
+        pair_support.update(pair_key(a, b) for a, b in combinations(sorted(project["pain_points"]), 2))
+
+    def ranked(project_ids: List[str]) -> List[List[Any]]:
+        best = sorted(project_ids, key=lambda p: (-scores[p], p))[:top_k]
+        return [[p, scores[p], 1] for p in best]
+
+    lists = {}
+    for pain_point, project_ids in addressed_by.items():
+        entries = ranked(project_ids)
+        if len(entries) < top_k:
+            # Fill with projects sharing capabilities with the ones that address it
+            direct = set(project_ids)
+            shared = Counter(c for p in project_ids for c in projects[p]["capabilities"])
+            total = sum(shared.values()) or 1
+            related = Counter()
+            for capability, weight in shared.items():
+                members = by_capability[capability]
+                if len(members) > RELATED_CAPABILITY_LIMIT:
+                    continue
+                for other in members:
+                    if other not in direct:
+                        related[other] += weight
+            best = sorted(related.items(), key=lambda item: (-item[1], item[0]))[:top_k - len(entries)]
+            entries += [[p, round(0.5 * weight / total, 4), 0] for p, weight in best]
+        lists[pain_point] = entries
+
+    pairs = {}
+    for key, support in pair_support.most_common(max_pairs):
+        if support < min_support:
+            break
+        a, b = json.loads(key)
+        both = set(addressed_by[a]) & set(addressed_by[b])
+        pairs[key] = [[p, score] for p, score, _ in ranked(list(both))]
+
+    used = {entry[0] for entries in list(lists.values()) + list(pairs.values()) for entry in entries}
+    return {
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "top_k": top_k,
+        "projects": {p: {k: v for k, v in projects[p].items() if k != "capabilities"} for p in used},
+        "pain_points": lists,
+        "pairs": pairs,
+        "build_seconds": round(time.perf_counter() - started, 3)
+    }
+
+
+def save(materialised: Dict[str, Any], path: str = RECOMMENDATIONS_PATH):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(materialised, f)
+    os.replace(tmp_path, path)
+
+
+class RecommendationStore:
+    """The materialised lists, reloaded when the file changes, and the online merge"""
+
+    def __init__(self, path: str = RECOMMENDATIONS_PATH):
+        self.path = path
+        self.data: Optional[Dict[str, Any]] = None
+        self.counts = Counter()
+        self.merge_seconds = 0.0
+        self._mtime = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _reload(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < RELOAD_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+            self._mtime = mtime
+            self.counts["loads"] += 1
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error loading materialised recommendations: {e}")
+
+    def covers(self, pain_points: Sequence[str]) -> bool:
+        with self._lock:
+            self._reload()
+        data = self.data
+        return bool(data and pain_points) and all(p in data["pain_points"] for p in pain_points)
+
+    def recommend(self, pain_points: Sequence[str], limit: int = 5) -> Optional[List[Dict[str, Any]]]:
+        """Best projects for the pain points, or None unless every one of them has a list"""
+        if not self.covers(pain_points):
+            self.counts["misses"] += 1
+            return None
+        started = time.perf_counter()
+        data = self.data
+        pain_points = list(dict.fromkeys(pain_points))
+
+        scores: Dict[str, float] = defaultdict(float)
+        addresses: Dict[str, List[str]] = defaultdict(list)
+        related: Dict[str, List[str]] = defaultdict(list)
+        for pain_point in pain_points:
+            for project_id, score, direct in data["pain_points"][pain_point]:
+                scores[project_id] += score
+                (addresses if direct else related)[project_id].append(pain_point)
+        for a, b in combinations(pain_points, 2):
+            for project_id, score in data["pairs"].get(pair_key(a, b), ()):
+                for pain_point in (a, b):
+                    if pain_point not in addresses[project_id]:
+                        scores[project_id] += score
+                        addresses[project_id].append(pain_point)
+
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        recommended = []
+        for project_id, score in best:
+            project = data["projects"][project_id]
+            if addresses[project_id]:
+                explanation = f"Addresses {', '.join(addresses[project_id])}"
+            else:
+                explanation = f"Shares capabilities with projects that address {', '.join(related[project_id])}"
+            recommended.append({
+                "project_id": project_id,
+                "project_name": project["name"],
+                "summary": project["summary"],
+                "url": project["url"],
+                "deployment_status": project["deployment_status"],
+                "match_score": min(100, round(100 * score / len(pain_points))),
+                "explanation": explanation,
+                "addresses_pain_points": addresses[project_id] or project["pain_points"][:2]
+            })
+        with self._lock:
+            self.counts["hits"] += 1
+            self.merge_seconds += time.perf_counter() - started
+        return recommended
+
+    def stats(self) -> Dict[str, Any]:
+        data = self.data or {}
+        hits = self.counts["hits"]
+        return {
+            "loaded": bool(data),
+            "built_at": data.get("built_at"),
+            "pain_points": len(data.get("pain_points") or {}),
+            "pairs": len(data.get("pairs") or {}),
+            "projects": len(data.get("projects") or {}),
+            **self.counts,
+            "mean_merge_ms": round(self.merge_seconds / hits * 1000, 4) if hits else None
+        }
+
+
+# Offline build:
+#   python recommendations.py --output recommendations.json
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Materialise per pain point recommendations")
+    parser.add_argument("--url", default="bolt://localhost:7687")
+    parser.add_argument("--username", default="neo4j")
+    parser.add_argument("--password", default="test1234")
+    parser.add_argument("--fake", action="store_true", help="Use the synthetic in-memory catalogue instead of Neo4j")
+    parser.add_argument("--projects", type=int, default=200, help="Synthetic catalogue size with --fake")
+    parser.add_argument("--top-k", type=int, default=RECOMMENDATIONS_TOP_K)
+    parser.add_argument("--min-support", type=int, default=2, help="Projects a pain point pair needs to get a list")
+    parser.add_argument("--output", default=RECOMMENDATIONS_PATH)
+    parser.add_argument("--bench", type=int, default=0, help="Time this many online merges after building")
+    args = parser.parse_args()
+
+    if args.fake:
+        from fakes import FakeGraph
+        catalogue = FakeGraph(projects=args.projects).run("project_catalogue")
+    else:
+        from graph_db import GraphDB
+        from queries import QUERIES
+        catalogue = GraphDB(args.url, args.username, args.password).query(QUERIES["project_catalogue"])
+
+    materialised = materialise(catalogue, top_k=args.top_k, min_support=args.min_support)
+    save(materialised, args.output)
+    print(f"✅ {len(materialised['pain_points'])} pain points and {len(materialised['pairs'])} pairs "
+          f"materialised in {materialised['build_seconds']}s -> {args.output}")
+
+    if args.bench:
+        store = RecommendationStore(args.output)
+        vocabulary = list(materialised["pain_points"])
+        store.covers(vocabulary[:1])  # load the file outside the timings
+        rng = random.Random(42)
+        timings = []
+        for _ in range(args.bench):
+            request = rng.sample(vocabulary, min(len(vocabulary), rng.randint(1, 5)))
+            started = time.perf_counter()
+            store.recommend(request)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        print(json.dumps({
+            "merges": len(timings),
+            "p50_ms": round(timings[len(timings) // 2] * 1000, 4),
+            "p99_ms": round(timings[int(len(timings) * 0.99)] * 1000, 4),
+            "max_ms": round(timings[-1] * 1000, 4)
+        }, indent=2))
@@ -0,0 +1,139 @@
+import json
+from collections import Counter
+from typing import Any, Dict, Iterable, List
+
+
+def _value_key(value: Any) -> str:
+    """Hashable, bounded representation of any result value (lists and maps included)"""
+    if isinstance(value, str):
+        return value[:200]
+    return json.dumps(value, sort_keys=True, default=str)[:200]
+
+
+class ColumnDigest:
+    """Running aggregates for one result column"""
+
+    def __init__(self, top_n: int = 5, max_distinct: int = 1000):
+        self.top_n = top_n
+        self.max_distinct = max_distinct
+        self.count = 0
+        self.nulls = 0
+        self.values = Counter()
+        self.distinct_overflow = False
+        self.numeric_count = 0
+        self.minimum = None
+        self.maximum = None
+        self.total = 0.0
+
+    def add(self, value: Any):
+        if value is None:
+            self.nulls += 1
+            return
+        self.count += 1
+
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            self.numeric_count += 1
+            self.total += value
+            self.minimum = value if self.minimum is None else min(self.minimum, value)
+            self.maximum = value if self.maximum is None else max(self.maximum, value)
+
+        key = _value_key(value)
+        if key in self.values or len(self.values) < self.max_distinct:
+            self.values[key] += 1
+        else:
+            # Keep memory bounded on high cardinality columns
+            self.distinct_overflow = True
+
+    def to_dict(self) -> Dict[str, Any]:
+        digest = {
+            "count": self.count,
+            "nulls": self.nulls,
+            "distinct": f">{self.max_distinct}" if self.distinct_overflow else len(self.values),
+            "top": [{"value": value, "count": n} for value, n in self.values.most_common(self.top_n)]
+        }
+        if self.numeric_count:
+            digest.update({
+                "min": self.minimum,
+                "max": self.maximum,
+                "mean": round(self.total / self.numeric_count, 3)
+            })
+        return digest
+
+
+class ResultDigest:
+    """Column-wise summary of a query result built one record at a time.
+
+    Only the first ``sample_size`` rows are kept verbatim, so memory does not
+    grow with the number of rows.
+    """
+
+    def __init__(self, row_cap: int, sample_size: int = 5, top_n: int = 5):
+        self.row_cap = row_cap
+        self.sample_size = sample_size
+        self.top_n = top_n
+        self.row_count = 0
+        self.truncated = False
+        self.sample_rows: List[Dict[str, Any]] = []
+        self.columns: Dict[str, ColumnDigest] = {}
+
+    def add(self, record: Dict[str, Any]):
+        self.row_count += 1
+        if len(self.sample_rows) < self.sample_size:
+            self.sample_rows.append(record)
+        for column, value in record.items():
+            if column not in self.columns:
+                self.columns[column] = ColumnDigest(top_n=self.top_n)
+            self.columns[column].add(value)
+
+    def consume(self, records: Iterable[Dict[str, Any]]) -> "ResultDigest":
+        for record in records:
+            self.add(record)
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "row_count": self.row_count,
+            "truncated": self.truncated,
+            "row_cap": self.row_cap,
+            "columns": {column: digest.to_dict() for column, digest in self.columns.items()}
+        }
+
+    def to_prompt(self) -> str:
+        """Compact text digest for the answer prompt"""
+        if not self.row_count:
+            return "No rows returned."
+
+        lines = [
+            f"Rows: {self.row_count}" + (f" (stopped at the {self.row_cap} row cap, more exist)" if self.truncated else "")
+        ]
+        for column, column_digest in self.columns.items():
+            d = column_digest.to_dict()
+            line = f"- {column}: {d['count']} values, {d['distinct']} distinct"
+            if d["nulls"]:
+                line += f", {d['nulls']} null"
+            if "min" in d:
+                line += f", min {d['min']}, max {d['max']}, mean {d['mean']}"
+            if d["top"] and d["distinct"] != d["count"]:
+                # Top values are only informative when values repeat
+                line += "; top: " + ", ".join(f"{t['value']} ({t['count']})" for t in d["top"])
+            lines.append(line)
+
+        lines.append(f"First {len(self.sample_rows)} rows: {json.dumps(self.sample_rows, default=str)}")
+        return "\n".join(lines)
+
+
+def capped(records: Iterable[Dict[str, Any]], digest: ResultDigest, keep: int = 0) -> List[Dict[str, Any]]:
+    """Feed records into ``digest`` until its row cap, returning the first ``keep`` rows.
+
+    Stops pulling from ``records`` as soon as the cap is reached, so a
+    streaming source never produces more than ``row_cap + 1`` rows.
+    """
+    kept = []
+    for record in records:
+        if digest.row_count >= digest.row_cap:
+            digest.truncated = True
+            break
+        digest.add(record)
+        if len(kept) < keep:
+            kept.append(record)
+    return kept
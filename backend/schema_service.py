@@ -0,0 +1,240 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from cypher_repair import schema_from_context
+
+SCHEMA_CACHE_PATH = os.getenv("SCHEMA_CACHE_PATH", "schema_cache.json")
+# How often (seconds) the cheap version stamp is checked against the database
+SCHEMA_CHECK_INTERVAL = float(os.getenv("SCHEMA_CHECK_INTERVAL", "60"))
+# Properties with at most this many distinct values get their values listed in the prompt
+SCHEMA_SAMPLE_CARDINALITY = int(os.getenv("SCHEMA_SAMPLE_CARDINALITY", "25"))
+# Nodes per label read when counting property values, so introspection stays
+# bounded on big graphs; cardinalities are those of this sample
+SCHEMA_SAMPLE_SIZE = int(os.getenv("SCHEMA_SAMPLE_SIZE", "10000"))
+
+# Used only when the database cannot be introspected
+STATIC_SCHEMA_CONTEXT = """
+        GRAPH SCHEMA:
+        Node Types:
+        - Project: {id, name, summary, url, deployment_status}
+        - PainPoint: {name, popularity}
+        - Capability: {name, popularity}
+        - Industry: {name, popularity}
+        - Technology: {name}
+        - Domain: {name}
+        - Regulation: {name}
+
+        Relationships:
+        - (Project)-[:ADDRESSES]->(PainPoint)
+        - (Project)-[:HAS_CAPABILITY]->(Capability)
+        - (Project)-[:TARGETS]->(Industry)
+        - (Project)-[:USES_TECHNOLOGY]->(Technology)
+        - (Project)-[:BELONGS_TO]->(Domain)
+        - (Project)-[:COMPLIES_WITH]->(Regulation)
+        - (Project)-[:SHARES_PAIN_POINTS]-(Project)
+        - (Project)-[:SHARES_CAPABILITIES]-(Project)
+        - (Project)-[:SHARES_INDUSTRIES]-(Project)
+        - (Project)-[:SHARES_TECHNOLOGIES]-(Project)
+        - (Project)-[:SHARES_DOMAINS]-(Project)
+        """
+
+# Labels, relationship types, property keys and element counts; all but the
+# property keys come from the count store, so this is cheap at any graph size
+VERSION_QUERY = """
+CALL db.labels() YIELD label WITH collect(label) AS labels
+CALL db.relationshipTypes() YIELD relationshipType WITH labels, collect(relationshipType) AS types
+CALL db.propertyKeys() YIELD propertyKey WITH labels, types, collect(propertyKey) AS keys
+CALL { MATCH (n) RETURN count(n) AS nodes }
+CALL { MATCH ()-[r]->() RETURN count(r) AS relationships }
+RETURN labels, types, keys, nodes, relationships
+"""
+
+
+def _q(name: str) -> str:
+    return "`" + name.replace("`", "``") + "`"
+
+
+class SchemaService:
+    """Introspected graph schema, cached against a graph version stamp.
+
+    ``prompt`` returns a compact schema fragment for LLM prompts with node and
+    relationship counts, properties that are not set on every node marked
+    with ``?`` and the values of low cardinality properties (industry names,
+    deployment statuses). Introspection runs once per graph version; between
+    checks, which happen at most every ``check_interval`` seconds, the cached
+    fragment is returned without touching the database. The last result is
+    persisted so a restart against an unchanged graph skips introspection.
+    """
+
+    def __init__(self, driver, database: Optional[str] = None, cache_path: Optional[str] = SCHEMA_CACHE_PATH,
+                 check_interval: float = SCHEMA_CHECK_INTERVAL, sample_cardinality: int = SCHEMA_SAMPLE_CARDINALITY,
+                 sample_size: int = SCHEMA_SAMPLE_SIZE):
+        self.driver = driver
+        self.database = database
+        self.cache_path = cache_path
+        self.check_interval = check_interval
+        self.sample_cardinality = sample_cardinality
+        self.sample_size = sample_size
+        self.introspections = 0
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    self._snapshot = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Error loading schema cache: {e}")
+
+    def _run(self, query: str, **params) -> List[Dict[str, Any]]:
+        with self.driver.session(database=self.database) as session:
+            return [record.data() for record in session.run(query, **params)]
+
+    def version(self) -> str:
+        """Stamp that changes when labels, types, property keys or element counts change"""
+        row = self._run(VERSION_QUERY)[0]
+        stamp = json.dumps([sorted(row["labels"]), sorted(row["types"]), sorted(row["keys"]),
+                            row["nodes"], row["relationships"]])
+        return hashlib.sha1(stamp.encode("utf-8")).hexdigest()[:16]
+
+    def introspect(self) -> Dict[str, Any]:
+        """Read labels, relationship patterns, properties and value cardinalities from the database"""
+        labels: Dict[str, Dict[str, Any]] = {}
+        for row in self._run("CALL db.labels() YIELD label RETURN label"):
+            label = row["label"]
+            count = self._run(f"MATCH (n:{_q(label)}) RETURN count(n) AS c")[0]["c"]
+            labels[label] = {"count": count, "properties": {}}
+
+        for row in self._run(
+            "CALL db.schema.nodeTypeProperties() YIELD nodeLabels, propertyName, propertyTypes, mandatory "
+            "RETURN nodeLabels, propertyName, propertyTypes, mandatory"
+        ):
+            if not row["propertyName"]:
+                continue
+            for label in row["nodeLabels"]:
+                if label in labels:
+                    labels[label]["properties"][row["propertyName"]] = {
+                        "types": row["propertyTypes"] or [],
+                        "mandatory": bool(row["mandatory"])
+                    }
+
+        relationships: Dict[str, Dict[str, Any]] = {}
+        for row in self._run("CALL db.relationshipTypes() YIELD relationshipType RETURN relationshipType"):
+            rel_type = row["relationshipType"]
+            count = self._run(f"MATCH ()-[r:{_q(rel_type)}]->() RETURN count(r) AS c")[0]["c"]
+            relationships[rel_type] = {"count": count, "properties": [], "patterns": []}
+
+        for row in self._run(
+            "CALL db.schema.relTypeProperties() YIELD relType, propertyName RETURN relType, propertyName"
+        ):
+            rel_type = row["relType"].strip(":`")
+            if row["propertyName"] and rel_type in relationships:
+                relationships[rel_type]["properties"].append(row["propertyName"])
+
+        # Which labels each relationship type connects, read from a bounded
+        # sample of edges so this stays cheap on big graphs
+        for rel_type in relationships:
+            rows = self._run(
+                f"MATCH (a)-[r:{_q(rel_type)}]->(b) WITH labels(a)[0] AS start, labels(b)[0] AS end "
+                f"LIMIT 10000 RETURN DISTINCT start, end"
+            )
+            relationships[rel_type]["patterns"] = [[r["start"], r["end"]] for r in rows]
+
+        # Values of low cardinality string properties, most common first. Only
+        # string properties are listed in the prompt, so nothing else is
+        # counted, and the counts come from a bounded sample of nodes rather
+        # than a full scan, which matters for free text such as summaries
+        for label, info in labels.items():
+            for prop, prop_info in info["properties"].items():
+                prop_info["distinct"] = None
+                if prop_info["types"] != ["String"]:
+                    continue
+                rows = self._run(
+                    f"MATCH (n:{_q(label)}) WHERE n.{_q(prop)} IS NOT NULL "
+                    f"WITH n.{_q(prop)} AS value LIMIT $sample "
+                    f"WITH value, count(*) AS c ORDER BY c DESC LIMIT $limit "
+                    f"RETURN value, c",
+                    sample=self.sample_size, limit=self.sample_cardinality + 1
+                )
+                if len(rows) <= self.sample_cardinality:
+                    prop_info["distinct"] = len(rows)
+                    prop_info["values"] = [r["value"] for r in rows]
+
+        self.introspections += 1
+        return {"labels": labels, "relationships": relationships}
+
+    def render(self, schema: Dict[str, Any]) -> str:
+        """Compact prompt fragment for ``schema``"""
+        lines = ["GRAPH SCHEMA:", "Node Types (count; ? = not set on every node):"]
+        for label, info in sorted(schema["labels"].items()):
+            props = [p if meta["mandatory"] else f"{p}?" for p, meta in info["properties"].items()]
+            lines.append(f"- {label} ({info['count']}): {{{', '.join(props)}}}")
+            for prop, meta in info["properties"].items():
+                if meta.get("values"):
+                    values = ", ".join(json.dumps(v) for v in meta["values"] if len(v) <= 60)
+                    lines.append(f"    {prop} values: {values}")
+
+        lines.append("Relationships (count):")
+        for rel_type, info in sorted(schema["relationships"].items()):
+            props = f" {{{', '.join(info['properties'])}}}" if info["properties"] else ""
+            for start, end in info["patterns"] or [["?", "?"]]:
+                lines.append(f"- ({start})-[:{rel_type}{props}]->({end}) ({info['count']})")
+        return "\n".join(lines)
+
+    def _refresh(self, force: bool = False):
+        now = time.time()
+        # Also throttles retries when there is no snapshot yet and introspection keeps failing
+        if not force and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+
+        version = self.version()
+        if not force and self._snapshot is not None and self._snapshot["version"] == version:
+            return
+
+        schema = self.introspect()
+        self._snapshot = {
+            "version": version,
+            "introspected_at": now,
+            "schema": schema,
+            "prompt": self.render(schema)
+        }
+        if self.cache_path:
+            try:
+                with open(f"{self.cache_path}.tmp", "w", encoding="utf-8") as f:
+                    json.dump(self._snapshot, f, default=str)
+                os.replace(f"{self.cache_path}.tmp", self.cache_path)
+            except OSError as e:
+                print(f"Error saving schema cache: {e}")
+
+    def snapshot(self, force: bool = False) -> Optional[Dict[str, Any]]:
+        """Current schema snapshot, re-introspected if the graph version changed"""
+        with self._lock:
+            try:
+                self._refresh(force=force)
+            except Exception as e:
+                # Keep serving the last known schema (or the static one) if Neo4j is unavailable
+                print(f"Error introspecting graph schema: {e}")
+                self._checked_at = time.time()
+            return self._snapshot
+
+    def prompt(self) -> str:
+        snapshot = self.snapshot()
+        return snapshot["prompt"] if snapshot else STATIC_SCHEMA_CONTEXT
+
+    def structure(self) -> Dict[str, Any]:
+        """Labels with their properties and relationship types, as used by the Cypher repairer"""
+        snapshot = self.snapshot()
+        if not snapshot:
+            return schema_from_context(STATIC_SCHEMA_CONTEXT)
+        schema = snapshot["schema"]
+        return {
+            "labels": {label: list(info["properties"]) for label, info in schema["labels"].items()},
+            "relationships": sorted(schema["relationships"]),
+            "relationship_properties": {t: info["properties"] for t, info in schema["relationships"].items()}
+        }
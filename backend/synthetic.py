@@ -0,0 +1,127 @@
+"""Seeded synthetic project catalogue in the shape of assets.json.
+
+Pain points, capabilities, industries and regulations are drawn from
+Zipf-distributed vocabularies, so a few items are shared by many projects
+and most by few, as in real catalogues. The same seed always produces the
+same catalogue.
+
+    python synthetic.py --projects 100000 --output synthetic_100k.json
+"""
+import argparse
+import bisect
+import itertools
+import json
+import random
+from typing import Any, Dict, Iterator, List
+
+QUALIFIERS = ["manual", "slow", "error-prone", "fragmented", "costly", "inconsistent", "delayed", "opaque",
+              "duplicated", "unsecured", "untracked", "outdated", "siloed", "unscalable", "non-compliant"]
+AREAS = ["invoice", "onboarding", "compliance", "customer support", "inventory", "hiring", "contract",
+         "claims", "payroll", "procurement", "sales pipeline", "marketing campaign", "supply chain",
+         "fraud", "audit", "patient intake", "loan", "shipment", "maintenance", "pricing", "data quality",
+         "access control", "knowledge base", "forecast", "expense", "vendor", "tax", "risk", "ticket", "lead"]
+PROBLEMS = ["processing", "reporting", "tracking", "reconciliation", "review", "approvals", "handoffs",
+            "monitoring", "routing", "validation", "scheduling", "documentation", "visibility", "search"]
+VERBS = ["automated", "AI-assisted", "real-time", "self-service", "predictive", "conversational",
+         "secure", "explainable", "multilingual", "low-code"]
+FUNCTIONS = ["document extraction", "anomaly detection", "recommendation", "classification", "summarisation",
+             "entity matching", "forecasting", "question answering", "workflow orchestration", "dashboarding",
+             "policy checking", "sentiment analysis", "speech transcription", "translation", "search"]
+INDUSTRIES = ["Financial Services", "Healthcare", "Retail", "Manufacturing", "Insurance", "Energy",
+              "Telecommunications", "Public Sector", "Logistics", "Pharmaceuticals", "Automotive",
+              "Media & Entertainment", "Education", "Real Estate", "Hospitality", "Banking",
+              "Cybersecurity", "Enterprise SaaS", "AI Infrastructure", "Legal Services", "Agriculture",
+              "Aerospace", "Utilities", "E-commerce", "Human Resources", "Consumer Goods", "Mining",
+              "Construction", "Travel", "Non-profit"]
+REGULATIONS = ["GDPR", "HIPAA", "SOX", "PCI DSS", "SOC 2 Compliance", "ISO 27001", "CCPA", "OWASP Top 10",
+               "Basel III", "MiFID II", "FDA 21 CFR Part 11", "EU AI Act", "NIST CSF", "DORA", "FCA Consumer Duty",
+               "AML Directive", "FERPA", "GLBA", "ESG Reporting", "NIS2"]
+# Words builder.extract_technologies_from_summary recognises
+TECHNOLOGIES = ["GenAI", "LLM", "Machine Learning", "NLP", "Computer Vision", "Python", "React", "Azure",
+                "AWS", "Kubernetes", "API", "GraphQL", "PostgreSQL", "Redis", "Elasticsearch", "Serverless",
+                "IoT", "Chatbot", "Analytics", "Dashboard", "Forecasting", "Streaming", "OpenAI"]
+
+
+def _vocabulary(parts: List[List[str]], size: int, rng: random.Random) -> List[str]:
+    combos = [" ".join(c) for c in itertools.product(*parts)]
+    rng.shuffle(combos)
+    return combos[:size]
+
+
+class ZipfSampler:
+    """Draw items with probability proportional to 1 / rank ** s"""
+
+    def __init__(self, items: List[str], s: float, rng: random.Random):
+        self.items = items
+        self.rng = rng
+        total = 0.0
+        self.cumulative = []
+        for rank in range(1, len(items) + 1):
+            total += 1.0 / rank ** s
+            self.cumulative.append(total)
+
+    def sample(self, k: int) -> List[str]:
+        """``k`` distinct items (fewer if the vocabulary is smaller)"""
+        k = min(k, len(self.items))
+        chosen: List[str] = []
+        seen = set()
+        while len(chosen) < k:
+            i = bisect.bisect_left(self.cumulative, self.rng.random() * self.cumulative[-1])
+            if i not in seen:
+                seen.add(i)
+                chosen.append(self.items[i])
+        return chosen
+
+
+def generate_projects(n: int, seed: int = 42, zipf_s: float = 1.1, pain_point_vocab: int = 5000,
+                      capability_vocab: int = 1500) -> Iterator[Dict[str, Any]]:
+    """Yield ``n`` projects with the same fields as assets.json"""
+    rng = random.Random(seed)
+    pain_points = ZipfSampler(_vocabulary([QUALIFIERS, AREAS, PROBLEMS], pain_point_vocab, rng), zipf_s, rng)
+    capability_names = _vocabulary([VERBS, FUNCTIONS, [f"for {a}" for a in AREAS]], capability_vocab, rng)
+    capabilities = ZipfSampler(capability_names, zipf_s, rng)
+    industries = ZipfSampler(INDUSTRIES, zipf_s, rng)
+    regulations = ZipfSampler(REGULATIONS, zipf_s, rng)
+
+    for i in range(n):
+        project_capabilities = capabilities.sample(rng.randint(2, 5))
+        technologies = rng.sample(TECHNOLOGIES, rng.randint(1, 3))
+        deployed = rng.random() < 0.6
+        yield {
+            "id": f"synthetic-{i:07d}",
+            "name": f"{project_capabilities[0].title()} {i}",
+            "summary": (f"A {project_capabilities[0]} solution built with {', '.join(technologies)} "
+                        f"that also provides {' and '.join(project_capabilities[1:]) or 'reporting'}."),
+            "pain_points": pain_points.sample(rng.randint(2, 5)),
+            "capabilities": project_capabilities,
+            "industries": industries.sample(rng.randint(1, 3)),
+            "regulations": regulations.sample(rng.choice([0, 0, 1, 1, 2])),
+            "url": f"https://labs.example.com/{i}" if deployed else "Not Deployed"
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic project catalogue")
+    parser.add_argument("--projects", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of the vocabularies")
+    parser.add_argument("--output", default="synthetic_projects.json")
+    parser.add_argument("--jsonl", action="store_true", help="One project per line instead of a JSON array")
+    args = parser.parse_args()
+
+    # Written one project at a time so a million projects never sit in memory
+    with open(args.output, "w", encoding="utf-8") as f:
+        if not args.jsonl:
+            f.write("[")
+        for i, project in enumerate(generate_projects(args.projects, seed=args.seed, zipf_s=args.zipf)):
+            if args.jsonl:
+                f.write(json.dumps(project) + "\n")
+            else:
+                f.write(("," if i else "") + json.dumps(project))
+        if not args.jsonl:
+            f.write("]")
+    print(f"Wrote {args.projects} projects to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
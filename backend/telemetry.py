@@ -0,0 +1,407 @@
+"""Tracing spans and Prometheus metrics for the request pipeline.
+
+``span("serp")`` times a stage. Its duration goes to the ``stage_seconds``
+histogram and, inside a request, to that request's ``Trace`` timeline.
+``TracedClient`` wraps the OpenAI client so every completion is recorded
+with its model, token counts and estimated cost, labelled with the stage
+it ran in. ``TelemetryMiddleware`` opens a trace per HTTP request and
+records ``http_request_seconds`` and ``request_cost_usd`` per endpoint.
+``metrics.render()`` produces the Prometheus text format for /metrics.
+
+With TELEMETRY_ENABLED=false, ``span`` returns a shared no-op object,
+the client is not wrapped and the middleware passes requests straight
+through.
+"""
+import contextvars
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "true").lower() == "true"
+
+# USD per million (prompt, completion) tokens
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+}
+# Approximate price of one SerpAPI search
+SERP_COST_USD = float(os.getenv("SERP_COST_USD", "0.01"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COST_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Metrics:
+    """Counters and histograms keyed by label set, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        # name -> labels -> [bucket counts..., sum, count]
+        self._histograms: Dict[str, Dict[Labels, List[float]]] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, Dict[str, Any], float]]]] = []
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, kind: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self._help[name] = (kind, help_text)
+        if kind == "histogram":
+            self._buckets[name] = buckets
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        buckets = self._buckets.get(name, LATENCY_BUCKETS)
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            counts = series.get(key)
+            if counts is None:
+                counts = series[key] = [0.0] * (len(buckets) + 2)
+            # Values above the last bound only count towards +Inf, which is the total
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            counts[-2] += value
+            counts[-1] += 1
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, str, Dict[str, Any], float]]]):
+        """Register a callable yielding (name, kind, labels, value) samples read at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        def header(name: str, default_kind: str):
+            kind, help_text = self._help.get(name, (default_kind, ""))
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: {k: list(v) for k, v in series.items()} for name, series in self._histograms.items()}
+
+        for name, series in sorted(counters.items()):
+            header(name, "counter")
+            for labels, value in series.items():
+                lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+        for name, series in sorted(histograms.items()):
+            header(name, "histogram")
+            buckets = self._buckets.get(name, LATENCY_BUCKETS)
+            for labels, counts in series.items():
+                cumulative = 0.0
+                for bound, count in zip(buckets, counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, (('le', f'{bound:g}'),))} {cumulative:g}")
+                lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {counts[-1]:g}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {counts[-2]:g}")
+                lines.append(f"{name}_count{_format_labels(labels)} {counts[-1]:g}")
+
+        # Samples of one metric have to be contiguous, so group collector output by name
+        families: Dict[str, Tuple[str, List[str]]] = {}
+        for collector in self._collectors:
+            try:
+                samples = list(collector())
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+                continue
+            for name, kind, labels, value in samples:
+                if value is not None:
+                    families.setdefault(name, (kind, []))[1].append(
+                        f"{name}{_format_labels(_labels(labels))} {float(value):g}")
+        for name, (kind, samples) in families.items():
+            header(name, kind)
+            lines.extend(samples)
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+metrics.describe("stage_seconds", "histogram", "Duration of pipeline stages")
+metrics.describe("http_request_seconds", "histogram", "HTTP request duration by endpoint")
+metrics.describe("request_cost_usd", "histogram", "Estimated LLM and search cost per request", COST_BUCKETS)
+metrics.describe("llm_completion_seconds", "histogram", "Completion latency by stage and model")
+metrics.describe("llm_tokens_total", "counter", "Prompt and completion tokens by stage and model")
+metrics.describe("llm_cost_usd_total", "counter", "Estimated completion cost by stage and model")
+metrics.describe("llm_json_parse_total", "counter", "How model JSON was obtained, by prompt")
+metrics.describe("llm_route_seconds", "histogram", "Latency of each model tier tried, by prompt, model and outcome")
+metrics.describe("llm_route_cost_usd_total", "counter", "Estimated cost of each model tier tried, by prompt and model")
+
+
+class Trace:
+    """Timeline of the spans recorded during one request"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.cost_usd = 0.0
+        self.tokens = 0
+
+    def add(self, name: str, started: float, duration: float, attrs: Dict[str, Any]):
+        # list.append is atomic, so spans from worker threads need no lock
+        self.spans.append({"name": name, "start_ms": round((started - self.started) * 1000, 2),
+                           "duration_ms": round(duration * 1000, 2), **attrs})
+
+    def timeline(self) -> List[Dict[str, Any]]:
+        return sorted(self.spans, key=lambda s: s["start_ms"])
+
+
+_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+_stage: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("stage", default=None)
+_meter: contextvars.ContextVar[Optional["CostMeter"]] = contextvars.ContextVar("meter", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+def record(name: str, started: float, error: bool = False, **attrs):
+    """Record a stage that began at ``started`` (a perf_counter value) and has just finished"""
+    if not TELEMETRY_ENABLED:
+        return
+    duration = time.perf_counter() - started
+    metrics.observe("stage_seconds", duration, stage=name, outcome="error" if error else "ok")
+    trace = _trace.get()
+    if trace is not None:
+        trace.add(name, started, duration, {"error": True, **attrs} if error else attrs)
+
+
+def add_cost(usd: float, tokens: int = 0):
+    trace = _trace.get()
+    if trace is not None:
+        trace.cost_usd += usd
+        trace.tokens += tokens
+    meter = _meter.get()
+    if meter is not None:
+        meter.cost_usd += usd
+        meter.tokens += tokens
+
+
+class CostMeter:
+    """Context manager adding up the cost of the completions made inside it.
+
+    Costs come from TracedClient, so they stay at zero with telemetry disabled.
+    """
+    __slots__ = ("cost_usd", "tokens", "token")
+
+    def __init__(self):
+        self.cost_usd = 0.0
+        self.tokens = 0
+
+    def __enter__(self):
+        self.token = _meter.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            _meter.reset(self.token)
+        except ValueError:
+            pass  # exited in another context
+        return False
+
+
+class _Span:
+    __slots__ = ("name", "attrs", "started", "token")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.token = _stage.set(self.name)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            _stage.reset(self.token)
+        except ValueError:
+            pass  # exited in another context
+        record(self.name, self.started, error=exc_type is not None, **self.attrs)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str, **attrs):
+    """Context manager timing the stage ``name``; ``.set(**attrs)`` adds attributes to it"""
+    if not TELEMETRY_ENABLED:
+        return _NO_SPAN
+    return _Span(name, attrs)
+
+
+def completion_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    # Dated model names (gpt-4o-mini-2024-07-18) are priced as their base model
+    base = max((m for m in MODEL_PRICES if model.startswith(m)), key=len, default=None)
+    if base is None:
+        return 0.0
+    prompt_price, completion_price = MODEL_PRICES[base]
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def _record_completion(stage: str, model: str, started: float, prompt_tokens: int, completion_tokens: int,
+                       error: bool = False, estimated: bool = False):
+    duration = time.perf_counter() - started
+    metrics.observe("llm_completion_seconds", duration, stage=stage, model=model)
+    metrics.inc("llm_tokens_total", prompt_tokens, stage=stage, model=model, kind="prompt")
+    metrics.inc("llm_tokens_total", completion_tokens, stage=stage, model=model, kind="completion")
+    cost = completion_cost(model, prompt_tokens, completion_tokens)
+    metrics.inc("llm_cost_usd_total", cost, stage=stage, model=model)
+    add_cost(cost, prompt_tokens + completion_tokens)
+    trace = _trace.get()
+    if trace is not None:
+        attrs = {"model": model, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "cost_usd": round(cost, 6)}
+        if estimated:
+            attrs["estimated_tokens"] = True
+        if error:
+            attrs["error"] = True
+        trace.add(f"completion:{stage}", started, duration, attrs)
+
+
+class _TracedCompletions:
+    def __init__(self, completions):
+        self._completions = completions
+
+    def create(self, **kwargs):
+        stage = _stage.get() or "unknown"
+        model = kwargs.get("model", "")
+        started = time.perf_counter()
+        try:
+            response = self._completions.create(**kwargs)
+        except Exception:
+            _record_completion(stage, model, started, 0, 0, error=True)
+            raise
+        if kwargs.get("stream"):
+            return self._stream(response, stage, model, started, kwargs.get("messages") or [])
+        usage = getattr(response, "usage", None)
+        _record_completion(stage, model, started, getattr(usage, "prompt_tokens", 0) or 0,
+                           getattr(usage, "completion_tokens", 0) or 0)
+        return response
+
+    def _stream(self, stream, stage: str, model: str, started: float, messages: List[Dict[str, Any]]):
+        # Streams carry no usage unless asked for; estimate at about four characters per token
+        chars = 0
+        try:
+            for chunk in stream:
+                if chunk.choices:
+                    chars += len(chunk.choices[0].delta.content or "")
+                yield chunk
+        finally:
+            prompt_chars = sum(len(str(m.get("content", ""))) for m in messages)
+            _record_completion(stage, model, started, prompt_chars // 4, chars // 4, estimated=True)
+
+
+class _TracedEmbeddings:
+    def __init__(self, embeddings):
+        self._embeddings = embeddings
+
+    def create(self, **kwargs):
+        stage = _stage.get() or "unknown"
+        model = kwargs.get("model", "")
+        started = time.perf_counter()
+        try:
+            response = self._embeddings.create(**kwargs)
+        except Exception:
+            _record_completion(stage, model, started, 0, 0, error=True)
+            raise
+        usage = getattr(response, "usage", None)
+        _record_completion(stage, model, started, getattr(usage, "prompt_tokens", 0) or 0, 0)
+        return response
+
+
+class TracedClient:
+    """OpenAI-compatible client wrapper that records every completion and embedding call"""
+
+    def __init__(self, client):
+        self._client = client
+        self.chat = type("Chat", (), {})()
+        self.chat.completions = _TracedCompletions(client.chat.completions)
+        if hasattr(client, "embeddings"):
+            self.embeddings = _TracedEmbeddings(client.embeddings)
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+
+def traced(client):
+    """``client`` wrapped in TracedClient, or unchanged when telemetry is disabled"""
+    return TracedClient(client) if TELEMETRY_ENABLED else client
+
+
+class TelemetryMiddleware:
+    """ASGI middleware that opens a Trace per HTTP request and records its latency and cost"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not TELEMETRY_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(scope["path"])
+        token = _trace.set(trace)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _trace.reset(token)
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            duration = time.perf_counter() - trace.started
+            metrics.observe("http_request_seconds", duration, endpoint=endpoint, method=scope["method"],
+                            status=status)
+            metrics.observe("request_cost_usd", trace.cost_usd, endpoint=endpoint)
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import profiling
+from profiling import ProfiledRoute, ProfilingMiddleware
+
+
+def _busy_sync_work(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+
+
+def _make_app() -> FastAPI:
+    app = FastAPI()
+    app.router.route_class = ProfiledRoute
+    app.add_middleware(ProfilingMiddleware, sample_rate=0.0, slow_seconds=0.1)
+
+    @app.get("/sync")
+    def sync_endpoint():
+        _busy_sync_work(0.4)
+        return {"ok": True}
+
+    @app.get("/async")
+    async def async_endpoint():
+        await asyncio.sleep(0.4)
+        return {"ok": True}
+
+    return app
+
+
+def _dump_for(path: str):
+    return next(profiling.store.get(s["id"]) for s in profiling.store.summaries() if s["path"] == path)
+
+
+def test_sync_endpoint_frames_are_sampled():
+    client = TestClient(_make_app())
+    assert client.get("/sync").status_code == 200
+
+    dump = _dump_for("/sync")
+    assert dump["samples"] > 0
+    assert "_busy_sync_work" in dump["folded"]
+
+
+def test_overlapping_request_does_not_get_other_samples():
+    client = TestClient(_make_app())
+    threads = [threading.Thread(target=client.get, args=(path,)) for path in ("/async", "/sync")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert "_busy_sync_work" in _dump_for("/sync")["folded"]
+    assert "_busy_sync_work" not in _dump_for("/async")["folded"]